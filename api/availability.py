@@ -0,0 +1,44 @@
+# Group availability: rank trip windows by how many people are blocked.
+# Per-day totals come from the PreferenceGrid bit planes and are turned into
+# prefix sums, so every window is scored in O(1) and a multi-year range stays
+# linear in days x users.
+from datetime import timedelta
+from itertools import accumulate
+
+
+def _window_sums(per_day, length):
+    prefix = [0, *accumulate(per_day)]
+    return [prefix[i + length] - prefix[i] for i in range(len(per_day) - length + 1)]
+
+
+def best_windows(grid, length, limit=10):
+    """Rank every `length`-day window covered by `grid`.
+
+    Windows are ordered by number of "no" marks, then "prefer_not" marks,
+    then start date. Returns at most `limit` windows, each listing the
+    users who have marks inside it.
+    """
+    if length < 1 or length > grid.num_days:
+        return []
+
+    no_sums = _window_sums(grid.day_counts('no'), length)
+    prefer_not_sums = _window_sums(grid.day_counts('prefer_not'), length)
+    ranked = sorted(range(len(no_sums)), key=lambda i: (no_sums[i], prefer_not_sums[i], i))[:limit]
+
+    window_mask = (1 << length) - 1
+    windows = []
+    for offset in ranked:
+        conflicts = {}
+        for user in grid.users:
+            no_days = (grid.plane('no', user) >> offset & window_mask).bit_count()
+            prefer_not_days = (grid.plane('prefer_not', user) >> offset & window_mask).bit_count()
+            if no_days or prefer_not_days:
+                conflicts[user] = {'no': no_days, 'prefer_not': prefer_not_days}
+        windows.append({
+            'start_date': (grid.start_date + timedelta(days=offset)).isoformat(),
+            'end_date': (grid.start_date + timedelta(days=offset + length - 1)).isoformat(),
+            'no_count': no_sums[offset],
+            'prefer_not_count': prefer_not_sums[offset],
+            'conflicts': conflicts,
+        })
+    return windows
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from .db import VALID_PREFERENCE_TYPES
+
+# Import/export formats and their content types
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+_MIMETYPE_FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson'}
+FIELDS = ('user_name', 'event_date', 'preference_type')
+
+
+class ImportRowError(ValueError):
+    """A line of an import file that can't be parsed or validated."""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+def format_for(requested, mimetype):
+    """Pick a format from an explicit ?format= value or the request/Accept mimetype."""
+    if requested:
+        return requested if requested in FORMATS else None
+    return _MIMETYPE_FORMATS.get(mimetype)
+
+
+def parse_records(text_stream, fmt):
+    """Yield (line number, record dict) from a CSV (with header row) or NDJSON stream.
+
+    Every record must have all of FIELDS, so a file without preference_type
+    can't pass for a file of clears; an empty value is still allowed.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+        if missing:
+            raise ImportRowError(1, f"missing column(s): {', '.join(missing)}")
+        for record in reader:
+            # Short rows get None for the cells they lack
+            missing = [field for field in FIELDS if record.get(field) is None]
+            if missing:
+                raise ImportRowError(reader.line_num, f"missing {', '.join(missing)}")
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(text_stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ImportRowError(line_number, "invalid JSON") from None
+        if not isinstance(record, dict):
+            raise ImportRowError(line_number, "expected a JSON object")
+        missing = [field for field in FIELDS if field not in record]
+        if missing:
+            raise ImportRowError(line_number, f"missing {', '.join(missing)}")
+        yield line_number, record
+
+
+def validate_records(records, member_ids):
+    """Yield (member_id, event_date, preference_type) for each record.
+
+    preference_type is None for 'clear' or an empty (or JSON null) value. Raises
+    ImportRowError at the first invalid record, so a bad file is rejected
+    as a whole rather than half-applied.
+    """
+    for line, record in records:
+        # NDJSON values can be any JSON type; only strings may reach the lookups below
+        for field in ('user_name', 'event_date', 'preference_type'):
+            if not isinstance(record.get(field), (str, type(None))):
+                raise ImportRowError(line, f"{field} must be a string")
+        user_name = record.get('user_name')
+        if user_name not in member_ids:
+            raise ImportRowError(line, f"unknown user_name {user_name!r}")
+        try:
+            event_date = datetime.strptime(record.get('event_date') or '', '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ImportRowError(line, "invalid event_date. Use YYYY-MM-DD") from None
+        preference_type = record.get('preference_type') or None
+        if preference_type == 'clear':
+            preference_type = None
+        elif preference_type is not None and preference_type not in VALID_PREFERENCE_TYPES:
+            raise ImportRowError(line, f"invalid preference_type {preference_type!r}")
+        yield member_ids[user_name], event_date, preference_type
+
+
+def format_records(rows, fmt, batch_size=500):
+    """Yield CSV or NDJSON text chunks for an iterable of preference row dicts."""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(FIELDS)
+    for count, row in enumerate(rows, 1):
+        if writer is not None:
+            writer.writerow([row[field] for field in FIELDS])
+        else:
+            buffer.write(json.dumps({field: row[field] for field in FIELDS}))
+            buffer.write('\n')
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,118 @@
+import time
+import threading
+
+# Every cache created in this process, for metrics reporting
+ALL_CACHES = []
+
+
+class VersionedCache:
+    """A small in-process TTL cache with a monotonic data version.
+
+    Entries expire after `ttl` seconds or when `invalidate()` is called from
+    the write path. The version is bumped on every invalidation and whenever
+    a reload returns data that differs from what was cached before (i.e. it
+    was changed by another serverless instance), so it can key anything
+    derived from the cached data.
+
+    Entries may belong to a `scope` (e.g. a group id). Each scope has its own
+    version and can be invalidated without disturbing the others.
+    """
+
+    def __init__(self, name, ttl=30.0, max_entries=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}   # (scope, key) -> (expires_at, value)
+        self._stale = {}     # (scope, key) -> last value seen, for change detection on reload
+        self._version = 1
+        # scope -> version of its last change; scopes not listed haven't
+        # changed since the last full invalidation (the floor)
+        self._scopes = {}
+        self._floor = self._version
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        ALL_CACHES.append(self)
+
+    @property
+    def version(self):
+        return self._version
+
+    def version_of(self, scope):
+        """Version of one scope's data; unique across scopes and invalidations."""
+        with self._lock:
+            return self._scopes.get(scope, self._floor)
+
+    def _bump(self, scope=None):
+        self._version += 1
+        self._scopes[scope] = self._version
+
+    def get(self, key, loader, scope=None):
+        """Return the cached value for `key`, calling `loader()` on a miss.
+
+        A loader result of None is treated as a failure and is not cached, nor
+        is one loaded while invalidate() ran, as it may predate that write.
+        """
+        key = (scope, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            invalidations = self._stats['invalidations']
+
+        value = loader()
+        if value is None:
+            return None
+
+        with self._lock:
+            if self._stats['invalidations'] != invalidations:
+                return value
+            previous = self._stale.get(key, value)
+            if previous != value:
+                self._bump(scope)
+            self._stale[key] = value
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            if self.max_entries and len(self._entries) > self.max_entries:
+                self._evict()
+        return value
+
+    def _evict(self):
+        # Drop expired entries first, then the oldest ones
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+            self._stale.pop(key, None)
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            del self._entries[key]
+            self._stale.pop(key, None)
+
+    def invalidate(self, key=None, scope=None):
+        """Drop one key, one scope or (with neither) everything, and bump the version."""
+        with self._lock:
+            if key is not None:
+                self._entries.pop((scope, key), None)
+                self._stale.pop((scope, key), None)
+                self._bump(scope)
+            elif scope is not None:
+                for entry_key in [k for k in self._entries if k[0] == scope]:
+                    del self._entries[entry_key]
+                    self._stale.pop(entry_key, None)
+                self._bump(scope)
+            else:
+                self._entries.clear()
+                self._stale.clear()
+                self._bump()
+                self._scopes.clear()
+                self._floor = self._version
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update({'name': self.name, 'version': self._version, 'entries': len(self._entries)})
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_rate'] = round(snapshot['hits'] / lookups, 3) if lookups else None
+        return snapshot
@@ -0,0 +1,80 @@
+import calendar
+import re
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+SUNDAY = calendar.SUNDAY
+# Upper bound on months rendered for one season/query
+MAX_SEASON_MONTHS = 36
+MONTH_PATTERN = re.compile(r'(\d{4})-(\d{2})', re.ASCII)
+
+MonthGrid = namedtuple('MonthGrid', ['year', 'month', 'month_name', 'days', 'calendar_grid'])
+
+
+@lru_cache(maxsize=512)
+def month_grid(year, month, first_weekday=SUNDAY):
+    """Return the (memoized, immutable) grid for one month.
+
+    Uses a per-call `calendar.Calendar` instead of the process-wide
+    `calendar.setfirstweekday`, so concurrent requests can't interfere.
+    """
+    weeks = tuple(tuple(week) for week in calendar.Calendar(first_weekday).monthdayscalendar(year, month))
+    days = tuple(day for week in weeks for day in week if day != 0)
+    return MonthGrid(year, month, calendar.month_name[month], days, weeks)
+
+
+@lru_cache(maxsize=7)
+def week_header(first_weekday=SUNDAY):
+    """Return ((day_abbr, is_midweek), ...) for each column, starting at `first_weekday`.
+
+    Mon-Thu are flagged as midweek so the page can de-emphasise them.
+    """
+    columns = []
+    for column in range(7):
+        weekday = (first_weekday + column) % 7
+        columns.append((calendar.day_abbr[weekday], weekday <= calendar.THURSDAY))
+    return tuple(columns)
+
+
+def parse_month(value):
+    """Parse 'YYYY-MM' into (year, month); raises ValueError."""
+    match = MONTH_PATTERN.fullmatch(value)
+    if match is None:
+        raise ValueError("Use YYYY-MM")
+    year, month = int(match[1]), int(match[2])
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        raise ValueError(f"Invalid month: {value}")
+    return year, month
+
+
+@lru_cache(maxsize=64)
+def season_months(start, end):
+    """Return ((year, month), ...) from `start` to `end` inclusive.
+
+    Raises ValueError if the range is reversed or longer than MAX_SEASON_MONTHS.
+    """
+    start_index = start[0] * 12 + start[1] - 1
+    end_index = end[0] * 12 + end[1] - 1
+    if end_index < start_index:
+        raise ValueError("Season end is before season start")
+    if end_index - start_index + 1 > MAX_SEASON_MONTHS:
+        raise ValueError(f"Season cannot span more than {MAX_SEASON_MONTHS} months")
+    return tuple((index // 12, index % 12 + 1) for index in range(start_index, end_index + 1))
+
+
+def season_bounds(months):
+    """Return (first_day, last_day) covered by a season's months."""
+    (first_year, first_month), (last_year, last_month) = months[0], months[-1]
+    return (date(first_year, first_month, 1),
+            date(last_year, last_month, calendar.monthrange(last_year, last_month)[1]))
+
+
+def season_label(months):
+    """Human-readable span, e.g. 'May-August 2025' or 'November 2025-February 2026'."""
+    (first_year, first_month), (last_year, last_month) = months[0], months[-1]
+    if (first_year, first_month) == (last_year, last_month):
+        return f"{calendar.month_name[first_month]} {first_year}"
+    if first_year == last_year:
+        return f"{calendar.month_name[first_month]}-{calendar.month_name[last_month]} {first_year}"
+    return f"{calendar.month_name[first_month]} {first_year}-{calendar.month_name[last_month]} {last_year}"
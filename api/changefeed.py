@@ -0,0 +1,101 @@
+import os
+import time
+import select
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel the preferences trigger notifies (see storage/postgres.py)
+CHANNEL = 'preference_changes'
+
+
+class ChangeFeed:
+    """Wakes long-poll waiters when preference data may have changed.
+
+    Writes in this process call `publish()` directly. When a DSN is given, a
+    background thread also LISTENs on the Postgres channel so writes made by
+    other serverless instances wake waiters here too. The feed only says
+    "something changed"; waiters re-read the actual changes from the
+    database, so a dropped notification costs latency, never correctness.
+    """
+
+    def __init__(self, dsn=None, reconnect_delay=5.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._cond = threading.Condition()
+        self._sequence = 0
+        self._thread = None
+        self._pid = None
+        self._listening = False
+
+    @property
+    def listening(self):
+        """True while the LISTEN connection is up."""
+        return self._listening
+
+    def sequence(self):
+        """Current change counter; pass it to `wait()` to block for the next change."""
+        with self._cond:
+            return self._sequence
+
+    def publish(self):
+        """Signal a change to every waiter in this process."""
+        with self._cond:
+            self._sequence += 1
+            self._cond.notify_all()
+
+    def wait(self, sequence, timeout):
+        """Block until the counter moves past `sequence` or `timeout` seconds pass.
+
+        Returns True if a change was signalled.
+        """
+        self._ensure_listener()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._sequence != sequence, timeout)
+
+    def _ensure_listener(self):
+        if not self.dsn:
+            return
+        with self._cond:
+            # Threads don't survive a fork; start a fresh listener in the child
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name='change-feed-listener', daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        # Only Postgres deployments listen, so other backends never load the driver
+        import psycopg2
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                self._listening = True
+                logger.info("Listening for preference changes on %s", CHANNEL)
+                # Anything written while we were disconnected was not notified
+                self.publish()
+                while True:
+                    if select.select([conn], [], [], 60.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.publish()
+            except Exception as e:
+                logger.warning("Change feed listener failed, retrying in %.0fs: %s", self.reconnect_delay, e)
+            finally:
+                if self._listening:
+                    self._listening = False
+                    # Wake waiters relying on NOTIFY so they fall back to polling
+                    self.publish()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(self.reconnect_delay)
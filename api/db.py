@@ -1,78 +1,439 @@
 import os
+import re
+import time
 import logging
-import traceback
-import psycopg2
-import psycopg2.extras
-from datetime import datetime
-from dotenv import load_dotenv
-
-# Load environment variables from .env file (when running locally)
-load_dotenv()
-
-# Configure enhanced logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .cache import VersionedCache
+from .changefeed import ChangeFeed
+from .storage import StorageUnavailable, backend_for, open_storage, from_version, to_version
+
+# Load environment variables from .env file when running locally; deployments
+# (Vercel sets VERCEL=1) are configured already and skip the import
+if not os.getenv('VERCEL'):
+    from dotenv import load_dotenv
+    load_dotenv()
+
 logger = logging.getLogger(__name__)
 
 # Constants
 VALID_PREFERENCE_TYPES = ['prefer_not', 'no']
-VALID_USERS = ['Jack', 'Payton', 'Nick', 'Alyssa']
+# Group shown at / and served by the un-prefixed /api routes
+DEFAULT_GROUP = os.getenv('DEFAULT_GROUP', 'default')
+# Slugs appear in URLs; member names in query strings and feed titles
+GROUP_SLUG_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,63}$')
+MEMBER_NAME_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9]{0,49}$')
+MAX_GROUP_MEMBERS = 50
+
+# Overlap applied to `since` cursors so rows written by transactions that
+# committed slightly out of timestamp order are not missed by delta sync
+DELTA_OVERLAP = timedelta(seconds=5)
+
+# Tombstones (the record of cleared cells that delta sync replays) are kept
+# this long; clients whose cursor predates a pruned one must reload in full
+TOMBSTONE_RETENTION = timedelta(days=float(os.getenv('TOMBSTONE_RETENTION_DAYS', '30')))
+# Writes prune expired tombstones at most this often per process
+TOMBSTONE_PRUNE_INTERVAL = 3600
+_next_prune = 0.0
+
+# Read cache in front of get_preferences(), scoped by group id; a write invalidates its group
+preferences_cache = VersionedCache('preferences', ttl=float(os.getenv('PREFERENCES_CACHE_TTL', '30')),
+                                   max_entries=int(os.getenv('PREFERENCES_CACHE_MAX_ENTRIES', '1024')))
+
+# Groups and their member lists, keyed by slug; they rarely change
+groups_cache = VersionedCache('groups', ttl=float(os.getenv('GROUPS_CACHE_TTL', '300')),
+                              max_entries=int(os.getenv('GROUPS_CACHE_MAX_ENTRIES', '1024')))
 
-def get_db_connection():
-    """Create a connection to the database."""
+# Long-poll waiters re-check for changes this often while LISTEN is down or
+# unavailable (e.g. behind a transaction-mode pooler or with the SQLite
+# backend shared by several processes)
+CHANGES_POLL_INTERVAL = float(os.getenv('CHANGES_POLL_INTERVAL', '2'))
+
+def _listen_dsn():
+    if os.getenv('CHANGES_LISTEN', '1').lower() not in ('1', 'true', 'yes'):
+        return None
+    database_url = os.getenv('DATABASE_URL')
     try:
-        # Get the DATABASE_URL from environment variables
-        database_url = os.getenv('DATABASE_URL')
-        if not database_url:
-            logger.error("DATABASE_URL environment variable not set")
+        # Only Postgres can notify other instances; the other backends rely on publish() and polling
+        if not database_url or backend_for(database_url) != 'postgres':
             return None
-            
-        # Connect to the database
-        logger.info("Connecting to database")
-        conn = psycopg2.connect(database_url)
-        conn.autocommit = True
-        return conn
+    except ValueError:
+        return None
+    # LISTEN needs a session, so prefer a direct (unpooled) URL when one is set
+    return os.getenv('CHANGES_LISTEN_URL') or database_url
+
+# Wakes long-poll waiters on local writes and, via LISTEN, on other instances' writes
+change_feed = ChangeFeed(_listen_dsn())
+
+# Module-level storage backend, reused across warm serverless invocations
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """Return the storage backend named by DATABASE_URL, creating it on first use.
+
+    Returns None if DATABASE_URL is unset or names an unsupported backend.
+    """
+    global _storage
+    if _storage is not None:
+        return _storage
+    with _storage_lock:
+        if _storage is None:
+            database_url = os.getenv('DATABASE_URL')
+            if not database_url:
+                logger.error("DATABASE_URL environment variable not set")
+                return None
+            try:
+                _storage = open_storage(database_url)
+            except (ValueError, ImportError) as e:
+                logger.error("Cannot open storage for DATABASE_URL: %s", e)
+                return None
+            logger.info("Using %s storage", _storage.name)
+    return _storage
+
+def _require_storage():
+    store = get_storage()
+    if store is None:
+        raise StorageUnavailable("Database is not configured")
+    return store
+
+def warm_up_storage():
+    """Open (or health-check) a database connection ahead of the first request."""
+    store = get_storage()
+    if store is None:
+        return False
+    try:
+        return store.warm_up()
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Database connection error: {e}\n{error_details}")
+        logger.error("Warm-up could not open a database connection: %s", e)
+        return False
+
+def get_pool_stats():
+    """Return pool counters (checkouts, waits, reconnects, ...) or None if there is no pool."""
+    store = _storage
+    return store.pool_stats() if store is not None else None
+
+def init_schema():
+    """Create or migrate the tables and seed the default group; raises on failure."""
+    _require_storage().init_schema()
+    prune_tombstones()
+    # The schema may have been migrated underneath the caches
+    groups_cache.invalidate()
+    preferences_cache.invalidate()
+
+def change_horizon():
+    """Cutoff for pruning tombstones; delta sync always answers cursors newer than this."""
+    return datetime.now(timezone.utc) - TOMBSTONE_RETENTION
+
+def _check_history(group, since):
+    """Raise ChangesExpired if a tombstone newer than `since` was pruned from the group."""
+    # Only tombstones older than the horizon are pruned, so newer cursors need no lookup
+    if since >= change_horizon():
+        return
+    pruned_through = _require_storage().pruned_through(group['id'])
+    if pruned_through is not None and since < pruned_through:
+        raise ChangesExpired(f"{since.isoformat()} is older than the retained change history")
+
+def prune_tombstones():
+    """Delete tombstones past TOMBSTONE_RETENTION; returns how many, or None on failure."""
+    try:
+        pruned = _require_storage().prune_tombstones(change_horizon())
+    except Exception as e:
+        logger.exception("Error pruning tombstones: %s", e)
         return None
+    if pruned:
+        logger.info("Pruned %d expired tombstones", pruned)
+    return pruned
 
-def get_preferences():
-    """Fetch all preferences from the database."""
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Failed to get database connection")
-        return []
-        
+def _prune_tombstones_if_due():
+    global _next_prune
+    now = time.monotonic()
+    if now < _next_prune:
+        return
+    _next_prune = now + TOMBSTONE_PRUNE_INTERVAL
+    prune_tombstones()
+
+def describe_schema():
+    """Describe the preferences table ({'table_exists', 'columns', ...}); raises on failure."""
+    return _require_storage().describe_schema()
+
+def reset_preferences():
+    """Delete every preference, tombstone and summary in every group (benchmark seeding)."""
+    _require_storage().reset_preferences()
+    preferences_cache.invalidate()
+    change_feed.publish()
+
+def get_group(slug):
+    """Return a group as {'id', 'slug', 'name', 'members', 'member_ids'}, or None.
+
+    `members` lists member names in display order and `member_ids` maps each
+    name to its id. Groups are cached per slug; the returned dict is shared
+    with the cache and must not be mutated. None means the group does not
+    exist or could not be loaded.
+    """
+    if not slug or not GROUP_SLUG_PATTERN.match(slug):
+        return None
+    return groups_cache.get(slug, lambda: _fetch_group(slug))
+
+def _fetch_group(slug):
+    try:
+        found = _require_storage().fetch_group(slug)
+    except Exception as e:
+        logger.exception("Error fetching group %s: %s", slug, e)
+        return None
+    if found is None:
+        return None
+    group_id, name, members = found
+    return {
+        'id': group_id,
+        'slug': slug,
+        'name': name,
+        'members': [member for _, member in members],
+        'member_ids': {member: member_id for member_id, member in members},
+    }
+
+def create_group(slug, name, member_names):
+    """Create a group with its members; returns the group dict or None on failure.
+
+    Fails (None) if the slug is already taken. Inputs must already be validated.
+    """
+    try:
+        group_id = _require_storage().create_group(slug, name, member_names)
+        if group_id is None:
+            logger.warning("Group %s already exists", slug)
+            return None
+        logger.info("Created group %s with %d members", slug, len(member_names))
+    except Exception as e:
+        logger.exception("Error creating group %s: %s", slug, e)
+        return None
+    groups_cache.invalidate(slug)
+    return get_group(slug)
+
+def add_members(group, member_names):
+    """Append members to a group, skipping names it already has.
+
+    Returns the refreshed group dict, or None on failure.
+    """
+    try:
+        _require_storage().add_members(group['id'], member_names)
+    except Exception as e:
+        logger.exception("Error adding members to group %s: %s", group['slug'], e)
+        return None
+    groups_cache.invalidate(group['slug'])
+    return get_group(group['slug'])
+
+def get_preferences(group, start_date=None, end_date=None):
+    """Fetch a group's preferences, optionally limited to an inclusive date range.
+
+    Results are served from the in-process cache while fresh. The returned
+    list is shared with the cache and must not be mutated.
+    """
+    key = f"range:{start_date}:{end_date}" if start_date or end_date else 'all'
+    results = preferences_cache.get(key, lambda: _fetch_preferences(group['id'], start_date, end_date),
+                                    scope=group['id'])
+    return results if results is not None else []
+
+def get_preferences_version(group):
+    """Return this process's cache version for a group's preference data (not a storage data version)."""
+    return preferences_cache.version_of(group['id'])
+
+def get_preferences_snapshot(group, start_date=None, end_date=None):
+    """Return (data_version, rows) for a group's preferences in a range, or None on failure.
+
+    The data version is read before the rows, so the rows are never older
+    than it: a change-feed cursor or If-Match base taken from it may replay a
+    change the rows already show, but never misses one. Cached like
+    get_preferences(); the result must not be mutated.
+    """
+    key = f"snapshot:{start_date}:{end_date}"
+    return preferences_cache.get(key, lambda: _fetch_snapshot(group['id'], start_date, end_date), scope=group['id'])
+
+def _fetch_snapshot(group_id, start_date, end_date):
+    try:
+        latest = _require_storage().data_version(group_id)
+    except Exception as e:
+        logger.exception("Error fetching data version: %s", e)
+        return None
+    rows = _fetch_preferences(group_id, start_date, end_date)
+    if rows is None:
+        return None
+    return (to_version(latest) if latest else 0), rows
+
+def _fetch_preferences(group_id, start_date=None, end_date=None):
+    """Fetch preferences from storage; returns None on failure."""
+    try:
+        results = _require_storage().fetch_preferences(group_id, start_date, end_date)
+    except Exception as e:
+        logger.exception("Error fetching preferences: %s", e)
+        return None
+
+    # Convert date objects to strings for JSON serialization
+    for row in results:
+        row['event_date'] = row['event_date'].isoformat()
+
+    logger.debug("Retrieved %d preferences", len(results))
+    return results
+
+def get_summary(group, start_date, end_date):
+    """Aggregate a group's preferences between two dates (whole months), or None on failure.
+
+    Reads the summary tables the storage backend maintains on every write,
+    so the cost grows with the months and marked days in range, not with the
+    size of the preferences table. Returns {'users': {name: {'no',
+    'prefer_not', 'months': {'YYYY-MM': {'no', 'prefer_not'}}}}, 'days':
+    {'YYYY-MM-DD': {'no', 'prefer_not'}}, 'totals': {...}} where `users` has
+    every member, `months` and `days` only those with marks, and `totals`
+    counts the days in range, days nobody marked and days nobody said no.
+    Cached like get_preferences(); the result must not be mutated.
+    """
+    key = f"summary:{start_date}:{end_date}"
+    return preferences_cache.get(key, lambda: _fetch_summary(group, start_date, end_date), scope=group['id'])
+
+def _fetch_summary(group, start_date, end_date):
+    try:
+        summary = _require_storage().fetch_summary(group['id'], start_date.isoformat(), end_date.isoformat())
+    except Exception as e:
+        logger.exception("Error fetching preference summary: %s", e)
+        return None
+
+    users = {name: {**dict.fromkeys(VALID_PREFERENCE_TYPES, 0), 'months': {}} for name in group['members']}
+    for row in summary['months']:
+        user = users.get(row['user_name'])
+        if user is None:
+            continue
+        month = user['months'].setdefault(row['month'].isoformat()[:7], dict.fromkeys(VALID_PREFERENCE_TYPES, 0))
+        month[row['preference_type']] = row['days']
+        user[row['preference_type']] += row['days']
+    days = {row['event_date'].isoformat(): {'no': row['no'], 'prefer_not': row['prefer_not']}
+            for row in summary['days']}
+    num_days = (end_date - start_date).days + 1
+    return {
+        'users': users,
+        'days': days,
+        'totals': {
+            'days': num_days,
+            'clear_days': num_days - len(days),
+            'days_without_no': num_days - sum(1 for counts in days.values() if counts['no']),
+        },
+    }
+
+def _change_delta(since, rows):
+    """Build the {'version', 'changes'} payload for rows from Storage.select_changes()."""
+    latest = max([since] + [row['changed_at'] for row in rows])
+    changes = [{
+        'user_name': row['user_name'],
+        'event_date': row['event_date'].isoformat(),
+        'preference_type': row['preference_type'],
+        'changed_at': row['changed_at'].isoformat(),
+    } for row in rows]
+    return {'version': to_version(latest), 'changes': changes}
+
+def get_preference_changes(group, since, start_date=None, end_date=None):
+    """Return a group's preference changes made after the `since` timestamp.
+
+    Returns {'version': int, 'changes': [...]} where each change carries
+    user_name, event_date, preference_type (None when cleared) and
+    changed_at, ordered oldest first so clients can apply them in sequence.
+    `version` is the cursor to pass back as the next `since`; it advances
+    to the start of the overlap window even when nothing changed, so an idle
+    client's cursor keeps up with the clock. Returns None on failure. Raises
+    ChangesExpired if cleared cells after `since` have since been pruned.
+    """
+    try:
+        _check_history(group, since)
+        rows = _require_storage().select_changes(group['id'], since - DELTA_OVERLAP, start_date, end_date)
+    except ChangesExpired:
+        raise
+    except Exception as e:
+        logger.exception("Error fetching preference changes: %s", e)
+        return None
+    logger.debug("Retrieved %d preference changes since %s", len(rows), since)
+    # Rows stamped before now - DELTA_OVERLAP have committed, and the next query re-reads the overlap anyway
+    return _change_delta(max(since, datetime.now(timezone.utc) - DELTA_OVERLAP), rows)
+
+def wait_for_changes(group, since, timeout, start_date=None, end_date=None):
+    """Long-poll variant of get_preference_changes().
+
+    Returns as soon as there is a change newer than `since` (changes inside
+    the overlap window alone don't count, or clients would spin), or with an
+    empty delta once `timeout` seconds have passed. Returns None on failure
+    and raises ChangesExpired like get_preference_changes().
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        # Read the counter before querying so a change landing mid-query still wakes us
+        sequence = change_feed.sequence()
+        delta = get_preference_changes(group, since, start_date, end_date)
+        if delta is None or any(datetime.fromisoformat(change['changed_at']) > since for change in delta['changes']):
+            return delta
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return delta
+        # NOTIFY wakes us while LISTEN is up; otherwise poll for other instances' writes
+        change_feed.wait(sequence, remaining if change_feed.listening else min(remaining, CHANGES_POLL_INTERVAL))
+
+def get_data_version(group):
+    """Return the version (latest change timestamp) of a group's stored data, or None."""
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-            cursor.execute("""
-                SELECT user_name, event_date, preference_type 
-                FROM preferences 
-                ORDER BY event_date, user_name
-            """)
-            results = [dict(row) for row in cursor.fetchall()]
-            
-            # Convert date objects to strings for JSON serialization
-            for row in results:
-                row['event_date'] = row['event_date'].strftime('%Y-%m-%d')
-                
-            logger.info(f"Successfully retrieved {len(results)} preferences")
-            return results
+        latest = _require_storage().data_version(group['id'])
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error fetching preferences: {e}\n{error_details}")
-        return []
-    finally:
-        conn.close()
-
-def save_preference(user_name, event_date_str, preference_type):
-    """Save or update a preference in the database."""
+        logger.exception("Error fetching data version: %s", e)
+        return None
+    return to_version(latest) if latest else 0
+
+def iter_preferences(group, start_date=None, end_date=None, batch_size=2000):
+    """Stream a group's preferences as row dicts, oldest date first.
+
+    The Postgres backend reads through a server-side cursor, so memory stays
+    flat however many rows there are and the pooled connection is held until
+    the generator is exhausted or closed. The query runs before the first
+    row is yielded and storage errors are raised, not swallowed, so callers
+    can prime the generator with next() to fail before a response has started.
+    """
+    for row in _require_storage().iter_preferences(group['id'], start_date, end_date, batch_size):
+        yield {'user_name': row['user_name'], 'event_date': row['event_date'].isoformat(),
+               'preference_type': row['preference_type']}
+
+def import_preferences(group, rows):
+    """Bulk-load preference rows for a group in one transaction.
+
+    `rows` yields (member_id, event_date, preference_type) with already
+    validated values; preference_type None clears the cell, and the last
+    row for a cell wins. Postgres streams the rows through COPY into a
+    staging table and merges them with one upsert and one delete. Returns
+    {'rows', 'upserted', 'cleared', 'unchanged'} or None on failure;
+    exceptions raised by `rows` (e.g. validation errors) roll the import
+    back and propagate.
+    """
+    store = get_storage()
+    if store is None:
+        return None
+    try:
+        result = store.import_rows(group['id'], rows)
+    except (StorageUnavailable, *store.errors) as e:
+        logger.exception("Error importing preferences: %s", e)
+        return None
+    logger.info("Imported %d preference rows", result['rows'], extra=dict(result, group=group['slug']))
+    if result['upserted'] or result['cleared']:
+        _preferences_changed(group)
+    return result
+
+def _preferences_changed(group):
+    preferences_cache.invalidate(scope=group['id'])
+    change_feed.publish()
+    _prune_tombstones_if_due()
+
+def save_preference(group, user_name, event_date_str, preference_type):
+    """Save or update a group member's preference.
+
+    Returns the stored row as a dict whose 'result' is 'inserted', 'updated'
+    or 'unchanged', or False if the preference could not be saved.
+    """
     # Validate inputs before attempting database operation
-    if not user_name or user_name not in VALID_USERS:
-        logger.error(f"Invalid user_name: {user_name}")
+    member_id = group['member_ids'].get(user_name)
+    if member_id is None:
+        logger.error("Invalid user_name: %s", user_name)
         return False
         
     if not event_date_str:
@@ -80,82 +441,126 @@ def save_preference(user_name, event_date_str, preference_type):
         return False
         
     if preference_type not in VALID_PREFERENCE_TYPES:
-        logger.error(f"Invalid preference_type: {preference_type}. Must be one of: {VALID_PREFERENCE_TYPES}")
+        logger.error("Invalid preference_type: %s. Must be one of: %s", preference_type, VALID_PREFERENCE_TYPES)
         return False
     
     # Convert date string to proper date format
     try:
         event_date = datetime.strptime(event_date_str, '%Y-%m-%d').date()
-        logger.info(f"Parsed date: {event_date}")
     except ValueError as e:
-        logger.error(f"Invalid date format: {event_date_str}. Error: {e}")
+        logger.error("Invalid date format: %s. Error: %s", event_date_str, e)
         return False
     
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Failed to get database connection")
-        return False
-        
     try:
-        with conn.cursor() as cursor:
-            # First try to delete any existing preference for this user and date
-            logger.info(f"Deleting existing preference for user={user_name}, date={event_date}")
-            cursor.execute("""
-                DELETE FROM preferences
-                WHERE user_name = %s AND event_date = %s
-            """, (user_name, event_date))
-            
-            # Then insert the new preference
-            logger.info(f"Inserting new preference: user={user_name}, date={event_date}, preference={preference_type}")
-            cursor.execute("""
-                INSERT INTO preferences (user_name, event_date, preference_type)
-                VALUES (%s, %s, %s)
-            """, (user_name, event_date, preference_type))
-            
-            logger.info("Preference saved successfully")
-            return True
+        result = _require_storage().save_preference(group['id'], member_id, event_date, preference_type)
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error saving preference: {e}\n{error_details}")
+        logger.exception("Error saving preference: %s", e)
         return False
-    finally:
-        conn.close()
 
-def delete_preference(user_name, event_date_str):
-    """Delete a preference from the database."""
+    saved = {
+        'result': result,
+        'user_name': user_name,
+        'event_date': event_date.isoformat(),
+        'preference_type': preference_type,
+    }
+    logger.info("Preference %s", result,
+                extra={'group': group['slug'], 'user_name': user_name,
+                       'event_date': saved['event_date'], 'preference_type': preference_type})
+    if result != 'unchanged':
+        _preferences_changed(group)
+    return saved
+
+def delete_preference(group, user_name, event_date_str):
+    """Delete a group member's preference."""
     # Validate inputs
-    if not user_name or not event_date_str:
-        logger.error(f"Missing required parameters: user_name={user_name}, event_date={event_date_str}")
+    member_id = group['member_ids'].get(user_name)
+    if member_id is None or not event_date_str:
+        logger.error("Missing required parameters: user_name=%s, event_date=%s", user_name, event_date_str)
         return False
     
     # Convert date string to proper date format
     try:
         event_date = datetime.strptime(event_date_str, '%Y-%m-%d').date()
-        logger.info(f"Parsed date: {event_date}")
     except ValueError as e:
-        logger.error(f"Invalid date format: {event_date_str}. Error: {e}")
+        logger.error("Invalid date format: %s. Error: %s", event_date_str, e)
         return False
     
-    conn = get_db_connection()
-    if not conn:
-        logger.error("Failed to get database connection")
-        return False
-        
     try:
-        with conn.cursor() as cursor:
-            logger.info(f"Deleting preference: user={user_name}, date={event_date}")
-            cursor.execute("""
-                DELETE FROM preferences
-                WHERE user_name = %s AND event_date = %s
-            """, (user_name, event_date))
-            
-            # Return True if a row was deleted
-            rows_affected = cursor.rowcount
-            logger.info(f"Deleted {rows_affected} preferences")
-            return rows_affected > 0
+        deleted = _require_storage().delete_preference(group['id'], member_id, event_date)
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error deleting preference: {e}\n{error_details}")
+        logger.exception("Error deleting preference: %s", e)
         return False
-    finally:
-        conn.close()
\ No newline at end of file
+
+    logger.info("Deleted %d preferences", int(deleted),
+                extra={'group': group['slug'], 'user_name': user_name, 'event_date': event_date_str})
+    if deleted:
+        _preferences_changed(group)
+    return deleted
+
+class ChangesExpired(Exception):
+    """A `since` cursor or base version predates a pruned tombstone; reload in full."""
+
+class PreferenceConflict(Exception):
+    """A conditional batch touched cells that changed after the caller's base version."""
+
+    def __init__(self, conflicts, delta):
+        super().__init__(f"{len(conflicts)} cell(s) changed since the base version")
+        self.conflicts = conflicts  # current state of the conflicting cells, as changes
+        self.delta = delta          # {'version', 'changes'} the caller has not seen yet
+
+def apply_preference_changes(group, changes, base_version=None):
+    """Apply many preference changes for one group in a single transaction.
+
+    `changes` is an iterable of (user_name, event_date, preference_type)
+    tuples with already-validated values, where `event_date` is a date and
+    a preference_type of None clears the preference. Returns a dict with
+    upserted/cleared/unchanged counts, or None if nothing could be applied.
+
+    With a `base_version` (the data version the caller last saw) the batch
+    is conditional: if any of its cells changed after that version nothing
+    is written and PreferenceConflict is raised; a base older than a pruned
+    tombstone raises ChangesExpired. Otherwise the result also
+    carries 'version' and 'changes' (see get_preference_changes) since the
+    base, so the caller catches up on other writers in the same round trip.
+    Writers for a group are serialized and stamp their changes after taking
+    the group's lock, so change times follow commit order and a version
+    never skips a committed change.
+    """
+    try:
+        if base_version is not None:
+            _check_history(group, from_version(base_version))
+        changes = list(changes)
+        member_ids = group['member_ids']
+        upserts = [(member_ids[user], day, ptype) for user, day, ptype in changes if ptype is not None]
+        clears = [(member_ids[user], day) for user, day, ptype in changes if ptype is None]
+        base = from_version(base_version) if base_version is not None else None
+        with _require_storage().batch(group['id']) as batch:
+            if base is not None:
+                unseen = batch.changes(base - DELTA_OVERLAP)
+                cells = {(user, day) for user, day, _ in changes}
+                conflicts = [row for row in unseen
+                             if row['changed_at'] > base and (row['user_name'], row['event_date']) in cells]
+                if conflicts:
+                    raise PreferenceConflict(_change_delta(base, conflicts)['changes'], _change_delta(base, unseen))
+            upserted = batch.upsert(upserts)
+            cleared = batch.clear(clears)
+            delta = None
+            if base is not None:
+                delta = _change_delta(base, batch.changes(base - DELTA_OVERLAP))
+        result = {
+            'upserted': upserted,
+            'cleared': cleared,
+            'unchanged': len(upserts) + len(clears) - upserted - cleared,
+        }
+        logger.info("Applied batch of %d preference changes", len(upserts) + len(clears),
+                    extra=dict(result, group=group['slug']))
+        if result['upserted'] or result['cleared']:
+            _preferences_changed(group)
+        if delta is not None:
+            result.update(delta)
+        return result
+    except (PreferenceConflict, ChangesExpired):
+        raise
+    except Exception as e:
+        logger.exception("Error applying preference batch: %s", e)
+        return None
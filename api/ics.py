@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+PRODID = '-//Camping Date Coordinator//EN'
+# view -> which events the feed contains
+VIEWS = ('all', 'free', 'blocked')
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Fold a content line into 75-octet pieces (RFC 5545 section 3.1)."""
+    if len(line.encode('utf-8')) <= 75:
+        return line
+    pieces = []
+    current, size, limit = [], 0, 75
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > limit:
+            pieces.append(''.join(current))
+            current, size, limit = [], 0, 74  # continuation lines start with a space
+        current.append(char)
+        size += char_size
+    pieces.append(''.join(current))
+    return '\r\n '.join(pieces)
+
+
+def runs(mask):
+    """Yield (offset, length) for each run of consecutive set bits in a day mask."""
+    while mask:
+        offset = (mask & -mask).bit_length() - 1
+        shifted = mask >> offset
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        yield offset, length
+        mask &= ~(((1 << length) - 1) << offset)
+
+
+def _events(grid, view, user):
+    """Yield (uid kind, summary, start offset, length) for the requested view."""
+    if user is not None:
+        for ptype, label in (('no', "can't make it"), ('prefer_not', 'would prefer not')):
+            for offset, length in runs(grid.plane(ptype, user)):
+                yield f"{user}-{ptype}", f"{user} {label}", offset, length
+        return
+    if view in ('all', 'free'):
+        for offset, length in runs(grid.free_mask()):
+            yield 'free', 'Everyone free', offset, length
+    if view in ('all', 'blocked'):
+        for member in grid.users:
+            for offset, length in runs(grid.plane('no', member)):
+                yield f"{member}-no", f"{member} can't make it", offset, length
+
+
+def build_calendar(grid, calendar_name, uid_prefix, dtstamp, view='all', user=None):
+    """Render a PreferenceGrid as an iCalendar feed of all-day events.
+
+    Consecutive days become one multi-day event. `view` picks free days,
+    blocked ("no") days or both; `user` instead lists one member's marks.
+    `dtstamp` (a UTC datetime) should come from the data, not the clock, so
+    identical data always renders identical bytes.
+    """
+    stamp = dtstamp.strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(calendar_name)}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        'X-PUBLISHED-TTL:PT1H',
+    ]
+    for kind, summary, offset, length in _events(grid, view, user):
+        start = grid.start_date + timedelta(days=offset)
+        end = start + timedelta(days=length)  # DTEND is exclusive for all-day events
+        lines.extend([
+            'BEGIN:VEVENT',
+            f'UID:{uid_prefix}-{kind}-{start:%Y%m%d}@camping-calendar',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{start:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{end:%Y%m%d}',
+            f'SUMMARY:{_escape(summary)}',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ])
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
@@ -1,16 +1,38 @@
+from . import startup  # first, so STARTUP_PROFILE can time every import below
+import io
 import os
-from flask import Flask, render_template, request, jsonify, session
-import calendar
-from datetime import datetime
+import csv
+import time
+import itertools
+import hashlib
+from functools import wraps
+from flask import Flask, Response, render_template, request, jsonify, session, make_response
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from datetime import datetime, timedelta, timezone
 import logging
-import traceback
 
-from .db import get_preferences, save_preference, delete_preference, get_db_connection
+from .db import (get_group, create_group, add_members, get_preferences, get_preferences_version,
+                 preferences_cache, groups_cache, save_preference, delete_preference, apply_preference_changes,
+                 get_preference_changes, wait_for_changes, get_summary, PreferenceConflict, ChangesExpired, import_preferences, iter_preferences,
+                 get_preferences_snapshot, from_version, init_schema, describe_schema, get_storage,
+                 get_pool_stats, warm_up_storage, DEFAULT_GROUP, GROUP_SLUG_PATTERN, MEMBER_NAME_PATTERN,
+                 MAX_GROUP_MEMBERS)
 from .auth import require_admin, auth_bp  # NEW
+from . import bulk, ics, metrics
+from .logging_config import configure_logging
+from .availability import best_windows
+from .cache import VersionedCache
+from .calendar_grid import (month_grid, week_header, parse_month, season_months, season_bounds,
+                            season_label)
+from .prefgrid import PreferenceGrid
 
-# Logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+startup.mark('imports')
+
+# Logging (single process-wide configuration, see logging_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
+startup.mark('logging')
 
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
@@ -25,93 +47,416 @@ app.config['SECRET_KEY'] = secret_key
 app.config['SESSION_COOKIE_SECURE'] = os.getenv('FLASK_ENV') != 'development'
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+# Share compiled templates between worker processes and restarts on a persistent disk.
+# No help on Vercel: /tmp is per instance and starts empty, so a cold start compiles anyway.
+template_cache_dir = os.getenv('TEMPLATE_CACHE_DIR')
+if template_cache_dir:
+    os.makedirs(template_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(template_cache_dir)
 
 # Register auth blueprint
 app.register_blueprint(auth_bp)
+# Per-route latency, DB and template timings (see /metrics)
+metrics.init_app(app)
 
 # Constants
-USERS = ["Jack", "Payton", "Nick", "Alyssa"]
-MONTHS_YEAR = [(2025, m) for m in range(5, 9)]  # May to August 2025
+# Default season, configurable as YYYY-MM via SEASON_START/SEASON_END (May to August 2025)
+MONTHS_YEAR = season_months(parse_month(os.getenv('SEASON_START', '2025-05')),
+                            parse_month(os.getenv('SEASON_END', '2025-08')))
+FIRST_WEEKDAY = int(os.getenv('CALENDAR_FIRST_WEEKDAY', '6'))  # 0 = Monday ... 6 = Sunday
 VALID_PREFERENCES = ['prefer_not', 'no', 'clear']
+# Upper bound on expanded (user, day) cells per batch request
+MAX_BATCH_CELLS = 1000
+# Longest date range the availability engine will scan in one request
+MAX_AVAILABILITY_DAYS = 3660
+# Public read-only page: let the edge serve it briefly and revalidate in the background
+PAGE_CACHE_CONTROL = os.getenv('PAGE_CACHE_CONTROL', 'public, max-age=0, s-maxage=10, stale-while-revalidate=60')
+# Changes on every deploy so template edits invalidate page ETags
+DEPLOYMENT_ID = os.getenv('VERCEL_DEPLOYMENT_ID') or os.getenv('VERCEL_GIT_COMMIT_SHA', '')
+# Browsers/CDN must revalidate, but a matching ETag gets a bodyless 304
+PREFERENCES_CACHE_CONTROL = os.getenv('PREFERENCES_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+# Calendar apps poll feeds often; let the edge answer most of them
+ICS_CACHE_CONTROL = os.getenv('ICS_CACHE_CONTROL', 'public, max-age=0, s-maxage=60, stale-while-revalidate=300')
+# How long GET /api/changes holds a request open; keep it under the platform's function timeout
+CHANGES_TIMEOUT = float(os.getenv('CHANGES_TIMEOUT', '8'))
+# Data versions are microseconds since epoch; 17 digits reach past year 5000
+MAX_VERSION_DIGITS = 17
 
-def get_calendar_data(year, month):
-    try:
-        calendar.setfirstweekday(6)  # Sunday
-        month_calendar = calendar.monthcalendar(year, month)
-        month_name = calendar.month_name[month]
-        days = [day for week in month_calendar for day in week if day != 0]
-        return {"year": year, "month": month, "month_name": month_name, "days": days, "calendar_grid": month_calendar}
-    except Exception as e:
-        logger.error(f"Error generating calendar data: {e}")
+# Ranked windows keyed on the preference data version and query parameters
+availability_cache = VersionedCache('availability', ttl=float(os.getenv('AVAILABILITY_CACHE_TTL', '300')),
+                                    max_entries=256)
+
+# Compact preference grids keyed on the preference data version and range
+grid_cache = VersionedCache('grid', ttl=float(os.getenv('AVAILABILITY_CACHE_TTL', '300')), max_entries=32)
+
+def get_preference_grid(group, start_date, end_date):
+    """Return (data_version, grid) for a group covering [start_date, end_date].
+
+    The PreferenceGrid is cached and shared (do not mutate). It is keyed on
+    the data version of the rows it was built from (see
+    get_preferences_snapshot), which is returned so anything derived from the
+    grid can be keyed alike; it is None if storage could not be read.
+    """
+    start_str, end_str = start_date.isoformat(), end_date.isoformat()
+    data_version, raw_prefs = get_preferences_snapshot(group, start_str, end_str) or (None, [])
+    grid = grid_cache.get((data_version, tuple(group['members']), start_str, end_str),
+                          lambda: PreferenceGrid.from_rows(raw_prefs, group['members'], start_date, end_date),
+                          scope=group['id'])
+    return data_version, grid
+
+# Rendered month fragments, keyed on the month's own slice of the grid so an
+# edit only re-renders the month it touched
+month_fragment_cache = VersionedCache('month_fragments', ttl=float(os.getenv('FRAGMENT_CACHE_TTL', '3600')),
+                                      max_entries=128)
+
+def render_month_fragment(month_data, grid):
+    """Return the cached HTML for one month's calendar."""
+    month_start, month_end = season_bounds(((month_data.year, month_data.month),))
+    key = (month_data.year, month_data.month, FIRST_WEEKDAY, grid.slice(month_start, month_end).fingerprint())
+    return month_fragment_cache.get(key, lambda: Markup(render_template(
+        '_month.html', month_data=month_data, preferences=grid, week_header=week_header(FIRST_WEEKDAY))))
+
+def group_route(view):
+    """Resolve the <group_slug> URL part (DEFAULT_GROUP when absent) into a `group` argument.
+
+    Unknown groups get a 404 before the view runs.
+    """
+    @wraps(view)
+    def wrapper(group_slug=None, **kwargs):
+        group = get_group(group_slug or DEFAULT_GROUP)
+        if group is None:
+            return jsonify({"status": "error", "message": "Group not found"}), 404
+        return view(group, **kwargs)
+    return wrapper
+
+# Rendered ICS feeds, keyed like the grids they come from so writes invalidate them
+ics_cache = VersionedCache('ics', ttl=float(os.getenv('ICS_CACHE_TTL', '3600')), max_entries=256)
+
+def render_feed(group, grid, data_version, view, user):
+    """Render an ICS feed; returns {'body', 'etag'} or None if the data version is unavailable."""
+    if data_version is None:
         return None
+    body = ics.build_calendar(grid, group['name'] if not user else f"{group['name']}: {user}", group['slug'],
+                              from_version(data_version), view, user).encode('utf-8')
+    return {'body': body, 'etag': hashlib.sha1(body).hexdigest()}
 
-def process_preferences(raw_preferences):
-    processed = {}
-    try:
-        for pref in raw_preferences:
-            event_date = pref['event_date']
-            user = pref['user_name']
-            ptype = pref['preference_type']
-            processed.setdefault(event_date, {})[user] = ptype
-    except Exception as e:
-        logger.error(f"Error processing preferences: {e}")
-    return processed
+def requested_season():
+    """Season months from the `from`/`to` (YYYY-MM) query params, else the default.
+
+    Raises ValueError for malformed or oversized ranges.
+    """
+    start_str = request.args.get('from')
+    end_str = request.args.get('to')
+    if not start_str and not end_str:
+        return MONTHS_YEAR
+    start = parse_month(start_str) if start_str else MONTHS_YEAR[0]
+    end = parse_month(end_str) if end_str else start
+    return season_months(start, end)
 
 def validate_date_format(date_str):
     try:
         datetime.strptime(date_str, '%Y-%m-%d')
         return True
-    except ValueError:
+    except (TypeError, ValueError):  # TypeError: not a string, e.g. a JSON number
         return False
 
+def parse_version(value):
+    """Parse a data version (microseconds since epoch); None unless plain ASCII digits in range."""
+    # str.isdigit() also accepts digits like "²", and 18+ digits run past datetime's year 9999
+    if value.isascii() and value.isdigit() and len(value) <= MAX_VERSION_DIGITS:
+        return int(value)
+    return None
+
+def parse_since(value):
+    """Parse a `since` cursor: an integer version or an ISO-8601 timestamp."""
+    version = parse_version(value)
+    if version is not None:
+        return from_version(version)
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since
+
+def changes_expired(error):
+    """410 for a cursor or base version older than the retained change history."""
+    return jsonify({"status": "error", "message": f"{error}; reload the full data"}), 410
+
+def expand_batch_changes(raw_changes, users):
+    """Validate a batch payload and expand date ranges into per-day changes.
+
+    Each change needs `user_name`, `preference_type` and either `event_date`
+    or an inclusive `start_date`/`end_date` range. Returns (changes, errors):
+    changes maps (user_name, date) -> preference_type (None for 'clear'),
+    with later entries overriding earlier ones for the same cell.
+    """
+    changes = {}
+    errors = []
+    if not isinstance(raw_changes, list) or not raw_changes:
+        return changes, ["'changes' must be a non-empty list"]
+
+    for index, change in enumerate(raw_changes):
+        if not isinstance(change, dict):
+            errors.append(f"changes[{index}]: must be an object")
+            continue
+        user_name = change.get('user_name')
+        preference_type = change.get('preference_type')
+        if user_name not in users:
+            errors.append(f"changes[{index}]: invalid user_name. Must be one of: {', '.join(users)}")
+            continue
+        if preference_type not in VALID_PREFERENCES:
+            errors.append(f"changes[{index}]: invalid preference_type. Must be one of: {', '.join(VALID_PREFERENCES)}")
+            continue
+
+        if change.get('event_date'):
+            start_str = end_str = change['event_date']
+        else:
+            start_str, end_str = change.get('start_date'), change.get('end_date')
+        if not start_str or not end_str:
+            errors.append(f"changes[{index}]: provide event_date or start_date and end_date")
+            continue
+        if not validate_date_format(start_str) or not validate_date_format(end_str):
+            errors.append(f"changes[{index}]: invalid date format. Use YYYY-MM-DD")
+            continue
+        start = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end = datetime.strptime(end_str, '%Y-%m-%d').date()
+        if end < start:
+            errors.append(f"changes[{index}]: end_date is before start_date")
+            continue
+        if len(changes) + (end - start).days + 1 > MAX_BATCH_CELLS:
+            errors.append(f"Batch expands to more than {MAX_BATCH_CELLS} day changes")
+            break
+
+        value = None if preference_type == 'clear' else preference_type
+        day = start
+        while day <= end:
+            changes[(user_name, day)] = value
+            day += timedelta(days=1)
+    return changes, errors
+
 @app.route('/')
 def index():
     try:
-        raw_prefs = get_preferences()
-        processed_prefs = process_preferences(raw_prefs)
-        calendar_months_data = [get_calendar_data(y, m) for y, m in MONTHS_YEAR]
+        months = requested_season()
+    except ValueError as e:
+        return f"Invalid season: {e}", 400
+    try:
+        group = get_group(request.args.get('group') or DEFAULT_GROUP)
+        if group is None:
+            return "Group not found", 404
+        data_version, preference_grid = get_preference_grid(group, *season_bounds(months))
         # Pass a boolean the client can use to render UI state
         is_admin = bool(session.get("is_admin"))
-        return render_template('index.html',
-                               users=USERS,
-                               preferences=processed_prefs,
-                               calendar_months=calendar_months_data,
-                               is_admin=is_admin)
+        # The page embeds data_version as its change-feed cursor, so a new version is a new page
+        etag = hashlib.sha1(repr((DEPLOYMENT_ID, group['slug'], group['name'], months, FIRST_WEEKDAY, is_admin,
+                                  data_version, preference_grid.fingerprint())).encode('utf-8')).hexdigest()
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            month_fragments = [render_month_fragment(month_grid(y, m, FIRST_WEEKDAY), preference_grid)
+                               for y, m in months]
+            response = make_response(render_template('index.html',
+                                                     group=group,
+                                                     users=group['members'],
+                                                     month_fragments=month_fragments,
+                                                     season_label=season_label(months),
+                                                     season_bounds=season_bounds(months),
+                                                     data_version=data_version,
+                                                     is_admin=is_admin))
+        response.set_etag(etag)
+        # Only anonymous, read-only views may be shared by the edge cache
+        if is_admin or app.config['SESSION_COOKIE_NAME'] in request.cookies:
+            response.headers['Cache-Control'] = 'private, no-cache'
+        else:
+            response.headers['Cache-Control'] = PAGE_CACHE_CONTROL
+        response.vary.add('Cookie')
+        return response
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error rendering index page: {e}\n{error_details}")
+        logger.exception("Error rendering index page: %s", e)
         return "An error occurred loading the page. Please check server logs.", 500
 
+@app.route('/calendar.ics')
+def calendar_feed():
+    """iCalendar feed of free and blocked days (?group=, ?view=all|free|blocked, ?user=)."""
+    try:
+        months = requested_season()
+    except ValueError as e:
+        return f"Invalid season: {e}", 400
+    view = request.args.get('view', 'all')
+    user = request.args.get('user') or None
+    if view not in ics.VIEWS:
+        return f"Invalid view. Must be one of: {', '.join(ics.VIEWS)}", 400
+    try:
+        group = get_group(request.args.get('group') or DEFAULT_GROUP)
+        if group is None:
+            return "Group not found", 404
+        if user is not None and user not in group['member_ids']:
+            return "Unknown user", 404
+        version, grid = get_preference_grid(group, *season_bounds(months))
+        key = (version, tuple(group['members']), months, view, user)
+        feed = ics_cache.get(key, lambda: render_feed(group, grid, version, view, user), scope=group['id'])
+        if feed is None:
+            return "Failed to build calendar feed", 500
+        response = make_response(feed['body'])
+        response.headers['Content-Type'] = 'text/calendar; charset=utf-8'
+        response.headers['Content-Disposition'] = f'inline; filename="{group["slug"]}.ics"'
+        response.headers['Cache-Control'] = ICS_CACHE_CONTROL
+        response.set_etag(feed['etag'])
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.exception("Error building calendar feed: %s", e)
+        return "An error occurred building the calendar feed.", 500
+
 # --- API: READ (public) ---
 @app.route('/api/preferences', methods=['GET'])
-def get_all_preferences_api():
+@app.route('/api/groups/<group_slug>/preferences', methods=['GET'])
+@group_route
+def get_all_preferences_api(group):
+    start_date = request.args.get('from')
+    end_date = request.args.get('to')
+    since_str = request.args.get('since')
+    for value in (start_date, end_date):
+        if value and not validate_date_format(value):
+            return jsonify({"status": "error", "message": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+    if since_str:
+        try:
+            since = parse_since(since_str)
+        except (ValueError, OverflowError):
+            return jsonify({"status": "error", "message": "Invalid since. Use a version number or ISO-8601 timestamp"}), 400
+        try:
+            delta = get_preference_changes(group, since, start_date, end_date)
+        except ChangesExpired as e:
+            return changes_expired(e)
+        if delta is None:
+            return jsonify({"status": "error", "message": "Failed to fetch preference changes"}), 500
+        response = jsonify(delta)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
     try:
-        raw_prefs = get_preferences()
-        logger.info(f"Successfully fetched {len(raw_prefs)} preferences")
-        return jsonify(raw_prefs)
+        raw_prefs = get_preferences(group, start_date, end_date)
+        version = get_preferences_version(group)
+        logger.debug("Fetched %d preferences", len(raw_prefs))
+        response = jsonify(raw_prefs)
+        # Content-derived ETag so every serverless instance agrees on it
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        response.headers['Cache-Control'] = PREFERENCES_CACHE_CONTROL
+        # This instance's cache counter, for debugging; not a data version usable in If-Match
+        response.headers['X-Cache-Generation'] = str(version)
+        return response.make_conditional(request)
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error fetching preferences via API: {e}\n{error_details}")
+        logger.exception("Error fetching preferences via API: %s", e)
         return jsonify({"status": "error", "message": "Failed to fetch preferences"}), 500
 
+@app.route('/api/changes', methods=['GET'])
+@app.route('/api/groups/<group_slug>/changes', methods=['GET'])
+@group_route
+def changes_api(group):
+    """Long-poll for preference changes after `since`; returns {version, changes}."""
+    start_date = request.args.get('from')
+    end_date = request.args.get('to')
+    for value in (start_date, end_date):
+        if value and not validate_date_format(value):
+            return jsonify({"status": "error", "message": "Invalid date format. Use YYYY-MM-DD"}), 400
+    try:
+        since = parse_since(request.args.get('since', ''))
+    except (ValueError, OverflowError):
+        return jsonify({"status": "error", "message": "Invalid since. Use a version number or ISO-8601 timestamp"}), 400
+    try:
+        timeout = float(request.args.get('timeout', CHANGES_TIMEOUT))
+    except ValueError:
+        timeout = -1.0
+    if not timeout >= 0:  # also rejects NaN
+        return jsonify({"status": "error", "message": "timeout must be a non-negative number of seconds"}), 400
+    timeout = min(timeout, CHANGES_TIMEOUT)
+
+    try:
+        delta = wait_for_changes(group, since, timeout, start_date, end_date)
+    except ChangesExpired as e:
+        return changes_expired(e)
+    if delta is None:
+        return jsonify({"status": "error", "message": "Failed to fetch preference changes"}), 500
+    response = jsonify(delta)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/summary', methods=['GET'])
+@app.route('/api/groups/<group_slug>/summary', methods=['GET'])
+@group_route
+def summary_api(group):
+    """Per-member and per-day mark counts over a season (?from=/&to= YYYY-MM, as on the page)."""
+    try:
+        months = requested_season()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid season: {e}"}), 400
+    start_date, end_date = season_bounds(months)
+    summary = get_summary(group, start_date, end_date)
+    if summary is None:
+        return jsonify({"status": "error", "message": "Failed to fetch summary"}), 500
+    version = get_preferences_version(group)
+    response = jsonify({"status": "success", "from": start_date.isoformat(),
+                        "to": end_date.isoformat(), **summary})
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.headers['Cache-Control'] = PREFERENCES_CACHE_CONTROL
+    response.headers['X-Cache-Generation'] = str(version)
+    return response.make_conditional(request)
+
+@app.route('/api/availability/best-windows', methods=['GET'])
+@app.route('/api/groups/<group_slug>/availability/best-windows', methods=['GET'])
+@group_route
+def best_windows_api(group):
+    season_start, season_end = season_bounds(MONTHS_YEAR)
+    start_str = request.args.get('from', season_start.isoformat())
+    end_str = request.args.get('to', season_end.isoformat())
+    if not validate_date_format(start_str) or not validate_date_format(end_str):
+        return jsonify({"status": "error", "message": "Invalid date format. Use YYYY-MM-DD"}), 400
+    try:
+        length = int(request.args.get('length', 3))
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"status": "error", "message": "length and limit must be integers"}), 400
+
+    start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+    num_days = (end_date - start_date).days + 1
+    if num_days < 1 or num_days > MAX_AVAILABILITY_DAYS:
+        return jsonify({"status": "error", "message": f"Date range must span 1 to {MAX_AVAILABILITY_DAYS} days"}), 400
+    if length < 1 or length > num_days:
+        return jsonify({"status": "error", "message": "length must be between 1 and the number of days in range"}), 400
+    if limit < 1 or limit > 100:
+        return jsonify({"status": "error", "message": "limit must be between 1 and 100"}), 400
+
+    try:
+        version, grid = get_preference_grid(group, start_date, end_date)
+        key = (version, tuple(group['members']), start_str, end_str, length, limit)
+        windows = availability_cache.get(key, lambda: best_windows(grid, length, limit), scope=group['id'])
+        return jsonify({"status": "success", "length": length, "from": start_str, "to": end_str,
+                        "version": version, "windows": windows})
+    except Exception as e:
+        logger.exception("Error computing best windows: %s", e)
+        return jsonify({"status": "error", "message": "Failed to compute availability"}), 500
+
 # --- API: WRITE (protected) ---
 @app.route('/api/preferences', methods=['POST'])
+@app.route('/api/groups/<group_slug>/preferences', methods=['POST'])
 @require_admin
-def update_preferences():
+@group_route
+def update_preferences(group):
     data = request.get_json()
-    if not data:
-        logger.warning("Invalid request body - empty or not JSON")
+    if not data or not isinstance(data, dict):
+        logger.warning("Invalid request body - empty or not a JSON object")
         return jsonify({"status": "error", "message": "Invalid request body"}), 400
 
     user_name = data.get('user_name')
     event_date_str = data.get('event_date')
     preference_type = data.get('preference_type')
-    logger.info(f"Preference update request: user={user_name}, date={event_date_str}, pref={preference_type}")
+    logger.debug("Preference update request: user=%s, date=%s, pref=%s", user_name, event_date_str, preference_type)
 
     if not user_name:
         return jsonify({"status": "error", "message": "Missing user_name"}), 400
-    if user_name not in USERS:
-        return jsonify({"status": "error", "message": f"Invalid user_name. Must be one of: {', '.join(USERS)}"}), 400
+    if not isinstance(user_name, str) or user_name not in group['member_ids']:
+        return jsonify({"status": "error", "message": f"Invalid user_name. Must be one of: {', '.join(group['members'])}"}), 400
     if not event_date_str:
         return jsonify({"status": "error", "message": "Missing event_date"}), 400
     if not validate_date_format(event_date_str):
@@ -121,137 +466,291 @@ def update_preferences():
 
     try:
         if preference_type == 'clear':
-            success = delete_preference(user_name, event_date_str)
+            success = delete_preference(group, user_name, event_date_str)
             if success:
-                logger.info(f"Successfully cleared preference: {user_name}, {event_date_str}")
                 return jsonify({"status": "success", "message": "Preference cleared"})
             else:
-                logger.info(f"No preference found to clear: {user_name}, {event_date_str}")
                 return jsonify({"status": "success", "message": "Preference not found or already clear"})
         else:
-            logger.info(f"Attempting to save preference: {user_name}, {event_date_str}, {preference_type}")
-            success = save_preference(user_name, event_date_str, preference_type)
-            if success:
-                logger.info(f"Successfully saved preference: {user_name}, {event_date_str}, {preference_type}")
-                return jsonify({"status": "success", "message": "Preference saved"})
+            saved = save_preference(group, user_name, event_date_str, preference_type)
+            if saved:
+                message = "Preference unchanged" if saved['result'] == 'unchanged' else "Preference saved"
+                preference = {k: saved[k] for k in ('user_name', 'event_date', 'preference_type')}
+                return jsonify({"status": "success", "message": message, "result": saved['result'],
+                                "preference": preference})
             else:
-                logger.error(f"Failed to save preference: {user_name}, {event_date_str}, {preference_type}")
+                logger.error("Failed to save preference: %s, %s, %s", user_name, event_date_str, preference_type)
                 return jsonify({"status": "error", "message": "Failed to save preference to database"}), 500
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error processing preference update: {e}\n{error_details}")
+        logger.exception("Error processing preference update: %s", e)
         return jsonify({"status": "error", "message": "An internal server error occurred", "error": str(e)}), 500
 
+@app.route('/api/preferences/batch', methods=['POST'])
+@app.route('/api/groups/<group_slug>/preferences/batch', methods=['POST'])
+@require_admin
+@group_route
+def update_preferences_batch(group):
+    """Apply a batch of changes; `If-Match: "<version>"` makes it conditional.
+
+    A conditional batch is rejected with 412 if any of its cells changed
+    after that data version. Both outcomes return the changes the client has
+    not seen and the new `version` to send next time.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        logger.warning("Invalid batch request body - empty or not a JSON object")
+        return jsonify({"status": "error", "message": "Invalid request body"}), 400
+
+    base_version = None
+    # Checked against the raw header: an unparseable If-Match must not turn into an unconditional write
+    if request.headers.get('If-Match') and not request.if_match.star_tag:
+        tags = request.if_match.as_set()
+        base_version = parse_version(next(iter(tags))) if len(tags) == 1 else None
+        if base_version is None:
+            return jsonify({"status": "error", "message": 'Invalid If-Match. Use one data version, e.g. "1718000000000000"'}), 400
+
+    changes, errors = expand_batch_changes(data.get('changes'), group['members'])
+    if errors:
+        return jsonify({"status": "error", "message": "Invalid batch", "errors": errors}), 400
+
+    logger.debug("Batch preference update request: %d day changes", len(changes))
+    try:
+        result = apply_preference_changes(group, [(user, day, ptype) for (user, day), ptype in changes.items()],
+                                          base_version)
+    except PreferenceConflict as e:
+        return jsonify({"status": "error", "message": "Some days were changed by someone else; nothing was saved",
+                        "conflicts": e.conflicts, **e.delta}), 412
+    except ChangesExpired as e:
+        return changes_expired(e)
+    if result is None:
+        return jsonify({"status": "error", "message": "Failed to apply batch to database"}), 500
+    applied = {key: result[key] for key in ('upserted', 'cleared', 'unchanged')}
+    response = jsonify({"status": "success", "message": f"Applied {len(changes)} changes", "applied": applied,
+                        **{key: result[key] for key in ('version', 'changes') if key in result}})
+    if 'version' in result:
+        response.set_etag(str(result['version']))
+    return response
+
+@app.route('/api/preferences/import', methods=['POST'])
+@app.route('/api/groups/<group_slug>/preferences/import', methods=['POST'])
+@require_admin
+@group_route
+def import_preferences_api(group):
+    """Bulk-load a CSV or NDJSON request body (user_name, event_date, preference_type)."""
+    fmt = bulk.format_for(request.args.get('format'), request.mimetype)
+    if fmt is None:
+        return jsonify({"status": "error", "message": f"Unsupported format. Use one of: {', '.join(bulk.FORMATS)}"}), 400
+
+    # Parsed and validated line by line as the storage backend reads it (through COPY on Postgres)
+    text_stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    rows = bulk.validate_records(bulk.parse_records(text_stream, fmt), group['member_ids'])
+    try:
+        result = import_preferences(group, rows)
+    except (bulk.ImportRowError, csv.Error, UnicodeDecodeError) as e:
+        return jsonify({"status": "error", "message": f"Import rejected, nothing was changed: {e}"}), 400
+    if result is None:
+        return jsonify({"status": "error", "message": "Failed to import preferences"}), 500
+    return jsonify({"status": "success", "message": f"Imported {result['rows']} rows", "imported": result})
+
+@app.route('/api/preferences/export', methods=['GET'])
+@app.route('/api/groups/<group_slug>/preferences/export', methods=['GET'])
+@group_route
+def export_preferences_api(group):
+    """Stream a group's preferences as CSV (default) or NDJSON."""
+    fmt = bulk.format_for(request.args.get('format', 'csv'), None)
+    start_date = request.args.get('from')
+    end_date = request.args.get('to')
+    if fmt is None:
+        return jsonify({"status": "error", "message": f"Unsupported format. Use one of: {', '.join(bulk.FORMATS)}"}), 400
+    for value in (start_date, end_date):
+        if value and not validate_date_format(value):
+            return jsonify({"status": "error", "message": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+    rows = iter_preferences(group, start_date, end_date)
+    try:
+        # Run the query now so a database error is still a proper 500
+        first = next(rows, None)
+    except Exception as e:
+        logger.exception("Error exporting preferences: %s", e)
+        return jsonify({"status": "error", "message": "Failed to export preferences"}), 500
+    chunks = bulk.format_records(itertools.chain([first] if first else [], rows), fmt)
+    response = Response(chunks, content_type=bulk.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{group["slug"]}-preferences.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Hand the connection back promptly if the client goes away mid-stream
+    response.call_on_close(rows.close)
+    return response
+
+# --- API: GROUPS ---
+def validate_member_names(names, existing=()):
+    """Return an error message for a list of new member names, or None if they are valid."""
+    if not isinstance(names, list) or not names:
+        return "'members' must be a non-empty list of names"
+    for name in names:
+        if not isinstance(name, str) or not MEMBER_NAME_PATTERN.match(name):
+            return "Member names must be 1-50 letters or digits, starting with a letter"
+    if len(set(names)) + len(existing) > MAX_GROUP_MEMBERS:
+        return f"A group can have at most {MAX_GROUP_MEMBERS} members"
+    # Names key the calendar markup and CSS in lower case, so they must differ by more than case
+    if len({name.lower() for name in names}) != len(names):
+        return "Member names must be unique, ignoring case"
+    taken = {member.lower(): member for member in existing}
+    for name in names:
+        if taken.get(name.lower(), name) != name:
+            return f"Member name {name!r} clashes with existing member {taken[name.lower()]!r}"
+    return None
+
+@app.route('/api/groups/<group_slug>', methods=['GET'])
+@group_route
+def get_group_api(group):
+    return jsonify({"status": "success", "slug": group['slug'], "name": group['name'], "members": group['members']})
+
+@app.route('/api/groups', methods=['POST'])
+@require_admin
+def create_group_api():
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Invalid request body"}), 400
+    slug = data.get('slug')
+    name = data.get('name') or slug
+    members = data.get('members')
+    if not isinstance(slug, str) or not GROUP_SLUG_PATTERN.match(slug):
+        return jsonify({"status": "error", "message": "slug must be 1-64 lowercase letters, digits or dashes"}), 400
+    if not isinstance(name, str) or len(name) > 100:
+        return jsonify({"status": "error", "message": "name must be a string of at most 100 characters"}), 400
+    error = validate_member_names(members)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+    if get_group(slug) is not None:
+        return jsonify({"status": "error", "message": "A group with that slug already exists"}), 409
+
+    group = create_group(slug, name, members)
+    if group is None:
+        return jsonify({"status": "error", "message": "Failed to create group"}), 500
+    return jsonify({"status": "success", "slug": group['slug'], "name": group['name'],
+                    "members": group['members']}), 201
+
+@app.route('/api/groups/<group_slug>/members', methods=['POST'])
+@require_admin
+@group_route
+def add_members_api(group):
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Invalid request body"}), 400
+    members = data.get('members')
+    error = validate_member_names(members, group['members'])
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    updated = add_members(group, members)
+    if updated is None:
+        return jsonify({"status": "error", "message": "Failed to add members"}), 500
+    return jsonify({"status": "success", "slug": updated['slug'], "members": updated['members']})
+
 # --- Utility/diagnostics: protect everything that touches the DB or schema ---
 @app.route('/database-status')
 @require_admin
 def database_status():
     try:
-        prefs = get_preferences()
-        return jsonify({"status": "connected", "preferences_count": len(prefs), "message": "Database connection successful"})
+        group = get_group(DEFAULT_GROUP)
+        prefs = get_preferences(group) if group else []
+        return jsonify({"status": "connected", "preferences_count": len(prefs), "message": "Database connection successful",
+                        "backend": get_storage().name if group else None, "pool": get_pool_stats(), "cache": preferences_cache.stats(), "groups_cache": groups_cache.stats()})
     except Exception as e:
         return jsonify({"status": "error", "message": f"Database connection error: {str(e)}"}), 500
 
+@app.route('/database-pool')
+@require_admin
+def database_pool():
+    stats = get_pool_stats()
+    if stats is None:
+        return jsonify({"status": "error", "message": "Connection pool not initialized"}), 503
+    return jsonify({"status": "success", "pool": stats})
+
+@app.route('/metrics')
+@require_admin
+def metrics_endpoint():
+    body = metrics.render_prometheus(get_pool_stats())
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Cache-Control': 'no-store'}
+
 @app.route('/database-schema')
 @require_admin
 def database_schema():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"status": "error", "message": "Connection failed"}), 500
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'preferences')
-            """)
-            table_exists = cursor.fetchone()[0]
-            if not table_exists:
-                return jsonify({"status": "error", "message": "Table does not exist"}), 404
-
-            cursor.execute("""
-                SELECT column_name, data_type, is_nullable, column_default
-                FROM information_schema.columns
-                WHERE table_name = 'preferences'
-            """)
-            columns = [dict(zip(['column_name', 'data_type', 'is_nullable', 'column_default'], row)) for row in cursor.fetchall()]
-
-            cursor.execute("""
-                SELECT pgc.conname AS constraint_name, pg_get_constraintdef(pgc.oid) AS constraint_definition
-                FROM pg_constraint pgc
-                JOIN pg_namespace nsp ON nsp.oid = pgc.connamespace
-                JOIN pg_class cls ON pgc.conrelid = cls.oid
-                WHERE cls.relname = 'preferences' AND pgc.contype = 'c'
-            """)
-            check_constraints = [dict(zip(['constraint_name', 'constraint_definition'], row)) for row in cursor.fetchall()]
-
-            cursor.execute("""
-                SELECT tc.constraint_name, tc.constraint_type, kcu.column_name
-                FROM information_schema.table_constraints tc
-                JOIN information_schema.key_column_usage kcu ON tc.constraint_name = kcu.constraint_name
-                WHERE tc.table_name = 'preferences'
-            """)
-            constraints = [dict(zip(['constraint_name', 'constraint_type', 'column_name'], row)) for row in cursor.fetchall()]
-
-            return jsonify({"status": "success", "table_exists": table_exists, "columns": columns,
-                            "check_constraints": check_constraints, "constraints": constraints})
+        schema = describe_schema()
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error checking schema: {e}\n{error_details}")
+        logger.exception("Error checking schema: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
-    finally:
-        conn.close()
+    if not schema['table_exists']:
+        return jsonify({"status": "error", "message": "Table does not exist"}), 404
+    return jsonify({"status": "success", "backend": get_storage().name, **schema})
 
 @app.route('/test-insert')
 @require_admin
 def test_insert():
-    conn = get_db_connection()
-    if not conn:
+    group = get_group(DEFAULT_GROUP)
+    if group is None:
         return jsonify({"status": "error", "message": "Connection failed"}), 500
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""DELETE FROM preferences WHERE user_name = 'Jack' AND event_date = '2025-05-15'""")
-            cursor.execute("""INSERT INTO preferences (user_name, event_date, preference_type) VALUES ('Jack', '2025-05-15', 'prefer_not')""")
-            cursor.execute("""SELECT count(*) FROM preferences WHERE user_name = 'Jack' AND event_date = '2025-05-15'""")
-            count = cursor.fetchone()[0]
-            return jsonify({"status": "success", "message": "Test insert successful", "count": count})
-    except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Test insert failed: {e}\n{error_details}")
-        return jsonify({"status": "error", "message": "Test insert failed", "error": str(e)}), 500
-    finally:
-        conn.close()
+    if not group['members']:
+        return jsonify({"status": "error", "message": "Default group has no members"}), 500
+    user_name, event_date = group['members'][0], '2025-05-15'
+    delete_preference(group, user_name, event_date)
+    if not save_preference(group, user_name, event_date, 'prefer_not'):
+        return jsonify({"status": "error", "message": "Test insert failed"}), 500
+    count = sum(1 for row in get_preferences(group, event_date, event_date) if row['user_name'] == user_name)
+    return jsonify({"status": "success", "message": "Test insert successful", "count": count})
 
 @app.route('/init-database')
 @require_admin
 def init_database():
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({"status": "error", "message": "Database connection failed"}), 500
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS preferences (
-                    id SERIAL PRIMARY KEY,
-                    user_name VARCHAR(50) NOT NULL CHECK (user_name IN ('Jack', 'Payton', 'Nick', 'Alyssa')),
-                    event_date DATE NOT NULL,
-                    preference_type VARCHAR(20) NOT NULL CHECK (preference_type IN ('prefer_not', 'no')),
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_name, event_date)
-                )
-            """)
-            cursor.execute("""
-                SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'preferences')
-            """)
-            table_exists = cursor.fetchone()[0]
-            if table_exists:
-                return jsonify({"status": "success", "message": "Preferences table created successfully"})
-            else:
-                return jsonify({"status": "error", "message": "Failed to verify table creation"}), 500
+        init_schema()
+        table_exists = describe_schema()['table_exists']
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Database initialization failed: {e}\n{error_details}")
+        logger.exception("Database initialization failed: %s", e)
         return jsonify({"status": "error", "message": "Database initialization failed", "error": str(e)}), 500
-    finally:
-        conn.close()
+    if table_exists:
+        return jsonify({"status": "success", "message": "Preferences table created successfully"})
+    else:
+        return jsonify({"status": "error", "message": "Failed to verify table creation"}), 500
+
+# --- Cold start: warm-up hook and startup profile ---
+def warm_up():
+    """Open a database connection and pre-render the default page.
+
+    Rendering compiles the templates and fills the group, grid and month
+    fragment caches, so the first real request skips that work. Returns
+    per-step {'ok', 'ms'}; failures are logged, not raised.
+    """
+    steps = {}
+    start = time.perf_counter()
+    steps['database'] = {'ok': warm_up_storage()}
+    steps['database']['ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    try:
+        with app.test_request_context('/'):
+            response = app.make_response(index())
+        steps['page'] = {'ok': response.status_code == 200}
+    except Exception as e:
+        logger.exception("Warm-up page render failed: %s", e)
+        steps['page'] = {'ok': False}
+    steps['page']['ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return steps
+
+@app.route('/warmup')
+@require_admin
+def warmup():
+    """Keep-warm target for cron/uptime pings (send X-Admin-Password); cheap once the instance is warm."""
+    steps = warm_up()
+    ok = all(step['ok'] for step in steps.values())
+    return jsonify({"status": "success" if ok else "error", "steps": steps}), 200 if ok else 503, \
+        {'Cache-Control': 'no-store'}
+
+@app.route('/startup-profile')
+@require_admin
+def startup_profile():
+    return jsonify({"status": "success", "startup": startup.report()})
 
 # Optional extra route; now protected as well (if you keep it)
 @app.route('/tests')
@@ -260,11 +759,17 @@ def tests():
     try:
         return render_template('tests.html')
     except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error rendering tests page: {e}\n{error_details}")
+        logger.exception("Error rendering tests page: %s", e)
         return "An error occurred loading the tests page.", 500
 
+startup.mark('app')
+# Pay for the first connection and template compile during init rather than in the first request
+if os.getenv('WARMUP_ON_START', '').lower() in ('1', 'true', 'yes'):
+    logger.info("Warm-up on start: %s", warm_up())
+    startup.mark('warm_up')
+startup.log_report()
+
 if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_ENV') == 'development'
-    logger.info(f"Starting Flask app in {'debug' if debug_mode else 'production'} mode")
+    logger.info("Starting Flask app in %s mode", 'debug' if debug_mode else 'production')
     app.run(debug=debug_mode, port=5000)
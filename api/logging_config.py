@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came from `extra=` and is emitted as a field
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any `extra=` fields, exc."""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Let through only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message on the calling thread; here the
+    record is enqueued as-is so %-style arguments are only rendered off the
+    request path. Log arguments must therefore not be mutated after logging.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(','):
+        name, sep, level = item.strip().partition('=')
+        if sep and name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Configure root logging once per process from environment variables.
+
+    LOG_LEVEL        root level (default INFO)
+    LOG_LEVELS       per-logger overrides, e.g. "api.db=DEBUG,werkzeug=WARNING"
+    LOG_FORMAT       "json" (default) or "text"
+    LOG_DEBUG_SAMPLE fraction of DEBUG records to keep (default 1.0)
+    LOG_ASYNC        write through a background queue listener (default on)
+    """
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+    root = logging.getLogger()
+
+    handler = logging.StreamHandler(sys.stderr)
+    if os.getenv('LOG_FORMAT', 'json').lower() == 'text':
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE', '1.0'))
+    if os.getenv('LOG_ASYNC', '1').lower() in ('1', 'true', 'yes'):
+        log_queue = queue.SimpleQueue()
+        front = _DeferredQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    else:
+        front = handler
+    if sample_rate < 1.0:
+        front.addFilter(DebugSampler(sample_rate))
+
+    root.handlers[:] = [front]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for name, level in _parse_levels(os.getenv('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(level)
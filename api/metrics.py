@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from flask import g, request, has_request_context, before_render_template, template_rendered
+
+from .cache import ALL_CACHES
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+# Add Server-Timing headers to every response (handy in browser devtools)
+SERVER_TIMING = os.getenv('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Request latency by route, method and status.')
+DB_CONNECT_DURATION = Histogram('db_connect_duration_seconds', 'Time to open a new database connection.')
+DB_QUERY_DURATION = Histogram('db_query_duration_seconds', 'Time spent executing a single database statement.')
+DB_QUERIES_PER_REQUEST = Histogram('db_queries_per_request', 'Database statements executed per request, by route.',
+                                   buckets=QUERY_COUNT_BUCKETS)
+TEMPLATE_RENDER_DURATION = Histogram('template_render_duration_seconds', 'Jinja render time by template.')
+DB_QUERIES = Counter('db_queries_total', 'Database statements executed.')
+
+METRICS = [REQUEST_DURATION, DB_CONNECT_DURATION, DB_QUERY_DURATION, DB_QUERIES_PER_REQUEST,
+           TEMPLATE_RENDER_DURATION, DB_QUERIES]
+
+
+def _request_timings():
+    """Per-request accumulator in flask.g, or None outside a request."""
+    if not has_request_context():
+        return None
+    timings = g.get('_timings')
+    if timings is None:
+        timings = g._timings = {'db_queries': 0, 'db_time': 0.0, 'db_connect': 0.0, 'render': 0.0}
+    return timings
+
+
+def record_query(elapsed):
+    """Called by the instrumented cursor after every execute()."""
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+    timings = _request_timings()
+    if timings is not None:
+        timings['db_queries'] += 1
+        timings['db_time'] += elapsed
+
+
+def record_connect(elapsed):
+    """Called by the connection pool whenever it opens a new connection."""
+    DB_CONNECT_DURATION.observe(elapsed)
+    timings = _request_timings()
+    if timings is not None:
+        timings['db_connect'] += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('_render_starts', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if not has_request_context() or not g.get('_render_starts'):
+        return
+    elapsed = time.perf_counter() - g._render_starts.pop()
+    TEMPLATE_RENDER_DURATION.observe(elapsed, template=template.name or 'unknown')
+    # Only count the outermost render so nested fragments aren't double-counted
+    if not g._render_starts:
+        _request_timings()['render'] += elapsed
+
+
+def init_app(app):
+    """Install request/template timing hooks on a Flask app."""
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+        _request_timings()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get('_request_start')
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        timings = _request_timings()
+        REQUEST_DURATION.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        DB_QUERIES_PER_REQUEST.observe(timings['db_queries'], route=route)
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = ', '.join([
+                f"app;dur={elapsed * 1000:.2f}",
+                f"db;dur={timings['db_time'] * 1000:.2f};desc=\"{timings['db_queries']} queries\"",
+                f"dbconnect;dur={timings['db_connect'] * 1000:.2f}",
+                f"render;dur={timings['render'] * 1000:.2f}",
+            ])
+        return response
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+def render_prometheus(pool_stats=None):
+    """Return all metrics, cache counters and pool gauges in Prometheus text format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+
+    lines.append("# HELP cache_lookups_total Cache lookups by cache and result.")
+    lines.append("# TYPE cache_lookups_total counter")
+    for cache in ALL_CACHES:
+        stats = cache.stats()
+        lines.append(f'cache_lookups_total{{cache="{_escape(cache.name)}",result="hit"}} {stats["hits"]}')
+        lines.append(f'cache_lookups_total{{cache="{_escape(cache.name)}",result="miss"}} {stats["misses"]}')
+    lines.append("# HELP cache_invalidations_total Explicit cache invalidations.")
+    lines.append("# TYPE cache_invalidations_total counter")
+    for cache in ALL_CACHES:
+        lines.append(f'cache_invalidations_total{{cache="{_escape(cache.name)}"}} {cache.stats()["invalidations"]}')
+
+    if pool_stats:
+        for key in ('checkouts', 'waits', 'timeouts', 'connects', 'reconnects', 'health_checks',
+                    'health_check_failures', 'discarded'):
+            lines.append(f"# TYPE db_pool_{key}_total counter")
+            lines.append(f"db_pool_{key}_total {pool_stats[key]}")
+        for key in ('size', 'idle', 'in_use'):
+            lines.append(f"# TYPE db_pool_{key} gauge")
+            lines.append(f"db_pool_{key} {pool_stats[key]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,235 @@
+import os
+import time
+import logging
+import threading
+import psycopg2
+import psycopg2.extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """A small thread-safe pool of autocommit psycopg2 connections.
+
+    The pool is meant to live at module level so warm serverless invocations
+    reuse already-open connections instead of paying a fresh TCP+TLS+auth
+    handshake per call. Connections are checked before being handed out
+    (closed, past `max_lifetime`, or idle longer than `health_check_after`
+    and failing a `SELECT 1`) and transparently replaced when stale.
+    """
+
+    def __init__(self, dsn, min_size=0, max_size=5, max_lifetime=300.0,
+                 health_check_after=30.0, checkout_timeout=10.0, connect_kwargs=None, on_connect=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.dsn = dsn
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self.connect_kwargs = connect_kwargs or {}
+        self.on_connect = on_connect  # called with the connect duration in seconds
+
+        self._cond = threading.Condition()
+        self._idle = []        # LIFO stack of _PooledConnection
+        self._in_use = {}      # id(conn) -> _PooledConnection
+        self._size = 0         # open + reserved connections
+        self._pid = os.getpid()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'connect_time': 0.0,
+            'reconnects': 0,
+            'health_checks': 0,
+            'health_check_failures': 0,
+            'discarded': 0,
+        }
+
+    # --- connection lifecycle -------------------------------------------------
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        conn.autocommit = True
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._stats['connects'] += 1
+            self._stats['connect_time'] += elapsed
+        if self.on_connect is not None:
+            self.on_connect(elapsed)
+        logger.info("Opened pooled database connection in %.1fms", elapsed * 1000)
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, entry):
+        """Return True if an idle connection can be handed out as-is."""
+        if entry.conn.closed:
+            return False
+        now = time.monotonic()
+        if self.max_lifetime and now - entry.created_at > self.max_lifetime:
+            return False
+        if self.health_check_after is not None and now - entry.last_used >= self.health_check_after:
+            with self._cond:
+                self._stats['health_checks'] += 1
+            try:
+                with entry.conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except Exception as e:
+                logger.warning("Pooled connection failed health check: %s", e)
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                return False
+        return True
+
+    def _check_pid(self):
+        # Never share sockets with a forked child; start over with an empty pool.
+        if self._pid != os.getpid():
+            self._idle = []
+            self._in_use = {}
+            self._size = 0
+            self._pid = os.getpid()
+
+    # --- public API -----------------------------------------------------------
+
+    def fill(self):
+        """Open connections until `min_size` are idle or in use."""
+        while True:
+            with self._cond:
+                self._check_pid()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to `checkout_timeout`."""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_since = None
+        entry = None
+        with self._cond:
+            self._check_pid()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # reserve a slot; connect outside the lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+            if waited_since is not None:
+                self._stats['wait_time'] += time.monotonic() - waited_since
+
+        try:
+            if entry is not None and not self._is_usable(entry):
+                self._close_quietly(entry.conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+                entry = None
+            if entry is None:
+                entry = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use[id(entry.conn)] = entry
+            self._stats['checkouts'] += 1
+        return entry.conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is broken."""
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Not ours (or from before a fork); just close it.
+            self._close_quietly(conn)
+            return
+
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if not conn.autocommit:
+                    conn.autocommit = True
+            except Exception as e:
+                logger.warning("Discarding pooled connection after failed reset: %s", e)
+                discard = True
+
+        with self._cond:
+            if discard or conn.closed:
+                self._size -= 1
+                self._stats['discarded'] += 1
+                self._close_quietly(conn)
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection; in-use connections are closed on return."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry.conn)
+
+    def stats(self):
+        """Return a snapshot of pool counters and current occupancy."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        connects = snapshot['connects']
+        snapshot['avg_connect_ms'] = round(snapshot['connect_time'] / connects * 1000, 2) if connects else None
+        snapshot['reuse_ratio'] = round(1 - connects / snapshot['checkouts'], 3) if snapshot['checkouts'] else None
+        snapshot['connect_time'] = round(snapshot['connect_time'], 4)
+        snapshot['wait_time'] = round(snapshot['wait_time'], 4)
+        return snapshot
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+
+PREFERENCE_TYPES = ('prefer_not', 'no')
+
+
+class PreferenceGrid:
+    """Compact per-user preference storage indexed by day offset.
+
+    Each user has a 2-bit code per day, stored as two bit planes packed into
+    Python ints (bit `i` of the `no` plane set means "no" on start_date + i,
+    likewise for `prefer_not`). Range slicing, set operations across users
+    and per-user counts are then shifts, ANDs/ORs and popcounts instead of
+    walking nested dicts of date strings.
+    """
+
+    __slots__ = ('users', 'start_date', 'num_days', '_planes')
+
+    def __init__(self, users, start_date, num_days):
+        self.users = list(users)
+        self.start_date = start_date
+        self.num_days = num_days
+        self._planes = {ptype: {user: 0 for user in self.users} for ptype in PREFERENCE_TYPES}
+
+    @classmethod
+    def from_rows(cls, rows, users, start_date, end_date):
+        """Build a grid from preference rows (user_name, event_date, preference_type).
+
+        Rows for unknown users or outside [start_date, end_date] are ignored.
+        """
+        grid = cls(users, start_date, (end_date - start_date).days + 1)
+        start_ordinal = start_date.toordinal()
+        planes = grid._planes
+        for row in rows:
+            plane = planes.get(row['preference_type'])
+            user = row['user_name']
+            if plane is None or user not in plane:
+                continue
+            event_date = row['event_date']
+            if isinstance(event_date, str):
+                event_date = datetime.strptime(event_date, '%Y-%m-%d').date()
+            offset = event_date.toordinal() - start_ordinal
+            if 0 <= offset < grid.num_days:
+                plane[user] |= 1 << offset
+        return grid
+
+    @property
+    def end_date(self):
+        return self.start_date + timedelta(days=self.num_days - 1)
+
+    @property
+    def full_mask(self):
+        return (1 << self.num_days) - 1
+
+    def offset(self, day):
+        return day.toordinal() - self.start_date.toordinal()
+
+    # --- single cells ---------------------------------------------------------
+
+    def day_preferences(self, year, month, day):
+        """Return [(user, preference_type), ...] for a day, in user order."""
+        offset = date(year, month, day).toordinal() - self.start_date.toordinal()
+        if not 0 <= offset < self.num_days:
+            return []
+        result = []
+        for user in self.users:
+            for ptype in PREFERENCE_TYPES:
+                if self._planes[ptype][user] >> offset & 1:
+                    result.append((user, ptype))
+                    break
+        return result
+
+    # --- ranges and set operations -------------------------------------------
+
+    def slice(self, start_date, end_date):
+        """Return a new grid restricted to [start_date, end_date] (clamped)."""
+        start_date = max(start_date, self.start_date)
+        end_date = min(end_date, self.end_date)
+        num_days = max((end_date - start_date).days + 1, 0)
+        sliced = PreferenceGrid(self.users, start_date, num_days)
+        shift = self.offset(start_date)
+        mask = (1 << num_days) - 1
+        for ptype in PREFERENCE_TYPES:
+            for user, plane in self._planes[ptype].items():
+                sliced._planes[ptype][user] = (plane >> shift) & mask
+        return sliced
+
+    def plane(self, preference_type, user):
+        """Return the raw bit plane for one user and preference type."""
+        return self._planes[preference_type][user]
+
+    def union(self, preference_type, users=None):
+        """Bitmask of days where any of `users` marked `preference_type`."""
+        mask = 0
+        for user in users or self.users:
+            mask |= self._planes[preference_type][user]
+        return mask
+
+    def marked_mask(self, users=None):
+        """Bitmask of days where any of `users` has any mark."""
+        return self.union('no', users) | self.union('prefer_not', users)
+
+    def free_mask(self, users=None):
+        """Bitmask of days with no marks at all from `users`."""
+        return ~self.marked_mask(users) & self.full_mask
+
+    def day_counts(self, preference_type):
+        """Return a per-day list of how many users marked `preference_type`."""
+        counts = [0] * self.num_days
+        for plane in self._planes[preference_type].values():
+            while plane:
+                low = plane & -plane
+                counts[low.bit_length() - 1] += 1
+                plane ^= low
+        return counts
+
+    def fingerprint(self):
+        """Hashable snapshot of the grid contents, for content-keyed caches."""
+        return (self.start_date, self.num_days, tuple(self.users),
+                tuple(tuple(self._planes[ptype][user] for user in self.users) for ptype in PREFERENCE_TYPES))
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# STARTUP_PROFILE=1 times every module imported after this one and each init phase
+PROFILE = os.getenv('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+# How many of the slowest imports the startup report lists
+PROFILE_TOP_IMPORTS = int(os.getenv('STARTUP_PROFILE_TOP', '15'))
+
+_started = time.perf_counter()
+_last_mark = _started
+_phases = []      # (phase, seconds) in order
+_imports = []     # (module, self seconds, cumulative seconds)
+_local = threading.local()
+
+
+class _TimedLoader:
+    """Wraps a module loader to record how long executing the module takes."""
+
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = _local.__dict__.setdefault('stack', [])
+        stack.append(0.0)  # time spent in nested imports
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            _imports.append((self._name, total - nested, total))
+
+
+class _TimingFinder:
+    """Meta path finder that defers to the real finders and wraps their loaders."""
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimedLoader(spec.loader, name)
+            return spec
+        return None
+
+
+if PROFILE:
+    sys.meta_path.insert(0, _TimingFinder())
+
+
+def mark(phase):
+    """Record the time since the previous mark (or process import) as `phase`."""
+    global _last_mark
+    now = time.perf_counter()
+    _phases.append((phase, now - _last_mark))
+    _last_mark = now
+
+
+def report():
+    """Init phases in ms and, when profiling, the slowest imports by self time."""
+    data = {
+        'profile': PROFILE,
+        'total_ms': round((_last_mark - _started) * 1000, 1),
+        'phases': [{'phase': phase, 'ms': round(seconds * 1000, 1)} for phase, seconds in _phases],
+    }
+    if PROFILE:
+        slowest = sorted(_imports, key=lambda item: item[1], reverse=True)[:PROFILE_TOP_IMPORTS]
+        data['modules_imported'] = len(_imports)
+        data['imports'] = [{'module': name, 'self_ms': round(own * 1000, 2), 'cumulative_ms': round(total * 1000, 2)}
+                           for name, own, total in slowest]
+    return data
+
+
+def log_report():
+    """Log the startup report: INFO when profiling, otherwise just the totals at DEBUG."""
+    data = report()
+    phases = ', '.join(f"{item['phase']}={item['ms']}ms" for item in data['phases'])
+    if not PROFILE:
+        logger.debug("Startup took %.1fms (%s)", data['total_ms'], phases)
+        return
+    slowest = ', '.join(f"{item['module']}={item['self_ms']}ms" for item in data['imports'][:5])
+    logger.info("Startup took %.1fms (%s); slowest imports: %s", data['total_ms'], phases, slowest,
+                extra={'startup': data})
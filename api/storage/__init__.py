@@ -0,0 +1,43 @@
+from urllib.parse import urlsplit
+
+from .base import Storage, StorageUnavailable, from_version, to_version
+
+# DATABASE_URL scheme -> backend name
+BACKEND_SCHEMES = {
+    'postgres': 'postgres',
+    'postgresql': 'postgres',
+    'sqlite': 'sqlite',
+    'memory': 'memory',
+}
+
+
+def backend_for(url):
+    """Return the backend name ('postgres', 'sqlite' or 'memory') for a database URL."""
+    scheme = urlsplit(url).scheme.lower()
+    if scheme not in BACKEND_SCHEMES:
+        raise ValueError(f"Unsupported database URL scheme: {scheme or url!r}")
+    return BACKEND_SCHEMES[scheme]
+
+
+def open_storage(url):
+    """Create the storage backend for a database URL.
+
+    `postgres://` / `postgresql://` connect to Postgres, `sqlite:///path/to.db`
+    opens (or creates) a SQLite file and `memory://` keeps everything in this
+    process. Backends are imported on demand, so psycopg2 is only loaded for
+    Postgres.
+    """
+    backend = backend_for(url)
+    if backend == 'postgres':
+        from .postgres import PostgresStorage
+        return PostgresStorage(url)
+    if backend == 'sqlite':
+        # sqlite:///relative.db or sqlite:////absolute/path.db, as in SQLAlchemy
+        path = url.split(':///', 1)[1] if ':///' in url else ''
+        if not path or path == ':memory:':
+            raise ValueError("sqlite URLs need a file path (sqlite:///camping.db); use memory:// for a throwaway store")
+        from .sqlite import SqliteStorage
+        return SqliteStorage(path)
+    from .memory import MemoryStorage
+    return MemoryStorage()
+
@@ -0,0 +1,159 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# The 'default' group the schema seeds, matching the original single calendar
+DEFAULT_GROUP_SEED = ('default', 'Camping', ('Jack', 'Payton', 'Nick', 'Alyssa'))
+
+
+def to_version(timestamp):
+    """Convert a change timestamp into an integer version (microseconds since epoch)."""
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_version(version):
+    """Convert an integer version back into a UTC timestamp."""
+    return _EPOCH + timedelta(microseconds=version)
+
+
+def next_stamp(latest):
+    """A change version for a new write: now, but strictly after `latest` (a version or None)."""
+    now = time.time_ns() // 1000
+    return now if latest is None or now > latest else latest + 1
+
+
+class StorageUnavailable(Exception):
+    """The database is not configured or cannot be reached."""
+
+
+class Storage:
+    """Interface implemented by the Postgres, SQLite and in-memory backends.
+
+    Backends deal in plain values: ids are ints, `event_date` values are
+    datetime.date, date-range bounds are 'YYYY-MM-DD' strings (or None) and
+    change times are aware UTC datetimes. Methods raise on failure; api/db.py
+    turns errors into the None/False/[] results its callers expect and owns
+    caching, input validation and change notification.
+
+    Writes for one group are serialized (see `batch()`) and stamped with a
+    change time read once the group's write lock is held, so change times
+    follow commit order and a change-feed version never skips a write.
+    """
+
+    name = None
+    # Database exceptions callers may treat as "the operation failed"
+    errors = ()
+
+    def init_schema(self):
+        """Create or migrate the tables and seed the default group (idempotent)."""
+        raise NotImplementedError
+
+    def describe_schema(self):
+        """Describe the preferences table for /database-schema; includes 'table_exists'."""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Open a connection ahead of the first request; returns True when usable."""
+        return True
+
+    def pool_stats(self):
+        """Connection pool counters, or None for backends without a pool."""
+        return None
+
+    def fetch_group(self, slug):
+        """Return (group id, name, [(member id, member name), ...] in display order) or None."""
+        raise NotImplementedError
+
+    def create_group(self, slug, name, member_names):
+        """Create a group with members in the given order; returns its id, or None if the slug is taken."""
+        raise NotImplementedError
+
+    def add_members(self, group_id, member_names):
+        """Append members after the existing ones, skipping names the group already has."""
+        raise NotImplementedError
+
+    def fetch_preferences(self, group_id, start_date=None, end_date=None):
+        """Return [{'user_name', 'event_date', 'preference_type'}] ordered by date, then name."""
+        raise NotImplementedError
+
+    def iter_preferences(self, group_id, start_date=None, end_date=None, batch_size=2000):
+        """Stream fetch_preferences() rows; backends that can avoid materializing them override this."""
+        yield from self.fetch_preferences(group_id, start_date, end_date)
+
+    def select_changes(self, group_id, since, start_date=None, end_date=None):
+        """Return changes after `since` as [{'user_name', 'event_date', 'preference_type', 'changed_at'}].
+
+        Oldest first; preference_type is None for cleared cells.
+        """
+        raise NotImplementedError
+
+    def data_version(self, group_id):
+        """Return the time of a group's latest change, or None if it has none."""
+        raise NotImplementedError
+
+    def fetch_summary(self, group_id, start_date=None, end_date=None):
+        """Return the aggregates maintained on every write, without scanning preferences.
+
+        {'months': [{'user_name', 'month', 'preference_type', 'days'}], 'days':
+        [{'event_date', 'no', 'prefer_not'}]}, where `month` is the first day
+        of the month (kept if it falls in the range, so pass whole months) and
+        both lists only include non-zero counts.
+        """
+        raise NotImplementedError
+
+    def save_preference(self, group_id, member_id, event_date, preference_type):
+        """Upsert one cell; returns 'inserted', 'updated' or 'unchanged'."""
+        raise NotImplementedError
+
+    def delete_preference(self, group_id, member_id, event_date):
+        """Clear one cell, leaving a tombstone for delta sync; returns True if it existed."""
+        raise NotImplementedError
+
+    def batch(self, group_id):
+        """Context manager for one serialized write transaction on a group.
+
+        Yields an object with `changes(since)` (as select_changes, seeing the
+        transaction's own writes), `upsert([(member_id, event_date, type)])`
+        and `clear([(member_id, event_date)])`, the latter two returning how
+        many cells actually changed. An exception rolls everything back.
+        """
+        raise NotImplementedError
+
+    def import_rows(self, group_id, rows):
+        """Apply (member_id, event_date, preference_type) rows, last row per cell winning.
+
+        Returns {'rows', 'upserted', 'cleared', 'unchanged'}. Exceptions raised
+        by `rows` propagate before anything is written.
+        """
+        latest = {}
+        count = 0
+        for member_id, event_date, preference_type in rows:
+            latest[(member_id, event_date)] = preference_type
+            count += 1
+        with self.batch(group_id) as batch:
+            upserted = batch.upsert([(member_id, day, ptype) for (member_id, day), ptype in latest.items()
+                                     if ptype is not None])
+            cleared = batch.clear([cell for cell, ptype in latest.items() if ptype is None])
+        return {'rows': count, 'upserted': upserted, 'cleared': cleared,
+                'unchanged': len(latest) - upserted - cleared}
+
+    def prune_tombstones(self, before):
+        """Delete tombstones stamped before `before` in every group; returns how many.
+
+        Each group's newest tombstone is kept, so its data version never
+        moves backwards, and the newest one deleted is recorded for
+        pruned_through().
+        """
+        raise NotImplementedError
+
+    def pruned_through(self, group_id):
+        """Return the time of the newest tombstone pruned from a group, or None if none was.
+
+        Delta sync from a cursor older than this could miss cleared cells.
+        """
+        raise NotImplementedError
+
+    def reset_preferences(self):
+        """Delete every preference, tombstone and summary (benchmark seeding)."""
+        raise NotImplementedError
@@ -0,0 +1,244 @@
+import threading
+from contextlib import contextmanager
+
+from .base import Storage, DEFAULT_GROUP_SEED, from_version, to_version, next_stamp
+
+
+def _in_range(event_date, start_date, end_date):
+    day = event_date.isoformat()
+    return (not start_date or day >= str(start_date)) and (not end_date or day <= str(end_date))
+
+
+class _MemoryBatch:
+    def __init__(self, storage, group_id, stamp):
+        self._storage = storage
+        self._group_id = group_id
+        self._stamp = stamp
+        self._undo = []  # (table, key, previous value or None), newest last
+
+    def _set(self, table, key, value):
+        self._undo.append((table, key, table.get(key)))
+        if value is None:
+            table.pop(key, None)
+        else:
+            table[key] = value
+
+    def rollback(self):
+        for table, key, previous in reversed(self._undo):
+            if previous is None:
+                table.pop(key, None)
+            else:
+                table[key] = previous
+
+    def _count(self, member_id, event_date, preference_type, sign):
+        # Same aggregates the SQL backends keep with triggers
+        for summary, key in ((self._storage._month_summary, (event_date.replace(day=1), member_id, preference_type)),
+                             (self._storage._day_summary, (event_date, preference_type))):
+            table = summary.setdefault(self._group_id, {})
+            self._set(table, key, (table.get(key, 0) + sign) or None)
+
+    def changes(self, since):
+        return self._storage._select_changes(self._group_id, since)
+
+    def upsert(self, rows):
+        preferences = self._storage._preferences.setdefault(self._group_id, {})
+        changed = 0
+        for member_id, event_date, preference_type in rows:
+            current = preferences.get((member_id, event_date))
+            if current is None or current[0] != preference_type:
+                self._set(preferences, (member_id, event_date), (preference_type, self._stamp))
+                if current is not None:
+                    self._count(member_id, event_date, current[0], -1)
+                self._count(member_id, event_date, preference_type, 1)
+                changed += 1
+        return changed
+
+    def clear(self, rows):
+        preferences = self._storage._preferences.setdefault(self._group_id, {})
+        tombstones = self._storage._tombstones.setdefault(self._group_id, {})
+        cleared = 0
+        for member_id, event_date in rows:
+            current = preferences.get((member_id, event_date))
+            if current is not None:
+                self._set(preferences, (member_id, event_date), None)
+                self._count(member_id, event_date, current[0], -1)
+                self._set(tombstones, (member_id, event_date), self._stamp)
+                cleared += 1
+        return cleared
+
+
+class MemoryStorage(Storage):
+    """Plain dicts in this process; nothing is persisted or shared between instances.
+
+    Meant for benchmarks, tests and throwaway local runs. One lock
+    serializes writes, and readers take it too so they never see a
+    half-applied batch.
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._groups = {}       # slug -> (group id, name)
+        self._members = {}      # group id -> [(member id, name)] in display order
+        self._preferences = {}  # group id -> {(member id, date): (preference type, version)}
+        self._tombstones = {}   # group id -> {(member id, date): version}
+        self._pruned = {}       # group id -> version of the newest pruned tombstone
+        self._month_summary = {}  # group id -> {(first of month, member id, type): days}
+        self._day_summary = {}    # group id -> {(date, type): members}
+        self._next_id = 1
+        self._latest = {}       # group id -> latest version
+        self.init_schema()
+
+    def _new_id(self):
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+    def _member_names(self, group_id):
+        return dict(self._members.get(group_id, ()))
+
+    # --- schema -----------------------------------------------------------------
+
+    def init_schema(self):
+        slug, name, members = DEFAULT_GROUP_SEED
+        with self._lock:
+            if slug not in self._groups:
+                self.create_group(slug, name, members)
+            else:
+                self.add_members(self._groups[slug][0], members)
+
+    def describe_schema(self):
+        return {'table_exists': True, 'columns': [
+            {'column_name': 'member_id', 'data_type': 'int'},
+            {'column_name': 'event_date', 'data_type': 'date'},
+            {'column_name': 'preference_type', 'data_type': 'str'},
+            {'column_name': 'version', 'data_type': 'int'},
+        ]}
+
+    # --- groups -----------------------------------------------------------------
+
+    def fetch_group(self, slug):
+        with self._lock:
+            if slug not in self._groups:
+                return None
+            group_id, name = self._groups[slug]
+            return group_id, name, list(self._members[group_id])
+
+    def create_group(self, slug, name, member_names):
+        with self._lock:
+            if slug in self._groups:
+                return None
+            group_id = self._new_id()
+            self._groups[slug] = (group_id, name)
+            self._members[group_id] = [(self._new_id(), member) for member in member_names]
+            return group_id
+
+    def add_members(self, group_id, member_names):
+        with self._lock:
+            members = self._members[group_id]
+            existing = {name for _, name in members}
+            for member in member_names:
+                if member not in existing:
+                    members.append((self._new_id(), member))
+                    existing.add(member)
+
+    # --- reads ------------------------------------------------------------------
+
+    def fetch_preferences(self, group_id, start_date=None, end_date=None):
+        with self._lock:
+            names = self._member_names(group_id)
+            rows = [{'user_name': names[member_id], 'event_date': event_date, 'preference_type': ptype}
+                    for (member_id, event_date), (ptype, _) in self._preferences.get(group_id, {}).items()
+                    if _in_range(event_date, start_date, end_date)]
+        rows.sort(key=lambda row: (row['event_date'], row['user_name']))
+        return rows
+
+    def _select_changes(self, group_id, since, start_date=None, end_date=None):
+        since_version = to_version(since)
+        names = self._member_names(group_id)
+        rows = [(version, event_date, names[member_id], ptype)
+                for (member_id, event_date), (ptype, version) in self._preferences.get(group_id, {}).items()
+                if version > since_version and _in_range(event_date, start_date, end_date)]
+        rows.extend((version, event_date, names[member_id], None)
+                    for (member_id, event_date), version in self._tombstones.get(group_id, {}).items()
+                    if version > since_version and _in_range(event_date, start_date, end_date))
+        rows.sort(key=lambda row: row[:3])
+        return [{'user_name': name, 'event_date': event_date, 'preference_type': ptype,
+                 'changed_at': from_version(version)} for version, event_date, name, ptype in rows]
+
+    def select_changes(self, group_id, since, start_date=None, end_date=None):
+        with self._lock:
+            return self._select_changes(group_id, since, start_date, end_date)
+
+    def data_version(self, group_id):
+        with self._lock:
+            latest = self._latest.get(group_id)
+        return from_version(latest) if latest is not None else None
+
+    def fetch_summary(self, group_id, start_date=None, end_date=None):
+        with self._lock:
+            names = self._member_names(group_id)
+            months = [{'user_name': names[member_id], 'month': month, 'preference_type': ptype, 'days': days}
+                      for (month, member_id, ptype), days in self._month_summary.get(group_id, {}).items()
+                      if _in_range(month, start_date, end_date)]
+            days = {}
+            for (event_date, ptype), count in self._day_summary.get(group_id, {}).items():
+                if _in_range(event_date, start_date, end_date):
+                    days.setdefault(event_date, {'event_date': event_date, 'no': 0, 'prefer_not': 0})[ptype] = count
+        months.sort(key=lambda row: (row['month'], row['user_name'], row['preference_type']))
+        return {'months': months, 'days': sorted(days.values(), key=lambda row: row['event_date'])}
+
+    # --- writes -----------------------------------------------------------------
+
+    def save_preference(self, group_id, member_id, event_date, preference_type):
+        with self.batch(group_id) as batch:
+            existed = (member_id, event_date) in self._preferences.get(group_id, {})
+            if not batch.upsert([(member_id, event_date, preference_type)]):
+                return 'unchanged'
+        return 'updated' if existed else 'inserted'
+
+    def delete_preference(self, group_id, member_id, event_date):
+        with self.batch(group_id) as batch:
+            return batch.clear([(member_id, event_date)]) > 0
+
+    @contextmanager
+    def batch(self, group_id):
+        with self._lock:
+            batch = _MemoryBatch(self, group_id, next_stamp(self._latest.get(group_id)))
+            try:
+                yield batch
+            except BaseException:
+                batch.rollback()
+                raise
+            if batch._undo:
+                self._latest[group_id] = batch._stamp
+
+    def prune_tombstones(self, before):
+        before_version = to_version(before)
+        pruned = 0
+        with self._lock:
+            for group_id, tombstones in self._tombstones.items():
+                newest = max(tombstones.values(), default=None)
+                expired = [cell for cell, version in tombstones.items()
+                           if version < before_version and version != newest]
+                if expired:
+                    self._pruned[group_id] = max(self._pruned.get(group_id, 0),
+                                                 max(tombstones[cell] for cell in expired))
+                for cell in expired:
+                    del tombstones[cell]
+                pruned += len(expired)
+        return pruned
+
+    def pruned_through(self, group_id):
+        with self._lock:
+            pruned = self._pruned.get(group_id)
+        return from_version(pruned) if pruned is not None else None
+
+    def reset_preferences(self):
+        with self._lock:
+            self._preferences.clear()
+            self._tombstones.clear()
+            self._month_summary.clear()
+            self._day_summary.clear()
+            self._latest.clear()
@@ -0,0 +1,774 @@
+import os
+import time
+import logging
+import threading
+import psycopg2
+import psycopg2.extras
+from contextlib import contextmanager
+
+from .. import metrics
+from ..changefeed import CHANNEL
+from ..pool import ConnectionPool
+from .base import Storage, StorageUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Idempotent DDL run by /init-database
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS groups (
+        id SERIAL PRIMARY KEY,
+        slug VARCHAR(64) NOT NULL UNIQUE,
+        name VARCHAR(100) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS members (
+        id SERIAL PRIMARY KEY,
+        group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+        name VARCHAR(50) NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (group_id, name)
+    )
+    """,
+    # The original single-group calendar becomes the 'default' group
+    "INSERT INTO groups (slug, name) VALUES ('default', 'Camping') ON CONFLICT (slug) DO NOTHING",
+    """
+    INSERT INTO members (group_id, name, position)
+    SELECT g.id, m.name, m.position
+    FROM groups g, (VALUES ('Jack', 0), ('Payton', 1), ('Nick', 2), ('Alyssa', 3)) AS m(name, position)
+    WHERE g.slug = 'default'
+    ON CONFLICT (group_id, name) DO NOTHING
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS preferences (
+        id SERIAL PRIMARY KEY,
+        group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+        member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+        event_date DATE NOT NULL,
+        preference_type VARCHAR(20) NOT NULL CHECK (preference_type IN ('prefer_not', 'no')),
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (group_id, member_id, event_date)
+    )
+    """,
+    # Deleted cells, so delta sync can tell clients what was cleared
+    """
+    CREATE TABLE IF NOT EXISTS preference_tombstones (
+        group_id INTEGER NOT NULL,
+        member_id INTEGER NOT NULL,
+        event_date DATE NOT NULL,
+        deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (group_id, member_id, event_date)
+    )
+    """,
+    # Newest tombstone pruned per group: delta sync from an older cursor would miss clears
+    """
+    CREATE TABLE IF NOT EXISTS tombstone_horizons (
+        group_id INTEGER PRIMARY KEY REFERENCES groups(id) ON DELETE CASCADE,
+        pruned_through TIMESTAMP WITH TIME ZONE NOT NULL
+    )
+    """,
+    # Migrate tables from the single-group schema (keyed by user_name) in place
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()
+                   AND table_name = 'preferences' AND column_name = 'user_name') THEN
+            ALTER TABLE preferences
+                ADD COLUMN group_id INTEGER REFERENCES groups(id) ON DELETE CASCADE,
+                ADD COLUMN member_id INTEGER REFERENCES members(id) ON DELETE CASCADE;
+            UPDATE preferences p SET group_id = m.group_id, member_id = m.id
+            FROM members m JOIN groups g ON g.id = m.group_id
+            WHERE g.slug = 'default' AND m.name = p.user_name;
+            ALTER TABLE preferences
+                ALTER COLUMN group_id SET NOT NULL,
+                ALTER COLUMN member_id SET NOT NULL,
+                DROP COLUMN user_name,
+                ADD UNIQUE (group_id, member_id, event_date);
+        END IF;
+        IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = current_schema()
+                   AND table_name = 'preference_tombstones' AND column_name = 'user_name') THEN
+            ALTER TABLE preference_tombstones ADD COLUMN group_id INTEGER, ADD COLUMN member_id INTEGER;
+            UPDATE preference_tombstones t SET group_id = m.group_id, member_id = m.id
+            FROM members m JOIN groups g ON g.id = m.group_id
+            WHERE g.slug = 'default' AND m.name = t.user_name;
+            DELETE FROM preference_tombstones WHERE member_id IS NULL;
+            ALTER TABLE preference_tombstones
+                DROP COLUMN user_name,
+                ALTER COLUMN group_id SET NOT NULL,
+                ALTER COLUMN member_id SET NOT NULL,
+                ADD PRIMARY KEY (group_id, member_id, event_date);
+        END IF;
+    END
+    $$
+    """,
+    "DROP INDEX IF EXISTS preferences_event_date_user_idx",
+    "DROP INDEX IF EXISTS preferences_created_at_idx",
+    "DROP INDEX IF EXISTS preference_tombstones_deleted_at_idx",
+    # Every read is scoped to one group, so lead every index with group_id
+    "CREATE INDEX IF NOT EXISTS preferences_group_event_date_idx ON preferences (group_id, event_date)",
+    "CREATE INDEX IF NOT EXISTS preferences_group_created_at_idx ON preferences (group_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS preference_tombstones_group_deleted_at_idx ON preference_tombstones (group_id, deleted_at)",
+    # Wake /api/changes long-polls on every instance; one NOTIFY per statement, delivered on commit
+    f"""
+    CREATE OR REPLACE FUNCTION notify_preference_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{CHANNEL}', '');
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS preferences_notify_change ON preferences",
+    """
+    CREATE TRIGGER preferences_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON preferences
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_preference_change()
+    """,
+    # Aggregates for /api/summary, kept current by the triggers below: marked
+    # days per member, month and type, and per-day mark counts. Rows whose
+    # counts drop to zero are kept and filtered out on read.
+    """
+    CREATE TABLE IF NOT EXISTS preference_month_summary (
+        group_id INTEGER NOT NULL,
+        month DATE NOT NULL,
+        member_id INTEGER NOT NULL,
+        preference_type VARCHAR(20) NOT NULL,
+        days INTEGER NOT NULL,
+        PRIMARY KEY (group_id, month, member_id, preference_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS preference_day_summary (
+        group_id INTEGER NOT NULL,
+        event_date DATE NOT NULL,
+        no_count INTEGER NOT NULL,
+        prefer_not_count INTEGER NOT NULL,
+        PRIMARY KEY (group_id, event_date)
+    )
+    """,
+    # One pass per statement over its transition tables, so a 1000-row batch or
+    # import costs two upserts rather than two per row. Sorted so concurrent
+    # writers lock summary rows in the same order.
+    """
+    CREATE OR REPLACE FUNCTION summarize_preference_changes() RETURNS trigger AS $$
+    DECLARE
+        delta TEXT;
+    BEGIN
+        delta := CASE TG_OP
+            WHEN 'INSERT' THEN 'SELECT group_id, member_id, event_date, preference_type, 1 AS n FROM new_rows'
+            WHEN 'DELETE' THEN 'SELECT group_id, member_id, event_date, preference_type, -1 AS n FROM old_rows'
+            ELSE 'SELECT group_id, member_id, event_date, preference_type, 1 AS n FROM new_rows
+                  UNION ALL SELECT group_id, member_id, event_date, preference_type, -1 FROM old_rows'
+        END;
+        EXECUTE 'WITH delta AS (' || delta || ')
+            INSERT INTO preference_month_summary AS s (group_id, month, member_id, preference_type, days)
+            SELECT group_id, date_trunc(''month'', event_date)::date, member_id, preference_type, sum(n)
+            FROM delta
+            GROUP BY 1, 2, 3, 4
+            HAVING sum(n) <> 0
+            ORDER BY 1, 2, 3, 4
+            ON CONFLICT (group_id, month, member_id, preference_type) DO UPDATE SET days = s.days + EXCLUDED.days';
+        EXECUTE 'WITH delta AS (' || delta || ')
+            INSERT INTO preference_day_summary AS s (group_id, event_date, no_count, prefer_not_count)
+            SELECT group_id, event_date,
+                   coalesce(sum(n) FILTER (WHERE preference_type = ''no''), 0),
+                   coalesce(sum(n) FILTER (WHERE preference_type = ''prefer_not''), 0)
+            FROM delta
+            GROUP BY 1, 2
+            ORDER BY 1, 2
+            ON CONFLICT (group_id, event_date) DO UPDATE
+                SET no_count = s.no_count + EXCLUDED.no_count,
+                    prefer_not_count = s.prefer_not_count + EXCLUDED.prefer_not_count';
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # Transition tables need one trigger per event
+    "DROP TRIGGER IF EXISTS preferences_summarize_insert ON preferences",
+    "DROP TRIGGER IF EXISTS preferences_summarize_update ON preferences",
+    "DROP TRIGGER IF EXISTS preferences_summarize_delete ON preferences",
+    """
+    CREATE TRIGGER preferences_summarize_insert
+    AFTER INSERT ON preferences REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION summarize_preference_changes()
+    """,
+    """
+    CREATE TRIGGER preferences_summarize_update
+    AFTER UPDATE ON preferences REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION summarize_preference_changes()
+    """,
+    """
+    CREATE TRIGGER preferences_summarize_delete
+    AFTER DELETE ON preferences REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION summarize_preference_changes()
+    """,
+    # Rebuild the summaries from scratch (backfills them on upgrade and repairs
+    # any drift), holding off writers so none is counted twice or missed
+    """
+    DO $$
+    BEGIN
+        LOCK TABLE preferences IN SHARE MODE;
+        DELETE FROM preference_month_summary;
+        DELETE FROM preference_day_summary;
+        INSERT INTO preference_month_summary (group_id, month, member_id, preference_type, days)
+        SELECT group_id, date_trunc('month', event_date)::date, member_id, preference_type, count(*)
+        FROM preferences
+        GROUP BY 1, 2, 3, 4;
+        INSERT INTO preference_day_summary (group_id, event_date, no_count, prefer_not_count)
+        SELECT group_id, event_date,
+               count(*) FILTER (WHERE preference_type = 'no'),
+               count(*) FILTER (WHERE preference_type = 'prefer_not')
+        FROM preferences
+        GROUP BY 1, 2;
+    END
+    $$
+    """,
+]
+
+# pg_advisory_xact_lock(class, group id) key space taken by every preference
+# writer before it touches a row, so a group's writers never deadlock on the
+# shared summary rows. Writers stamp their changes with clock_timestamp()
+# read after taking the lock (CURRENT_TIMESTAMP is the transaction start,
+# which can predate the wait), so change times follow commit order.
+GROUP_WRITE_LOCK = 1
+
+# COPY text-format NULL marker
+NULL_COPY = '\\N'
+
+
+class _TimedExecuteMixin:
+    """Report every statement's duration to the metrics layer."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+
+class InstrumentedCursor(_TimedExecuteMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class InstrumentedDictCursor(_TimedExecuteMixin, psycopg2.extras.DictCursor):
+    pass
+
+
+def _date_range_clause(column, start_date, end_date, params):
+    clause = ""
+    if start_date:
+        clause += f" AND {column} >= %(start_date)s"
+        params['start_date'] = start_date
+    if end_date:
+        clause += f" AND {column} <= %(end_date)s"
+        params['end_date'] = end_date
+    return clause
+
+
+def _select_changes(cursor, group_id, since, start_date=None, end_date=None):
+    params = {'group_id': group_id, 'since': since}
+    pref_filter = _date_range_clause('c.event_date', start_date, end_date, params)
+    cursor.execute(f"""
+        SELECT m.name AS user_name, c.event_date, c.preference_type, c.changed_at
+        FROM (
+            SELECT member_id, event_date, preference_type, created_at AS changed_at
+            FROM preferences
+            WHERE group_id = %(group_id)s AND created_at > %(since)s
+            UNION ALL
+            SELECT member_id, event_date, NULL, deleted_at
+            FROM preference_tombstones
+            WHERE group_id = %(group_id)s AND deleted_at > %(since)s
+        ) AS c
+        JOIN members m ON m.id = c.member_id
+        WHERE TRUE{pref_filter}
+        ORDER BY c.changed_at, c.event_date, m.name
+    """, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _lock_group(cursor, group_id):
+    """Take the group's write lock for this transaction; returns the change time to stamp writes with."""
+    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (GROUP_WRITE_LOCK, group_id))
+    cursor.execute("SELECT clock_timestamp()")
+    return cursor.fetchone()[0]
+
+
+class _CopySource:
+    """File-like adapter that feeds (member_id, event_date, preference_type) rows to COPY."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ''
+        self.count = 0
+        # psycopg2 would wrap an exception raised from read() in QueryCanceled,
+        # so keep it here, end the COPY early and let the caller re-raise it
+        self.error = None
+
+    def read(self, size=-1):
+        chunks = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            try:
+                row = next(self._rows, None)
+            except Exception as e:
+                self.error = e
+                row = None
+            if row is None:
+                break
+            member_id, event_date, preference_type = row
+            line = f"{member_id}\t{event_date.isoformat()}\t{preference_type or NULL_COPY}\n"
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = ''.join(chunks)
+        if size < 0:
+            self._pending = ''
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+class _PostgresBatch:
+    def __init__(self, cursor, group_id, stamp):
+        self._cursor = cursor
+        self._group_id = group_id
+        self._stamp = stamp
+
+    def changes(self, since):
+        return _select_changes(self._cursor, self._group_id, since)
+
+    def upsert(self, rows):
+        if not rows:
+            return 0
+        upserted = psycopg2.extras.execute_values(self._cursor, """
+            INSERT INTO preferences (group_id, member_id, event_date, preference_type, created_at)
+            VALUES %s
+            ON CONFLICT (group_id, member_id, event_date) DO UPDATE
+                SET preference_type = EXCLUDED.preference_type,
+                    created_at = EXCLUDED.created_at
+                WHERE preferences.preference_type IS DISTINCT FROM EXCLUDED.preference_type
+            RETURNING 1
+        """, [(self._group_id, member_id, day, ptype, self._stamp) for member_id, day, ptype in rows],
+            page_size=len(rows), fetch=True)
+        return len(upserted)
+
+    def clear(self, rows):
+        if not rows:
+            return 0
+        cleared = psycopg2.extras.execute_values(self._cursor, """
+            WITH deleted AS (
+                DELETE FROM preferences AS p
+                USING (VALUES %s) AS v(group_id, member_id, event_date, deleted_at)
+                WHERE p.group_id = v.group_id AND p.member_id = v.member_id
+                  AND p.event_date = v.event_date
+                RETURNING p.group_id, p.member_id, p.event_date, v.deleted_at
+            )
+            INSERT INTO preference_tombstones (group_id, member_id, event_date, deleted_at)
+            SELECT group_id, member_id, event_date, deleted_at FROM deleted
+            ON CONFLICT (group_id, member_id, event_date) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+            RETURNING 1
+        """, [(self._group_id, member_id, day, self._stamp) for member_id, day in rows],
+            template="(%s, %s, %s::date, %s::timestamptz)", page_size=len(rows), fetch=True)
+        return len(cleared)
+
+
+class PostgresStorage(Storage):
+    """Postgres (Neon) through a pool of autocommit psycopg2 connections."""
+
+    name = 'postgres'
+    errors = (psycopg2.Error,)
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # --- connections ------------------------------------------------------------
+
+    def get_pool(self):
+        """Return the shared connection pool, creating it on first use."""
+        if self._pool is not None:
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None:
+                pool = ConnectionPool(
+                    self.dsn,
+                    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '0')),
+                    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '5')),
+                    max_lifetime=float(os.getenv('DB_POOL_MAX_LIFETIME', '300')),
+                    health_check_after=float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '30')),
+                    checkout_timeout=float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '10')),
+                    connect_kwargs={'cursor_factory': InstrumentedCursor},
+                    on_connect=metrics.record_connect,
+                )
+                try:
+                    pool.fill()
+                except Exception as e:
+                    logger.error("Failed to pre-open pooled connections: %s", e)
+                self._pool = pool
+        return self._pool
+
+    def pool_stats(self):
+        pool = self._pool
+        return pool.stats() if pool is not None else None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of a `with` block.
+
+        Raises StorageUnavailable if no connection can be opened.
+        """
+        pool = self.get_pool()
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            logger.exception("Database connection error: %s", e)
+            raise StorageUnavailable("Failed to get database connection") from e
+
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            pool.putconn(conn, discard=discard)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a pooled connection and run the block in a single transaction.
+
+        Commits on success and rolls back on any exception.
+        """
+        with self.connection() as conn:
+            conn.autocommit = False
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                # Includes GeneratorExit when a streaming response is closed early
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+
+    def warm_up(self):
+        try:
+            with self.connection():
+                return True
+        except StorageUnavailable:
+            return False
+
+    # --- schema -----------------------------------------------------------------
+
+    def init_schema(self):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                for statement in SCHEMA_STATEMENTS:
+                    cursor.execute(statement)
+
+    def describe_schema(self):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'preferences')
+                """)
+                table_exists = cursor.fetchone()[0]
+                if not table_exists:
+                    return {'table_exists': False}
+
+                cursor.execute("""
+                    SELECT column_name, data_type, is_nullable, column_default
+                    FROM information_schema.columns
+                    WHERE table_name = 'preferences'
+                """)
+                columns = [dict(zip(['column_name', 'data_type', 'is_nullable', 'column_default'], row)) for row in cursor.fetchall()]
+
+                cursor.execute("""
+                    SELECT pgc.conname AS constraint_name, pg_get_constraintdef(pgc.oid) AS constraint_definition
+                    FROM pg_constraint pgc
+                    JOIN pg_namespace nsp ON nsp.oid = pgc.connamespace
+                    JOIN pg_class cls ON pgc.conrelid = cls.oid
+                    WHERE cls.relname = 'preferences' AND pgc.contype = 'c'
+                """)
+                check_constraints = [dict(zip(['constraint_name', 'constraint_definition'], row)) for row in cursor.fetchall()]
+
+                cursor.execute("""
+                    SELECT tc.constraint_name, tc.constraint_type, kcu.column_name
+                    FROM information_schema.table_constraints tc
+                    JOIN information_schema.key_column_usage kcu ON tc.constraint_name = kcu.constraint_name
+                    WHERE tc.table_name = 'preferences'
+                """)
+                constraints = [dict(zip(['constraint_name', 'constraint_type', 'column_name'], row)) for row in cursor.fetchall()]
+        return {'table_exists': table_exists, 'columns': columns, 'check_constraints': check_constraints,
+                'constraints': constraints}
+
+    # --- groups -----------------------------------------------------------------
+
+    def fetch_group(self, slug):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT g.id, g.name, m.id, m.name
+                    FROM groups g
+                    LEFT JOIN members m ON m.group_id = g.id
+                    WHERE g.slug = %s
+                    ORDER BY m.position, m.id
+                """, (slug,))
+                rows = cursor.fetchall()
+        if not rows:
+            return None
+        return rows[0][0], rows[0][1], [(row[2], row[3]) for row in rows if row[2] is not None]
+
+    def create_group(self, slug, name, member_names):
+        with self.transaction() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO groups (slug, name) VALUES (%s, %s)
+                    ON CONFLICT (slug) DO NOTHING
+                    RETURNING id
+                """, (slug, name))
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO members (group_id, name, position) VALUES %s
+                """, [(row[0], member, position) for position, member in enumerate(member_names)])
+        return row[0]
+
+    def add_members(self, group_id, member_names):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO members (group_id, name, position)
+                    SELECT v.group_id, v.name,
+                           (SELECT COALESCE(max(position) + 1, 0) FROM members WHERE group_id = v.group_id) + v.n
+                    FROM (VALUES %s) AS v(group_id, name, n)
+                    ON CONFLICT (group_id, name) DO NOTHING
+                """, [(group_id, member, offset) for offset, member in enumerate(member_names)],
+                    template="(%s, %s, %s)")
+
+    # --- reads ------------------------------------------------------------------
+
+    def fetch_preferences(self, group_id, start_date=None, end_date=None):
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=InstrumentedDictCursor) as cursor:
+                params = {'group_id': group_id}
+                date_filter = _date_range_clause('p.event_date', start_date, end_date, params)
+                cursor.execute(f"""
+                    SELECT m.name AS user_name, p.event_date, p.preference_type
+                    FROM preferences p
+                    JOIN members m ON m.id = p.member_id
+                    WHERE p.group_id = %(group_id)s{date_filter}
+                    ORDER BY p.event_date, m.name
+                """, params)
+                return [dict(row) for row in cursor.fetchall()]
+
+    def iter_preferences(self, group_id, start_date=None, end_date=None, batch_size=2000):
+        # A named (server-side) cursor keeps memory flat however many rows there are
+        with self.transaction() as conn:
+            with conn.cursor(name='preference_export') as cursor:
+                cursor.itersize = batch_size
+                params = {'group_id': group_id}
+                date_filter = _date_range_clause('p.event_date', start_date, end_date, params)
+                cursor.execute(f"""
+                    SELECT m.name, p.event_date, p.preference_type
+                    FROM preferences p
+                    JOIN members m ON m.id = p.member_id
+                    WHERE p.group_id = %(group_id)s{date_filter}
+                    ORDER BY p.event_date, m.name
+                """, params)
+                for user_name, event_date, preference_type in cursor:
+                    yield {'user_name': user_name, 'event_date': event_date, 'preference_type': preference_type}
+
+    def select_changes(self, group_id, since, start_date=None, end_date=None):
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=InstrumentedDictCursor) as cursor:
+                return _select_changes(cursor, group_id, since, start_date, end_date)
+
+    def data_version(self, group_id):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT GREATEST(
+                        (SELECT max(created_at) FROM preferences WHERE group_id = %(group_id)s),
+                        (SELECT max(deleted_at) FROM preference_tombstones WHERE group_id = %(group_id)s)
+                    )
+                """, {'group_id': group_id})
+                return cursor.fetchone()[0]
+
+    def fetch_summary(self, group_id, start_date=None, end_date=None):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                params = {'group_id': group_id}
+                month_filter = _date_range_clause('s.month', start_date, end_date, params)
+                cursor.execute(f"""
+                    SELECT m.name, s.month, s.preference_type, s.days
+                    FROM preference_month_summary s
+                    JOIN members m ON m.id = s.member_id
+                    WHERE s.group_id = %(group_id)s AND s.days > 0{month_filter}
+                    ORDER BY s.month, m.name, s.preference_type
+                """, params)
+                months = [{'user_name': name, 'month': month, 'preference_type': ptype, 'days': days}
+                          for name, month, ptype, days in cursor.fetchall()]
+                params = {'group_id': group_id}
+                day_filter = _date_range_clause('event_date', start_date, end_date, params)
+                cursor.execute(f"""
+                    SELECT event_date, no_count, prefer_not_count
+                    FROM preference_day_summary
+                    WHERE group_id = %(group_id)s AND (no_count > 0 OR prefer_not_count > 0){day_filter}
+                    ORDER BY event_date
+                """, params)
+                days = [{'event_date': day, 'no': no, 'prefer_not': prefer_not}
+                        for day, no, prefer_not in cursor.fetchall()]
+        return {'months': months, 'days': days}
+
+    # --- writes -----------------------------------------------------------------
+
+    def save_preference(self, group_id, member_id, event_date, preference_type):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                # Single atomic upsert; the WHERE clause turns an unchanged
+                # preference into a no-op (no new tuple, no WAL), and the
+                # UNION ALL branch still reports the current row in that case.
+                # Sent with the group lock as one implicit transaction, in one
+                # round trip; clock_timestamp() is read once the lock is held.
+                cursor.execute("""
+                    SELECT pg_advisory_xact_lock(%(lock)s, %(group_id)s);
+                    WITH upsert AS (
+                        INSERT INTO preferences (group_id, member_id, event_date, preference_type, created_at)
+                        VALUES (%(group_id)s, %(member_id)s, %(event_date)s, %(preference_type)s, clock_timestamp())
+                        ON CONFLICT (group_id, member_id, event_date) DO UPDATE
+                            SET preference_type = EXCLUDED.preference_type,
+                                created_at = EXCLUDED.created_at
+                            WHERE preferences.preference_type IS DISTINCT FROM EXCLUDED.preference_type
+                        RETURNING CASE WHEN xmax = 0 THEN 'inserted' ELSE 'updated' END AS result
+                    )
+                    SELECT result FROM upsert
+                    UNION ALL
+                    SELECT 'unchanged' WHERE NOT EXISTS (SELECT 1 FROM upsert)
+                """, {'lock': GROUP_WRITE_LOCK, 'group_id': group_id, 'member_id': member_id,
+                      'event_date': event_date, 'preference_type': preference_type})
+                return cursor.fetchone()[0]
+
+    def delete_preference(self, group_id, member_id, event_date):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                # Delete and record a tombstone for delta sync in one statement,
+                # sent with the group lock as one implicit transaction
+                cursor.execute("""
+                    SELECT pg_advisory_xact_lock(%(lock)s, %(group_id)s);
+                    WITH deleted AS (
+                        DELETE FROM preferences
+                        WHERE group_id = %(group_id)s AND member_id = %(member_id)s AND event_date = %(event_date)s
+                        RETURNING group_id, member_id, event_date
+                    )
+                    INSERT INTO preference_tombstones (group_id, member_id, event_date, deleted_at)
+                    SELECT group_id, member_id, event_date, clock_timestamp() FROM deleted
+                    ON CONFLICT (group_id, member_id, event_date) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+                """, {'lock': GROUP_WRITE_LOCK, 'group_id': group_id, 'member_id': member_id,
+                      'event_date': event_date})
+                return cursor.rowcount > 0
+
+    @contextmanager
+    def batch(self, group_id):
+        with self.transaction() as conn:
+            with conn.cursor(cursor_factory=InstrumentedDictCursor) as cursor:
+                yield _PostgresBatch(cursor, group_id, _lock_group(cursor, group_id))
+
+    def import_rows(self, group_id, rows):
+        # Stream rows through COPY into a staging table, then merge with one
+        # upsert and one delete instead of a statement per row
+        source = _CopySource(rows)
+        with self.transaction() as conn:
+            with conn.cursor() as cursor:
+                stamp = _lock_group(cursor, group_id)
+                cursor.execute("""
+                    CREATE TEMP TABLE preference_import (
+                        seq BIGSERIAL,
+                        member_id INTEGER NOT NULL,
+                        event_date DATE NOT NULL,
+                        preference_type VARCHAR(20)
+                    ) ON COMMIT DROP
+                """)
+                cursor.copy_expert("COPY preference_import (member_id, event_date, preference_type) FROM STDIN",
+                                   source, size=65536)
+                if source.error is not None:
+                    raise source.error
+                latest = """
+                    WITH latest AS (
+                        SELECT DISTINCT ON (member_id, event_date) member_id, event_date, preference_type
+                        FROM preference_import
+                        ORDER BY member_id, event_date, seq DESC
+                    )
+                """
+                params = {'group_id': group_id, 'stamp': stamp}
+                cursor.execute(latest + """
+                    INSERT INTO preferences (group_id, member_id, event_date, preference_type, created_at)
+                    SELECT %(group_id)s, member_id, event_date, preference_type, %(stamp)s
+                    FROM latest
+                    WHERE preference_type IS NOT NULL
+                    ON CONFLICT (group_id, member_id, event_date) DO UPDATE
+                        SET preference_type = EXCLUDED.preference_type,
+                            created_at = EXCLUDED.created_at
+                        WHERE preferences.preference_type IS DISTINCT FROM EXCLUDED.preference_type
+                """, params)
+                upserted = cursor.rowcount
+                cursor.execute(latest + """
+                    , deleted AS (
+                        DELETE FROM preferences AS p
+                        USING latest AS l
+                        WHERE l.preference_type IS NULL AND p.group_id = %(group_id)s
+                          AND p.member_id = l.member_id AND p.event_date = l.event_date
+                        RETURNING p.group_id, p.member_id, p.event_date
+                    )
+                    INSERT INTO preference_tombstones (group_id, member_id, event_date, deleted_at)
+                    SELECT group_id, member_id, event_date, %(stamp)s FROM deleted
+                    ON CONFLICT (group_id, member_id, event_date) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+                """, params)
+                cleared = cursor.rowcount
+                cursor.execute("SELECT count(*) FROM (SELECT DISTINCT member_id, event_date FROM preference_import) AS c")
+                cells = cursor.fetchone()[0]
+        return {'rows': source.count, 'upserted': upserted, 'cleared': cleared,
+                'unchanged': cells - upserted - cleared}
+
+    def prune_tombstones(self, before):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    WITH pruned AS (
+                        DELETE FROM preference_tombstones AS t
+                        WHERE t.deleted_at < %s
+                          AND t.deleted_at < (SELECT max(deleted_at) FROM preference_tombstones
+                                              WHERE group_id = t.group_id)
+                        RETURNING t.group_id, t.deleted_at
+                    ), horizons AS (
+                        INSERT INTO tombstone_horizons AS h (group_id, pruned_through)
+                        SELECT group_id, max(deleted_at) FROM pruned GROUP BY group_id
+                        ON CONFLICT (group_id) DO UPDATE
+                            SET pruned_through = GREATEST(h.pruned_through, EXCLUDED.pruned_through)
+                    )
+                    SELECT count(*) FROM pruned
+                """, (before,))
+                return cursor.fetchone()[0]
+
+    def pruned_through(self, group_id):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pruned_through FROM tombstone_horizons WHERE group_id = %s", (group_id,))
+                row = cursor.fetchone()
+        return row[0] if row is not None else None
+
+    def reset_preferences(self):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("TRUNCATE preferences, preference_tombstones, preference_month_summary, preference_day_summary")
@@ -0,0 +1,445 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+from .. import metrics
+from .base import Storage, DEFAULT_GROUP_SEED, from_version, to_version, next_stamp
+
+logger = logging.getLogger(__name__)
+
+# Change times are stored as versions (integer microseconds since epoch)
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS groups (
+        id INTEGER PRIMARY KEY,
+        slug TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS members (
+        id INTEGER PRIMARY KEY,
+        group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (group_id, name)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS preferences (
+        group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+        member_id INTEGER NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+        event_date TEXT NOT NULL,
+        preference_type TEXT NOT NULL CHECK (preference_type IN ('prefer_not', 'no')),
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY (group_id, member_id, event_date)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS preference_tombstones (
+        group_id INTEGER NOT NULL,
+        member_id INTEGER NOT NULL,
+        event_date TEXT NOT NULL,
+        deleted_at INTEGER NOT NULL,
+        PRIMARY KEY (group_id, member_id, event_date)
+    ) WITHOUT ROWID
+    """,
+    # Newest tombstone pruned per group: delta sync from an older cursor would miss clears
+    """
+    CREATE TABLE IF NOT EXISTS tombstone_horizons (
+        group_id INTEGER PRIMARY KEY REFERENCES groups(id) ON DELETE CASCADE,
+        pruned_through INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS preferences_group_event_date_idx ON preferences (group_id, event_date)",
+    "CREATE INDEX IF NOT EXISTS preferences_group_created_at_idx ON preferences (group_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS preference_tombstones_group_deleted_at_idx ON preference_tombstones (group_id, deleted_at)",
+    # Aggregates for /api/summary, kept current by the triggers below (months are 'YYYY-MM-01')
+    """
+    CREATE TABLE IF NOT EXISTS preference_month_summary (
+        group_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        member_id INTEGER NOT NULL,
+        preference_type TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        PRIMARY KEY (group_id, month, member_id, preference_type)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS preference_day_summary (
+        group_id INTEGER NOT NULL,
+        event_date TEXT NOT NULL,
+        no_count INTEGER NOT NULL,
+        prefer_not_count INTEGER NOT NULL,
+        PRIMARY KEY (group_id, event_date)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def _count_change(row, sign):
+    """Trigger body adding `sign` to the summary counters of the OLD or NEW row."""
+    return f"""
+        INSERT INTO preference_month_summary (group_id, month, member_id, preference_type, days)
+        VALUES ({row}.group_id, substr({row}.event_date, 1, 8) || '01', {row}.member_id, {row}.preference_type, {sign})
+        ON CONFLICT (group_id, month, member_id, preference_type) DO UPDATE SET days = days + excluded.days;
+        INSERT INTO preference_day_summary (group_id, event_date, no_count, prefer_not_count)
+        VALUES ({row}.group_id, {row}.event_date,
+                ({row}.preference_type = 'no') * {sign}, ({row}.preference_type = 'prefer_not') * {sign})
+        ON CONFLICT (group_id, event_date) DO UPDATE
+            SET no_count = no_count + excluded.no_count,
+                prefer_not_count = prefer_not_count + excluded.prefer_not_count;
+    """
+
+
+SCHEMA_STATEMENTS += [
+    f"CREATE TRIGGER IF NOT EXISTS preferences_summarize_insert AFTER INSERT ON preferences BEGIN {_count_change('NEW', 1)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS preferences_summarize_update AFTER UPDATE OF preference_type ON preferences
+        BEGIN {_count_change('OLD', -1)} {_count_change('NEW', 1)} END""",
+    f"CREATE TRIGGER IF NOT EXISTS preferences_summarize_delete AFTER DELETE ON preferences BEGIN {_count_change('OLD', -1)} END",
+]
+
+# Recompute the summaries from the preferences table (backfill and repair)
+REBUILD_SUMMARY_STATEMENTS = [
+    "DELETE FROM preference_month_summary",
+    "DELETE FROM preference_day_summary",
+    """
+    INSERT INTO preference_month_summary (group_id, month, member_id, preference_type, days)
+    SELECT group_id, substr(event_date, 1, 8) || '01', member_id, preference_type, count(*)
+    FROM preferences
+    GROUP BY 1, 2, 3, 4
+    """,
+    """
+    INSERT INTO preference_day_summary (group_id, event_date, no_count, prefer_not_count)
+    SELECT group_id, event_date, sum(preference_type = 'no'), sum(preference_type = 'prefer_not')
+    FROM preferences
+    GROUP BY 1, 2
+    """,
+]
+
+
+def _date_range_clause(column, start_date, end_date, params):
+    clause = ""
+    if start_date:
+        clause += f" AND {column} >= :start_date"
+        params['start_date'] = str(start_date)
+    if end_date:
+        clause += f" AND {column} <= :end_date"
+        params['end_date'] = str(end_date)
+    return clause
+
+
+class _SqliteBatch:
+    def __init__(self, storage, conn, group_id, stamp):
+        self._storage = storage
+        self._conn = conn
+        self._group_id = group_id
+        self._stamp = stamp
+
+    def changes(self, since):
+        return self._storage._select_changes(self._conn, self._group_id, since)
+
+    def upsert(self, rows):
+        changed = 0
+        for member_id, event_date, preference_type in rows:
+            changed += self._storage._execute(self._conn, """
+                INSERT INTO preferences (group_id, member_id, event_date, preference_type, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (group_id, member_id, event_date) DO UPDATE
+                    SET preference_type = excluded.preference_type,
+                        created_at = excluded.created_at
+                    WHERE preferences.preference_type IS NOT excluded.preference_type
+            """, (self._group_id, member_id, event_date.isoformat(), preference_type, self._stamp)).rowcount
+        return changed
+
+    def clear(self, rows):
+        cleared = 0
+        for member_id, event_date in rows:
+            cleared += self._storage._clear(self._conn, self._group_id, member_id, event_date, self._stamp)
+        return cleared
+
+
+class SqliteStorage(Storage):
+    """An embedded SQLite database file in WAL mode, for local and single-host deployments.
+
+    Each thread gets its own connection. WAL lets readers run alongside the
+    one writer; writes take the database write lock up front (BEGIN
+    IMMEDIATE), which also serializes them for change versions. The schema
+    is created on first use.
+    """
+
+    name = 'sqlite'
+    errors = (sqlite3.Error,)
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    # --- connections ------------------------------------------------------------
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Durable at checkpoints rather than every commit; safe with WAL
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        metrics.record_connect(time.perf_counter() - start)
+        logger.info("Opened SQLite database %s", self.path)
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    self._create_schema(conn)
+                    self._schema_ready = True
+        return conn
+
+    def _execute(self, conn, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return conn.execute(sql, params)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+    @contextmanager
+    def _write(self):
+        """Run the block in a transaction holding the database write lock."""
+        conn = self._conn()
+        self._execute(conn, "BEGIN IMMEDIATE")
+        try:
+            yield conn
+            self._execute(conn, "COMMIT")
+        except BaseException:
+            self._execute(conn, "ROLLBACK")
+            raise
+
+    def _next_stamp(self, conn, group_id):
+        # Inside the write lock, so versions follow commit order even across processes
+        row = self._execute(conn, """
+            SELECT max(v) FROM (
+                SELECT max(created_at) AS v FROM preferences WHERE group_id = ?
+                UNION ALL
+                SELECT max(deleted_at) FROM preference_tombstones WHERE group_id = ?
+            )
+        """, (group_id, group_id)).fetchone()
+        return next_stamp(row[0])
+
+    def warm_up(self):
+        self._conn()
+        return True
+
+    # --- schema -----------------------------------------------------------------
+
+    def _create_schema(self, conn, rebuild_summaries=False):
+        slug, name, members = DEFAULT_GROUP_SEED
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Databases created before the summary tables existed need a backfill
+            rebuild_summaries = rebuild_summaries or conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'preference_day_summary'").fetchone() is None
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(statement)
+            if rebuild_summaries:
+                for statement in REBUILD_SUMMARY_STATEMENTS:
+                    conn.execute(statement)
+            conn.execute("INSERT INTO groups (slug, name) VALUES (?, ?) ON CONFLICT (slug) DO NOTHING", (slug, name))
+            conn.executemany("""
+                INSERT INTO members (group_id, name, position)
+                SELECT id, ?, ? FROM groups WHERE slug = ?
+                ON CONFLICT (group_id, name) DO NOTHING
+            """, [(member, position, slug) for position, member in enumerate(members)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def init_schema(self):
+        self._create_schema(self._conn(), rebuild_summaries=True)
+
+    def describe_schema(self):
+        conn = self._conn()
+        columns = [{'column_name': row['name'], 'data_type': row['type'],
+                    'is_nullable': 'NO' if row['notnull'] or row['pk'] else 'YES', 'column_default': row['dflt_value']}
+                   for row in self._execute(conn, "PRAGMA table_info(preferences)")]
+        row = self._execute(conn, "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'preferences'").fetchone()
+        return {'table_exists': row is not None, 'columns': columns, 'definition': row['sql'] if row else None,
+                'journal_mode': self._execute(conn, "PRAGMA journal_mode").fetchone()[0]}
+
+    # --- groups -----------------------------------------------------------------
+
+    def fetch_group(self, slug):
+        rows = self._execute(self._conn(), """
+            SELECT g.id, g.name, m.id, m.name
+            FROM groups g
+            LEFT JOIN members m ON m.group_id = g.id
+            WHERE g.slug = ?
+            ORDER BY m.position, m.id
+        """, (slug,)).fetchall()
+        if not rows:
+            return None
+        return rows[0][0], rows[0][1], [(row[2], row[3]) for row in rows if row[2] is not None]
+
+    def create_group(self, slug, name, member_names):
+        with self._write() as conn:
+            cursor = self._execute(conn, "INSERT INTO groups (slug, name) VALUES (?, ?) ON CONFLICT (slug) DO NOTHING",
+                                   (slug, name))
+            if cursor.rowcount == 0:
+                return None
+            group_id = cursor.lastrowid
+            conn.executemany("INSERT INTO members (group_id, name, position) VALUES (?, ?, ?)",
+                             [(group_id, member, position) for position, member in enumerate(member_names)])
+        return group_id
+
+    def add_members(self, group_id, member_names):
+        with self._write() as conn:
+            for member in member_names:
+                self._execute(conn, """
+                    INSERT INTO members (group_id, name, position)
+                    SELECT ?, ?, COALESCE(max(position) + 1, 0) FROM members WHERE group_id = ?
+                    ON CONFLICT (group_id, name) DO NOTHING
+                """, (group_id, member, group_id))
+
+    # --- reads ------------------------------------------------------------------
+
+    def fetch_preferences(self, group_id, start_date=None, end_date=None):
+        params = {'group_id': group_id}
+        date_filter = _date_range_clause('p.event_date', start_date, end_date, params)
+        rows = self._execute(self._conn(), f"""
+            SELECT m.name, p.event_date, p.preference_type
+            FROM preferences p
+            JOIN members m ON m.id = p.member_id
+            WHERE p.group_id = :group_id{date_filter}
+            ORDER BY p.event_date, m.name
+        """, params).fetchall()
+        return [{'user_name': row[0], 'event_date': date.fromisoformat(row[1]), 'preference_type': row[2]}
+                for row in rows]
+
+    def _select_changes(self, conn, group_id, since, start_date=None, end_date=None):
+        params = {'group_id': group_id, 'since': to_version(since)}
+        pref_filter = _date_range_clause('c.event_date', start_date, end_date, params)
+        rows = self._execute(conn, f"""
+            SELECT m.name, c.event_date, c.preference_type, c.changed_at
+            FROM (
+                SELECT member_id, event_date, preference_type, created_at AS changed_at
+                FROM preferences
+                WHERE group_id = :group_id AND created_at > :since
+                UNION ALL
+                SELECT member_id, event_date, NULL, deleted_at
+                FROM preference_tombstones
+                WHERE group_id = :group_id AND deleted_at > :since
+            ) AS c
+            JOIN members m ON m.id = c.member_id
+            WHERE 1{pref_filter}
+            ORDER BY c.changed_at, c.event_date, m.name
+        """, params).fetchall()
+        return [{'user_name': row[0], 'event_date': date.fromisoformat(row[1]), 'preference_type': row[2],
+                 'changed_at': from_version(row[3])} for row in rows]
+
+    def select_changes(self, group_id, since, start_date=None, end_date=None):
+        return self._select_changes(self._conn(), group_id, since, start_date, end_date)
+
+    def data_version(self, group_id):
+        row = self._execute(self._conn(), """
+            SELECT max(v) FROM (
+                SELECT max(created_at) AS v FROM preferences WHERE group_id = ?
+                UNION ALL
+                SELECT max(deleted_at) FROM preference_tombstones WHERE group_id = ?
+            )
+        """, (group_id, group_id)).fetchone()
+        return from_version(row[0]) if row[0] is not None else None
+
+    def fetch_summary(self, group_id, start_date=None, end_date=None):
+        conn = self._conn()
+        params = {'group_id': group_id}
+        month_filter = _date_range_clause('s.month', start_date, end_date, params)
+        months = [{'user_name': row[0], 'month': date.fromisoformat(row[1]), 'preference_type': row[2], 'days': row[3]}
+                  for row in self._execute(conn, f"""
+                      SELECT m.name, s.month, s.preference_type, s.days
+                      FROM preference_month_summary s
+                      JOIN members m ON m.id = s.member_id
+                      WHERE s.group_id = :group_id AND s.days > 0{month_filter}
+                      ORDER BY s.month, m.name, s.preference_type
+                  """, params)]
+        params = {'group_id': group_id}
+        day_filter = _date_range_clause('event_date', start_date, end_date, params)
+        days = [{'event_date': date.fromisoformat(row[0]), 'no': row[1], 'prefer_not': row[2]}
+                for row in self._execute(conn, f"""
+                    SELECT event_date, no_count, prefer_not_count
+                    FROM preference_day_summary
+                    WHERE group_id = :group_id AND (no_count > 0 OR prefer_not_count > 0){day_filter}
+                    ORDER BY event_date
+                """, params)]
+        return {'months': months, 'days': days}
+
+    # --- writes -----------------------------------------------------------------
+
+    def save_preference(self, group_id, member_id, event_date, preference_type):
+        with self._write() as conn:
+            row = self._execute(conn, """
+                SELECT preference_type FROM preferences WHERE group_id = ? AND member_id = ? AND event_date = ?
+            """, (group_id, member_id, event_date.isoformat())).fetchone()
+            if row is not None and row[0] == preference_type:
+                return 'unchanged'
+            _SqliteBatch(self, conn, group_id, self._next_stamp(conn, group_id)).upsert(
+                [(member_id, event_date, preference_type)])
+        return 'inserted' if row is None else 'updated'
+
+    def _clear(self, conn, group_id, member_id, event_date, stamp):
+        deleted = self._execute(conn, """
+            DELETE FROM preferences WHERE group_id = ? AND member_id = ? AND event_date = ?
+        """, (group_id, member_id, event_date.isoformat())).rowcount
+        if deleted:
+            self._execute(conn, """
+                INSERT INTO preference_tombstones (group_id, member_id, event_date, deleted_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (group_id, member_id, event_date) DO UPDATE SET deleted_at = excluded.deleted_at
+            """, (group_id, member_id, event_date.isoformat(), stamp))
+        return deleted
+
+    def delete_preference(self, group_id, member_id, event_date):
+        with self._write() as conn:
+            return self._clear(conn, group_id, member_id, event_date, self._next_stamp(conn, group_id)) > 0
+
+    @contextmanager
+    def batch(self, group_id):
+        with self._write() as conn:
+            yield _SqliteBatch(self, conn, group_id, self._next_stamp(conn, group_id))
+
+    def prune_tombstones(self, before):
+        expired = """
+            FROM preference_tombstones
+            WHERE deleted_at < ?
+              AND deleted_at < (SELECT max(deleted_at) FROM preference_tombstones AS newest
+                                WHERE newest.group_id = preference_tombstones.group_id)
+        """
+        with self._write() as conn:
+            self._execute(conn, f"""
+                INSERT INTO tombstone_horizons (group_id, pruned_through)
+                SELECT group_id, max(deleted_at) {expired}
+                GROUP BY group_id
+                ON CONFLICT (group_id) DO UPDATE SET pruned_through = max(pruned_through, excluded.pruned_through)
+            """, (to_version(before),))
+            return self._execute(conn, f"DELETE {expired}", (to_version(before),)).rowcount
+
+    def pruned_through(self, group_id):
+        row = self._execute(self._conn(), "SELECT pruned_through FROM tombstone_horizons WHERE group_id = ?",
+                            (group_id,)).fetchone()
+        return from_version(row[0]) if row is not None else None
+
+    def reset_preferences(self):
+        with self._write() as conn:
+            for table in ('preferences', 'preference_tombstones', 'preference_month_summary', 'preference_day_summary'):
+                self._execute(conn, f"DELETE FROM {table}")
@@ -0,0 +1,292 @@
+"""Local load test for the read and write paths.
+
+Seeds a local database with preferences, starts the Flask app from
+api/index.py on a threaded local HTTP server, and drives GET /,
+GET /api/preferences and POST /api/preferences with concurrent
+keep-alive clients. Results (throughput, p50/p95/p99 latency, errors,
+connection-pool, cache and query counters) are printed as JSON so runs can be
+diffed between versions, and so storage backends can be compared under the
+same load by pointing DATABASE_URL at each in turn:
+
+    DATABASE_URL=postgresql://localhost/camping_bench \\
+        python bench/loadtest.py --seed --days 120 --requests 500 --concurrency 8 --output bench.json
+    python bench/loadtest.py --database-url sqlite:////tmp/camping_bench.db --seed --output bench-sqlite.json
+    python bench/loadtest.py --database-url memory:// --seed --output bench-memory.json
+
+Seeding TRUNCATES the preference tables, so it refuses non-local databases
+unless --allow-remote is given.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import secrets
+import logging
+import argparse
+import platform
+import threading
+import http.client
+from datetime import timedelta
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOCAL_HOSTS = {'', 'localhost', '127.0.0.1', '::1'}
+# Point-in-time values that make no sense as before/after differences
+GAUGES = {'size', 'idle', 'in_use', 'min_size', 'max_size', 'entries', 'version',
+          'hit_rate', 'reuse_ratio', 'avg_connect_ms'}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def is_local_database(database_url):
+    parsed = urlparse(database_url)
+    # Embedded backends are always local
+    if parsed.scheme in ('sqlite', 'memory'):
+        return True
+    host = parsed.hostname or ''
+    # Unix-socket DSNs carry the socket directory in ?host=
+    return host in LOCAL_HOSTS or host.startswith('/') or 'host=/' in (parsed.query or '')
+
+
+def seed(args):
+    """Recreate the schema and fill it with users x days of random preferences."""
+    from api import db
+    from api.index import MONTHS_YEAR
+    from api.calendar_grid import season_bounds
+
+    try:
+        db.init_schema()
+        db.reset_preferences()
+    except Exception as e:
+        raise SystemExit(f"Could not prepare DATABASE_URL: {e}")
+
+    group = db.get_group(db.DEFAULT_GROUP)
+    if group is None:
+        raise SystemExit(f"Group {db.DEFAULT_GROUP!r} not found")
+    users = group['members'][:args.users]
+    start_date, _ = season_bounds(MONTHS_YEAR)
+    rng = random.Random(args.random_seed)
+    changes = []
+    for user in users:
+        for offset in range(args.days):
+            if rng.random() < args.density:
+                changes.append((user, start_date + timedelta(days=offset), rng.choice(db.VALID_PREFERENCE_TYPES)))
+    for i in range(0, len(changes), 1000):
+        if db.apply_preference_changes(group, changes[i:i + 1000]) is None:
+            raise SystemExit("Seeding failed; see log output")
+    return {'users': len(users), 'days': args.days, 'rows': len(changes)}
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+class Client:
+    """One keep-alive HTTP connection per worker thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            # Reconnect once; the server may have closed an idle connection
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+
+
+def run_scenario(port, name, make_request, total, concurrency):
+    """Fire `total` requests from `concurrency` threads; return latency stats."""
+    local = threading.local()
+    counter = iter(range(total))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = []
+    results_lock = threading.Lock()
+
+    def worker():
+        local.client = Client(port)
+        rng = random.Random()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, path, body, headers = make_request(rng)
+            start = time.perf_counter()
+            try:
+                status = local.client.request(method, path, body, headers)
+            except Exception as e:
+                status = repr(e)
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                latencies.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'error_samples': [str(e) for e in errors[:5]],
+        'wall_time_s': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+        'latency_ms': {
+            'min': ms(latencies[0] if latencies else None),
+            'mean': ms(sum(latencies) / len(latencies) if latencies else None),
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def counters():
+    """Snapshot of in-process pool, cache and query counters."""
+    from api import db, metrics
+    return {'pool': db.get_pool_stats(), 'preferences_cache': db.preferences_cache.stats(),
+            'db': {'queries': metrics.DB_QUERIES.total()}}
+
+
+def counter_delta(before, after):
+    delta = {}
+    for section, values in after.items():
+        if not values:
+            continue
+        previous = before.get(section) or {}
+        delta[section] = {key: round(value - previous.get(key, 0), 4)
+                          for key, value in values.items()
+                          if key not in GAUGES and isinstance(value, (int, float)) and not isinstance(value, bool)}
+    return delta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'),
+                        help="postgresql://, sqlite:///path or memory:// URL (default: $DATABASE_URL)")
+    parser.add_argument('--allow-remote', action='store_true', help="allow seeding a non-local database")
+    parser.add_argument('--seed', action='store_true', help="truncate and seed the preference tables first")
+    parser.add_argument('--users', type=int, default=4, help="users to seed (capped at the default group's members)")
+    parser.add_argument('--days', type=int, default=120, help="days to seed from the season start")
+    parser.add_argument('--density', type=float, default=0.3, help="fraction of user-days with a preference")
+    parser.add_argument('--random-seed', type=int, default=1234)
+    parser.add_argument('--requests', type=int, default=300, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', default='index,api_get,api_post,mixed',
+                        help="comma-separated subset of: index, api_get, api_post, mixed")
+    parser.add_argument('--output', help="also write results JSON to this file")
+    parser.add_argument('--log-level', default='WARNING', help="log level for the app while benchmarking")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("set DATABASE_URL or pass --database-url")
+    if args.seed and not args.allow_remote and not is_local_database(args.database_url):
+        parser.error("refusing to truncate a non-local database without --allow-remote")
+
+    os.environ['DATABASE_URL'] = args.database_url
+    admin_password = secrets.token_hex(16)
+    os.environ['ADMIN_PASSWORD'] = admin_password
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(16))
+
+    from api import db
+    from api.index import app, MONTHS_YEAR
+    from api.calendar_grid import season_bounds
+    for logger_name in ('', 'werkzeug'):
+        logging.getLogger(logger_name).setLevel(args.log_level.upper())
+
+    seeded = seed(args) if args.seed else None
+    start_date, _ = season_bounds(MONTHS_YEAR)
+    group = db.get_group(db.DEFAULT_GROUP)
+    if group is None:
+        raise SystemExit(f"Group {db.DEFAULT_GROUP!r} not found; run with --seed first")
+    users = group['members'][:max(args.users, 1)]
+    admin_headers = {'X-Admin-Password': admin_password, 'Content-Type': 'application/json'}
+
+    def post_preference(rng):
+        body = json.dumps({
+            'user_name': rng.choice(users),
+            'event_date': (start_date + timedelta(days=rng.randrange(max(args.days, 1)))).strftime('%Y-%m-%d'),
+            'preference_type': rng.choice(['prefer_not', 'no', 'clear']),
+        })
+        return 'POST', '/api/preferences', body, admin_headers
+
+    scenarios = {
+        'index': lambda rng: ('GET', '/', None, None),
+        'api_get': lambda rng: ('GET', '/api/preferences', None, None),
+        'api_post': post_preference,
+        # Mostly reads with occasional writes, so cache invalidation shows up in read latency
+        'mixed': lambda rng: post_preference(rng) if rng.random() < 0.1 else ('GET', '/api/preferences', None, None),
+    }
+
+    server = start_server(app)
+    port = server.server_port
+    results = []
+    try:
+        for name in [s.strip() for s in args.scenarios.split(',') if s.strip()]:
+            if name not in scenarios:
+                parser.error(f"unknown scenario: {name}")
+            # One warm-up request so connection setup is reported separately from steady state
+            warmup_start = time.perf_counter()
+            Client(port).request(*scenarios[name](random.Random(0)))
+            warmup_ms = round((time.perf_counter() - warmup_start) * 1000, 3)
+
+            before = counters()
+            result = run_scenario(port, name, scenarios[name], args.requests, args.concurrency)
+            result['first_request_ms'] = warmup_ms
+            result['counters'] = counter_delta(before, counters())
+            results.append(result)
+    finally:
+        server.shutdown()
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': db.get_storage().name,
+        'seed': seeded,
+        'config': {k: v for k, v in vars(args).items() if k not in ('database_url', 'output')},
+        'pool': counters()['pool'],
+        'results': results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
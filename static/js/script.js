@@ -11,6 +11,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const firstSeg = window.location.pathname.split('/')[1] || '';
     const PREFIX = firstSeg ? `/${firstSeg}` : '';
     const api = (p) => `${PREFIX}/${p.replace(/^\/+/, '')}`;
+    // Group-scoped endpoints for the calendar this page shows (?group=<slug>)
+    const GROUP = document.body.dataset.group || '';
+    const groupApi = (p) => GROUP ? api(`api/groups/${encodeURIComponent(GROUP)}/${p}`) : api(`api/${p}`);
 
     // Auth UI
     const authStatus = document.getElementById('auth-status');
@@ -55,8 +58,11 @@ document.addEventListener('DOMContentLoaded', () => {
     let isAdmin = document.body.dataset.admin === '1';
     let selectedUser = '';
     let selectedPreference = '';
+    let lastClickedDate = '';
 
     updateAuthUI();
+    // A read-only page may have been served from the shared edge cache; confirm the real auth state
+    if (!isAdmin) refreshAuth();
 
     async function refreshAuth() {
         try {
@@ -167,7 +173,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    calendarContainer.addEventListener('click', async (event) => {
+    calendarContainer.addEventListener('click', (event) => {
         const dayElement = event.target.closest('.day:not(.empty)');
         if (!dayElement) return;
 
@@ -186,54 +192,237 @@ document.addEventListener('DOMContentLoaded', () => {
             return;
         }
 
-        showMessage('Updating...', 'info');
+        // Shift-click marks the whole range since the previous click
+        if (event.shiftKey && lastClickedDate && lastClickedDate !== eventDate) {
+            const [startDate, endDate] = [lastClickedDate, eventDate].sort();
+            lastClickedDate = eventDate;
+            calendarContainer.querySelectorAll('.day[data-date]').forEach(day => {
+                const date = day.dataset.date;
+                if (date >= startDate && date <= endDate) queueEdit(selectedUser, date, selectedPreference);
+            });
+            return;
+        }
+        lastClickedDate = eventDate;
+        queueEdit(selectedUser, eventDate, selectedPreference);
+    });
 
-        const dataToSend = {
-            user_name: selectedUser,
-            event_date: eventDate,
-            preference_type: selectedPreference
-        };
+    // --- Write queue: edits show at once, are coalesced per day and saved in batches ---
+    // Each batch carries If-Match with the data version this page has seen, so the
+    // server rejects it (412) instead of overwriting days someone else changed since.
+    const FLUSH_DELAY = 400;          // ms without new edits before a batch is sent
+    const MAX_BATCH = 500;            // days per request (the server allows 1000)
+    const pendingEdits = new Map();   // "user|date" -> change, not sent yet
+    const savedState = new Map();     // "user|date" -> preference before the first unsaved edit
+    let inFlight = null;              // Map of the batch being saved, one at a time
+    let flushTimer = null;
+
+    const cellKey = (userName, date) => `${userName}|${date}`;
+    const dayElementFor = (date) => calendarContainer.querySelector(`.day[data-date="${date}"]`);
+    const isUnsaved = (key) => pendingEdits.has(key) || (inFlight !== null && inFlight.has(key));
+
+    function queueEdit(userName, date, preferenceType) {
+        const key = cellKey(userName, date);
+        const dayElement = dayElementFor(date);
+        if (!savedState.has(key)) {
+            savedState.set(key, (dayElement && dayElement.getAttribute(`data-member-${memberIndex[userName]}`)) || 'clear');
+        }
+        pendingEdits.set(key, { user_name: userName, event_date: date, preference_type: preferenceType });
+        if (dayElement) updateDayVisualState(dayElement, userName, preferenceType);
+        showMessage('Saving...', 'info');
+        clearTimeout(flushTimer);
+        flushTimer = setTimeout(flushEdits, FLUSH_DELAY);
+    }
 
+    async function flushEdits(options = {}) {
+        clearTimeout(flushTimer);
+        if (inFlight || pendingEdits.size === 0) return;
+        const batch = new Map();
+        for (const [key, change] of pendingEdits) {
+            if (batch.size >= MAX_BATCH) break;
+            batch.set(key, change);
+        }
+        batch.forEach((_, key) => pendingEdits.delete(key));
+        inFlight = batch;
+
+        const headers = { 'Content-Type': 'application/json' };
+        if (dataVersion) headers['If-Match'] = `"${dataVersion}"`;
         try {
-            const response = await fetch(api('api/preferences'), {
+            const response = await fetch(groupApi('preferences/batch'), {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(dataToSend),
+                headers,
+                body: JSON.stringify({ changes: [...batch.values()] }),
+                keepalive: !!options.keepalive,
             });
-
             const result = await response.json();
+            inFlight = null;
 
             if (response.ok && result.status === 'success') {
-                showMessage(result.message || `Preference set for ${eventDate}`, 'success');
-                updateDayVisualState(dayElement, selectedUser, selectedPreference);
+                batch.forEach((_, key) => { if (!pendingEdits.has(key)) savedState.delete(key); });
+                catchUp(result);
+                showMessage(pendingEdits.size ? 'Saving...' : (result.message || 'Saved.'), pendingEdits.size ? 'info' : 'success');
+            } else if (response.status === 412) {
+                // The other editor's newer values win for those days; the rest is retried on the new version
+                const conflicted = new Set((result.conflicts || []).map(c => cellKey(c.user_name, c.event_date)));
+                batch.forEach((change, key) => {
+                    if (conflicted.has(key)) {
+                        pendingEdits.delete(key);
+                        savedState.delete(key);
+                    } else if (!pendingEdits.has(key)) {
+                        pendingEdits.set(key, change);
+                    }
+                });
+                catchUp(result);
+                showMessage(`${conflicted.size} day(s) were just changed by someone else; showing their latest.`, 'error');
+            } else if (response.status === 410) {
+                // Our version predates the server's change history; keep the edits for the save on reload
+                batch.forEach((change, key) => { if (!pendingEdits.has(key)) pendingEdits.set(key, change); });
+                resync();
+                return;
             } else {
+                revertEdits(batch);
                 let errorMsg = result?.message || `Error: ${response.status} - ${response.statusText}`;
+                if (result?.errors) errorMsg += `: ${result.errors.join('; ')}`;
                 showMessage(errorMsg, 'error');
             }
         } catch (error) {
-            console.error('Error updating preference:', error);
+            inFlight = null;
+            console.error('Error saving preferences:', error);
+            revertEdits(batch);
             showMessage('A network or server error occurred. Please try again.', 'error');
         }
+        if (pendingEdits.size) flushTimer = setTimeout(flushEdits, FLUSH_DELAY);
+    }
+
+    function revertEdits(batch) {
+        batch.forEach((change, key) => {
+            if (pendingEdits.has(key)) return;  // a newer edit of this day is still queued
+            const dayElement = dayElementFor(change.event_date);
+            if (dayElement && savedState.has(key)) updateDayVisualState(dayElement, change.user_name, savedState.get(key));
+            savedState.delete(key);
+        });
+    }
+
+    // Don't drop queued edits when the page is closed or hidden
+    window.addEventListener('pagehide', () => flushEdits({ keepalive: true }));
+    document.addEventListener('visibilitychange', () => { if (document.hidden) flushEdits({ keepalive: true }); });
+
+    // --- Live updates: long-poll the change feed and patch only the changed cells ---
+    let dataVersion = document.body.dataset.version || '';
+    let feedBackoff = 0;
+
+    async function pollChanges() {
+        const params = new URLSearchParams({ since: dataVersion });
+        if (document.body.dataset.from) params.set('from', document.body.dataset.from);
+        if (document.body.dataset.to) params.set('to', document.body.dataset.to);
+        try {
+            const res = await fetch(groupApi(`changes?${params}`), { cache: 'no-store' });
+            if (res.status === 410) return resync();
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            const data = await res.json();
+            catchUp(data);
+            feedBackoff = 0;
+        } catch (err) {
+            // Server or network trouble: back off up to a minute, then keep trying
+            feedBackoff = Math.min(feedBackoff ? feedBackoff * 2 : 2000, 60000);
+            console.warn('Change feed error, retrying:', err);
+        }
+        scheduleChanges(feedBackoff);
+    }
+
+    // The server has pruned cleared days newer than our version (e.g. a tab asleep for weeks while
+    // others edited): reload in full. The page's ETag covers its version, so this gets a fresh one.
+    // Queued edits are flushed on pagehide without If-Match, so they still save.
+    function resync() {
+        dataVersion = '';
+        window.location.reload();
+    }
+
+    function scheduleChanges(delay) {
+        // Don't hold connections open for background tabs; catch up when visible again
+        if (document.hidden) {
+            document.addEventListener('visibilitychange', () => scheduleChanges(0), { once: true });
+            return;
+        }
+        setTimeout(pollChanges, delay);
+    }
+
+    // Apply a {version, changes} delta from the feed or a save, never moving the cursor backwards
+    function catchUp(data) {
+        applyChanges(data.changes || []);
+        if (data.changes && data.changes.length) refreshStats();
+        if (data.version && Number(data.version) > Number(dataVersion || 0)) dataVersion = String(data.version);
+    }
+
+    function applyChanges(changes) {
+        changes.forEach(change => {
+            // Local edits that are still being saved win until the server confirms or rejects them
+            if (isUnsaved(cellKey(change.user_name, change.event_date))) return;
+            const dayElement = calendarContainer.querySelector(`.day[data-date="${change.event_date}"]`);
+            if (dayElement) {
+                updateDayVisualState(dayElement, change.user_name, change.preference_type || 'clear');
+            }
+        });
+    }
+
+    if (dataVersion) scheduleChanges(0);
+
+    // --- Season stats: read from the summaries the server keeps up to date on every write ---
+    const seasonStats = document.getElementById('season-stats');
+    let statsTimer = null;
+
+    async function loadStats() {
+        const params = new URLSearchParams();
+        if (document.body.dataset.from) params.set('from', document.body.dataset.from.slice(0, 7));
+        if (document.body.dataset.to) params.set('to', document.body.dataset.to.slice(0, 7));
+        try {
+            const res = await fetch(groupApi(`summary?${params}`), { cache: 'no-cache' });
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            const summary = await res.json();
+            const perUser = Object.entries(summary.users)
+                .map(([name, counts]) => `${name}: ${counts.no} no, ${counts.prefer_not} prefer not`);
+            seasonStats.textContent = [`${summary.totals.days_without_no} of ${summary.totals.days} days nobody said no`,
+                ...perUser].join(' · ');
+        } catch (err) {
+            console.warn('Could not load season stats:', err);
+        }
+    }
+
+    // Coalesce bursts of changes into one refresh
+    function refreshStats() {
+        if (!seasonStats) return;
+        clearTimeout(statsTimer);
+        statsTimer = setTimeout(loadStats, 1000);
+    }
+
+    if (seasonStats) loadStats();
+
+    // Members are identified in the markup by their position in the group, never by name, so a
+    // name can't collide with other attributes (data-date) or classes (no); colors cycle every 8
+    const memberIndex = {};
+    document.querySelectorAll('.user-button').forEach(btn => {
+        memberIndex[btn.dataset.user] = Number(btn.dataset.index);
     });
 
     function updateDayVisualState(dayElement, userName, preferenceType) {
-        const userKey = userName.toLowerCase();
+        const index = memberIndex[userName];
+        if (index === undefined) return;  // joined the group after this page was rendered
         const indicatorContainer = dayElement.querySelector('.indicators');
         if (!indicatorContainer) {
             console.error("Could not find indicator container for day:", dayElement.dataset.date);
             return;
         }
 
-        const existingIndicator = indicatorContainer.querySelector(`.indicator.${userKey}`);
+        const existingIndicator = indicatorContainer.querySelector(`.indicator[data-member="${index}"]`);
         if (existingIndicator) existingIndicator.remove();
 
         if (preferenceType === 'clear') {
-            delete dayElement.dataset[userKey];
+            dayElement.removeAttribute(`data-member-${index}`);
         } else {
-            dayElement.dataset[userKey] = preferenceType;
+            dayElement.setAttribute(`data-member-${index}`, preferenceType);
 
             const newIndicator = document.createElement('span');
-            newIndicator.classList.add('indicator', userKey, preferenceType);
+            newIndicator.classList.add('indicator', `member-${index % 8}`, preferenceType);
+            newIndicator.dataset.member = index;
             newIndicator.textContent = userName[0];
             indicatorContainer.appendChild(newIndicator);
         }
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+# Configure the app before api.index is imported: no .env file, no Postgres
+# listener, and a known admin password for the X-Admin-Password header
+os.environ['VERCEL'] = '1'
+os.environ['DATABASE_URL'] = 'memory://'
+os.environ['ADMIN_PASSWORD'] = 'test-password'
+os.environ['SECRET_KEY'] = 'test-secret'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from api import db  # noqa: E402
+from api.cache import ALL_CACHES  # noqa: E402
+from api.index import app  # noqa: E402
+
+ADMIN_HEADERS = {'X-Admin-Password': 'test-password'}
+
+
+# Postgres runs only against a server you point it at; each test gets an empty
+# TEST_SCHEMA there, so the database's own tables are never touched
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+TEST_SCHEMA = 'camping_test'
+
+
+def reset_test_schema():
+    import psycopg2
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE')
+            cursor.execute(f'CREATE SCHEMA {TEST_SCHEMA}')
+    finally:
+        conn.close()
+
+
+@pytest.fixture(params=['memory', 'sqlite', pytest.param('postgres', marks=pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason='set TEST_DATABASE_URL to run against Postgres'))])
+def storage(request, tmp_path, monkeypatch):
+    """A fresh, schema-initialized storage backend behind api.db (memory, SQLite and Postgres)."""
+    if request.param == 'postgres':
+        reset_test_schema()
+        monkeypatch.setenv('PGOPTIONS', f'-c search_path={TEST_SCHEMA}')
+        url = TEST_DATABASE_URL
+    elif request.param == 'sqlite':
+        url = f"sqlite:///{tmp_path / 'camping.db'}"
+    else:
+        url = 'memory://'
+    monkeypatch.setenv('DATABASE_URL', url)
+    monkeypatch.setattr(db, '_storage', None)
+    for cache in ALL_CACHES:
+        cache.invalidate()
+    db.init_schema()
+    store = db.get_storage()
+    yield store
+    if request.param == 'postgres':
+        store.get_pool().closeall()
+
+
+@pytest.fixture
+def group(storage):
+    """The seeded default group (Jack, Payton, Nick, Alyssa)."""
+    return db.get_group(db.DEFAULT_GROUP)
+
+
+@pytest.fixture
+def client(storage):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin():
+    """Headers that unlock the admin routes."""
+    return dict(ADMIN_HEADERS)
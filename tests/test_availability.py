@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from api import db
+from api.availability import best_windows
+from api.prefgrid import PreferenceGrid
+
+USERS = ['Jack', 'Nick']
+
+
+def grid(rows, start=date(2025, 6, 1), end=date(2025, 6, 7)):
+    return PreferenceGrid.from_rows(
+        [{'user_name': user, 'event_date': day, 'preference_type': ptype} for user, day, ptype in rows],
+        USERS, start, end)
+
+
+def test_windows_rank_by_no_then_prefer_not_then_date():
+    windows = best_windows(grid([
+        ('Jack', '2025-06-01', 'no'),
+        ('Nick', '2025-06-04', 'prefer_not'),
+    ]), length=2, limit=3)
+    assert [(w['start_date'], w['no_count'], w['prefer_not_count']) for w in windows] == [
+        ('2025-06-02', 0, 0), ('2025-06-05', 0, 0), ('2025-06-06', 0, 0)]
+
+
+def test_window_lists_conflicting_users():
+    windows = best_windows(grid([
+        ('Jack', '2025-06-01', 'no'), ('Jack', '2025-06-02', 'prefer_not'), ('Nick', '2025-06-02', 'no'),
+    ], end=date(2025, 6, 2)), length=2)
+    assert windows == [{'start_date': '2025-06-01', 'end_date': '2025-06-02', 'no_count': 2,
+                        'prefer_not_count': 1, 'conflicts': {'Jack': {'no': 1, 'prefer_not': 1},
+                                                             'Nick': {'no': 1, 'prefer_not': 0}}}]
+
+
+def test_length_outside_grid_gives_no_windows():
+    assert best_windows(grid([]), length=8) == []
+    assert best_windows(grid([]), length=0) == []
+
+
+def test_best_windows_api(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    body = client.get('/api/availability/best-windows?from=2025-06-01&to=2025-06-03&length=2&limit=1').get_json()
+    assert body['windows'][0]['start_date'] == '2025-06-02'
+    assert body['windows'][0]['conflicts'] == {}
+
+    db.save_preference(group, 'Nick', '2025-06-03', 'no')
+    body = client.get('/api/availability/best-windows?from=2025-06-01&to=2025-06-03&length=2').get_json()
+    assert [w['no_count'] for w in body['windows']] == [1, 1]
+
+
+def test_best_windows_api_pads_early_years(client, group):
+    db.save_preference(group, 'Jack', '0001-01-01', 'no')
+    body = client.get('/api/availability/best-windows?from=0001-01-01&to=0001-01-03&length=2&limit=1').get_json()
+    assert (body['windows'][0]['start_date'], body['windows'][0]['end_date']) == ('0001-01-02', '0001-01-03')
+    rows = client.get('/api/preferences?from=0001-01-01&to=0001-01-03').get_json()
+    assert [row['event_date'] for row in rows] == ['0001-01-01']
+
+
+@pytest.mark.parametrize('query', [
+    'from=2025/06/01', 'length=x', 'length=0', 'limit=101',
+    'from=2025-06-05&to=2025-06-01', 'from=2000-01-01&to=2025-01-01',
+])
+def test_best_windows_api_rejects_bad_parameters(client, query):
+    assert client.get(f'/api/availability/best-windows?{query}').status_code == 400
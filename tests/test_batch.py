@@ -0,0 +1,71 @@
+import pytest
+
+from api import db
+
+
+def post_batch(client, admin, changes, **headers):
+    return client.post('/api/preferences/batch', headers={**admin, **headers}, json={'changes': changes})
+
+
+def stored(group):
+    return {(row['user_name'], row['event_date']): row['preference_type'] for row in db.get_preferences(group)}
+
+
+def test_range_expands_to_days(client, admin, group):
+    response = post_batch(client, admin, [
+        {'user_name': 'Jack', 'start_date': '2025-06-01', 'end_date': '2025-06-03', 'preference_type': 'no'},
+        {'user_name': 'Nick', 'event_date': '2025-06-02', 'preference_type': 'prefer_not'},
+    ])
+    assert response.status_code == 200
+    assert response.get_json()['applied'] == {'upserted': 4, 'cleared': 0, 'unchanged': 0}
+    assert stored(group) == {
+        ('Jack', '2025-06-01'): 'no', ('Jack', '2025-06-02'): 'no', ('Jack', '2025-06-03'): 'no',
+        ('Nick', '2025-06-02'): 'prefer_not',
+    }
+
+
+def test_later_changes_win_and_clears_apply(client, admin, group):
+    post_batch(client, admin, [{'user_name': 'Jack', 'start_date': '2025-06-01', 'end_date': '2025-06-02',
+                                'preference_type': 'no'}])
+    response = post_batch(client, admin, [
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'prefer_not'},
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'clear'},
+        {'user_name': 'Jack', 'event_date': '2025-06-02', 'preference_type': 'no'},
+    ])
+    assert response.get_json()['applied'] == {'upserted': 0, 'cleared': 1, 'unchanged': 1}
+    assert stored(group) == {('Jack', '2025-06-02'): 'no'}
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'user_name': 'Bob', 'event_date': '2025-06-01', 'preference_type': 'no'}, 'invalid user_name'),
+    ({'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'maybe'}, 'invalid preference_type'),
+    ({'user_name': 'Jack', 'event_date': '06/01/2025', 'preference_type': 'no'}, 'invalid date format'),
+    ({'user_name': 'Jack', 'event_date': 20250601, 'preference_type': 'no'}, 'invalid date format'),
+    ({'user_name': 'Jack', 'start_date': '2025-06-02', 'end_date': '2025-06-01', 'preference_type': 'no'},
+     'end_date is before start_date'),
+    ({'user_name': 'Jack', 'preference_type': 'no'}, 'provide event_date'),
+    ({'user_name': 'Jack', 'start_date': '2025-01-01', 'end_date': '2027-12-31', 'preference_type': 'no'},
+     'more than 1000'),
+    ('Jack', 'must be an object'),
+])
+def test_invalid_batch_is_rejected_whole(client, admin, group, change, message):
+    response = post_batch(client, admin, [
+        {'user_name': 'Nick', 'event_date': '2025-06-01', 'preference_type': 'no'},
+        change,
+    ])
+    assert response.status_code == 400
+    assert message in ' '.join(response.get_json()['errors'])
+    assert stored(group) == {}
+
+
+def test_empty_batch_and_missing_auth(client, admin):
+    assert post_batch(client, admin, []).status_code == 400
+    assert client.post('/api/preferences/batch', json={'changes': [
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'}]}).status_code == 401
+
+
+@pytest.mark.parametrize('body', [[1], 'changes', 7, None])
+def test_body_must_be_an_object(client, admin, body):
+    response = client.post('/api/preferences/batch', headers=admin, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid request body'
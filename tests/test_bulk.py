@@ -0,0 +1,105 @@
+import io
+import json
+
+import pytest
+
+from api import bulk, db
+
+CSV = 'user_name,event_date,preference_type\nJack,2025-06-01,no\nNick,2025-06-02,prefer_not\n'
+
+
+def import_body(client, admin, body, content_type='text/csv', query=''):
+    return client.post(f'/api/preferences/import{query}', headers=admin, data=body, content_type=content_type)
+
+
+def test_csv_import_and_export_round_trip(client, admin, group):
+    response = import_body(client, admin, CSV)
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == {'rows': 2, 'upserted': 2, 'cleared': 0, 'unchanged': 0}
+
+    export = client.get('/api/preferences/export')
+    assert export.headers['Content-Type'].startswith('text/csv')
+    assert export.headers['Content-Disposition'] == 'attachment; filename="default-preferences.csv"'
+    assert export.get_data(as_text=True) == CSV
+
+
+def test_ndjson_import_clears_and_last_row_wins(client, admin, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    lines = [
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'clear'},
+        {'user_name': 'Nick', 'event_date': '2025-06-02', 'preference_type': 'no'},
+        {'user_name': 'Nick', 'event_date': '2025-06-02', 'preference_type': 'prefer_not'},
+        {'user_name': 'Alyssa', 'event_date': '2025-06-03', 'preference_type': None},
+    ]
+    body = '\n'.join(json.dumps(line) for line in lines) + '\n\n'
+    result = import_body(client, admin, body, 'application/x-ndjson').get_json()['imported']
+    assert result == {'rows': 4, 'upserted': 1, 'cleared': 1, 'unchanged': 1}
+    export = client.get('/api/preferences/export?format=ndjson').get_data(as_text=True)
+    assert [json.loads(line) for line in export.splitlines()] == [
+        {'user_name': 'Nick', 'event_date': '2025-06-02', 'preference_type': 'prefer_not'}]
+
+
+def test_csv_clears_need_an_explicit_value(client, admin, group):
+    for day in ('2025-06-01', '2025-06-02'):
+        db.save_preference(group, 'Jack', day, 'no')
+    body = 'user_name,event_date,preference_type\nJack,2025-06-01,\nJack,2025-06-02,clear\n'
+    assert import_body(client, admin, body).get_json()['imported']['cleared'] == 2
+    assert db.get_preferences(group) == []
+
+
+@pytest.mark.parametrize('body, content_type, message', [
+    ('user_name,preference_type\nJack,no\n', 'text/csv', 'line 1: missing column(s): event_date'),
+    (CSV + 'Bob,2025-06-03,no\n', 'text/csv', "line 4: unknown user_name 'Bob'"),
+    (CSV + 'Jack,06/03/2025,no\n', 'text/csv', 'line 4: invalid event_date'),
+    (CSV + 'Jack,2025-06-03,maybe\n', 'text/csv', "line 4: invalid preference_type 'maybe'"),
+    ('{"user_name": "Jack"\n', 'application/x-ndjson', 'line 1: invalid JSON'),
+    ('["Jack", "2025-06-01", "no"]\n', 'application/x-ndjson', 'line 1: expected a JSON object'),
+    ('{"user_name": ["Jack"], "event_date": "2025-06-01", "preference_type": "no"}\n', 'application/x-ndjson',
+     'line 1: user_name must be a string'),
+    ('{"user_name": "Jack", "event_date": 20250601, "preference_type": "no"}\n', 'application/x-ndjson',
+     'line 1: event_date must be a string'),
+    ('user_name,event_date\nJack,2025-06-01\n', 'text/csv', 'line 1: missing column(s): preference_type'),
+    (CSV + 'Jack,2025-06-03\n', 'text/csv', 'line 4: missing preference_type'),
+    ('{"user_name": "Jack", "event_date": "2025-06-01"}\n', 'application/x-ndjson', 'line 1: missing preference_type'),
+    ('{"user_name": "Jack", "event_date": "2025-06-01", "preference_type": {}}\n', 'application/x-ndjson',
+     'line 1: preference_type must be a string'),
+])
+def test_bad_file_is_rejected_whole(client, admin, group, body, content_type, message):
+    response = import_body(client, admin, body, content_type)
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+    assert db.get_preferences(group) == []
+
+
+def test_import_needs_a_known_format_and_admin(client, admin):
+    assert import_body(client, admin, CSV, 'text/plain').status_code == 400
+    assert import_body(client, admin, CSV, 'text/plain', '?format=xml').status_code == 400
+    assert import_body(client, admin, CSV, 'text/plain', '?format=csv').status_code == 200
+    assert import_body(client, {}, CSV).status_code == 401
+
+
+def test_export_range_and_bad_parameters(client, group):
+    for day in ('2025-05-31', '2025-06-01'):
+        db.save_preference(group, 'Jack', day, 'no')
+    export = client.get('/api/preferences/export?from=2025-06-01').get_data(as_text=True)
+    assert export.splitlines()[1:] == ['Jack,2025-06-01,no']
+    assert client.get('/api/preferences/export?format=xml').status_code == 400
+    assert client.get('/api/preferences/export?to=June').status_code == 400
+
+
+def test_format_records_batches_output():
+    rows = [{'user_name': 'Jack', 'event_date': f'2025-06-0{day}', 'preference_type': 'no'} for day in range(1, 6)]
+    chunks = list(bulk.format_records(rows, 'ndjson', batch_size=2))
+    assert len(chunks) == 3
+    assert ''.join(chunks).count('\n') == 5
+
+
+def test_parse_records_skips_blank_ndjson_lines():
+    line = {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': None}
+    records = list(bulk.parse_records(io.StringIO(f'\n{json.dumps(line)}\n\n'), 'ndjson'))
+    assert records == [(2, line)]
+
+
+def test_undecodable_body_is_rejected(client, admin):
+    response = import_body(client, admin, CSV.encode() + b'Jack,2025-06-03,\xff\n')
+    assert response.status_code == 400
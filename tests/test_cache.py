@@ -0,0 +1,93 @@
+import json
+
+from api.cache import VersionedCache
+
+
+def test_hit_until_invalidated():
+    cache = VersionedCache('test', ttl=60)
+    loads = []
+    loader = lambda: loads.append(1) or 'value'
+    assert cache.get('key', loader) == 'value'
+    assert cache.get('key', loader) == 'value'
+    assert len(loads) == 1
+    cache.invalidate('key')
+    cache.get('key', loader)
+    assert len(loads) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_expired_entries_reload():
+    cache = VersionedCache('test', ttl=0)
+    values = iter(['a', 'b'])
+    assert cache.get('key', lambda: next(values)) == 'a'
+    assert cache.get('key', lambda: next(values)) == 'b'
+
+
+def test_failed_load_is_not_cached():
+    cache = VersionedCache('test', ttl=60)
+    assert cache.get('key', lambda: None) is None
+    assert cache.get('key', lambda: 'value') == 'value'
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = VersionedCache('test', ttl=60)
+
+    def load_during_write():
+        cache.invalidate(scope=1)  # a write lands while the old value is being read
+        return 'old'
+
+    assert cache.get('key', load_during_write, scope=1) == 'old'
+    assert cache.get('key', lambda: 'new', scope=1) == 'new'
+
+
+def test_version_bumps_only_when_reloaded_data_differs():
+    cache = VersionedCache('test', ttl=0)
+    cache.get('key', lambda: 'a')
+    version = cache.version
+    cache.get('key', lambda: 'a')
+    assert cache.version == version
+    cache.get('key', lambda: 'b')
+    assert cache.version > version
+
+
+def test_scopes_are_versioned_and_invalidated_separately():
+    cache = VersionedCache('test', ttl=60)
+    cache.get('key', lambda: 1, scope='g1')
+    cache.get('key', lambda: 2, scope='g2')
+    other = cache.version_of('g2')
+    cache.invalidate(scope='g1')
+    assert cache.version_of('g1') != other
+    assert cache.version_of('g2') == other
+    assert cache.get('key', lambda: 'reloaded', scope='g1') == 'reloaded'
+    assert cache.get('key', lambda: 'reloaded', scope='g2') == 2
+
+
+def test_max_entries_evicts_oldest():
+    cache = VersionedCache('test', ttl=60, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.get(key, lambda: key)
+    assert cache.stats()['entries'] == 2
+    assert cache.get('a', lambda: 'reloaded') == 'reloaded'
+
+
+def test_preferences_etag_and_304(client, admin):
+    first = client.get('/api/preferences')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+    etag = first.headers['ETag']
+    assert client.get('/api/preferences', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/api/preferences', headers=admin, data=json.dumps(
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'}), content_type='application/json')
+    changed = client.get('/api/preferences', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json() == [{'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'}]
+
+
+def test_modified_since_alone_never_gets_a_304(client, group):
+    # Only the content ETag validates: a process-local Last-Modified could predate another instance's write
+    for path in ('/api/preferences', '/api/summary'):
+        response = client.get(path)
+        assert 'Last-Modified' not in response.headers
+        assert client.get(path, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}).status_code == 200
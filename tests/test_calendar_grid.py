@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from api.calendar_grid import (MAX_SEASON_MONTHS, month_grid, parse_month, season_bounds, season_label,
+                               season_months, week_header)
+
+
+def test_month_grid_starts_on_the_requested_weekday():
+    sunday_first = month_grid(2025, 6)
+    assert sunday_first.month_name == 'June'
+    assert sunday_first.calendar_grid[0][0] == 1  # June 1st 2025 is a Sunday
+    monday_first = month_grid(2025, 6, 0)
+    assert monday_first.calendar_grid[0] == (0, 0, 0, 0, 0, 0, 1)
+    assert monday_first.days == tuple(range(1, 31))
+
+
+def test_month_grid_is_memoized():
+    assert month_grid(2025, 7) is month_grid(2025, 7)
+
+
+def test_week_header_flags_midweek_days():
+    assert week_header()[:2] == (('Sun', False), ('Mon', True))
+    assert [name for name, _ in week_header(0)] == ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    assert [midweek for _, midweek in week_header(0)] == [True, True, True, True, False, False, False]
+
+
+@pytest.mark.parametrize('value, message', [
+    ('2025-13', 'Invalid month'), ('0000-01', 'Invalid month'),
+    ('2025', 'Use YYYY-MM'), ('0-01', 'Use YYYY-MM'), ('May', 'Use YYYY-MM'), ('2025-6', 'Use YYYY-MM'),
+    ('2025-06-01', 'Use YYYY-MM'), ('２０２５-06', 'Use YYYY-MM'),
+])
+def test_parse_month_rejects_bad_values(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_month(value)
+
+
+def test_bad_season_message(client):
+    response = client.get('/?from=abc')
+    assert response.status_code == 400
+    assert response.get_data(as_text=True) == 'Invalid season: Use YYYY-MM'
+
+
+def test_season_across_a_year_end():
+    months = season_months((2025, 11), (2026, 2))
+    assert months == ((2025, 11), (2025, 12), (2026, 1), (2026, 2))
+    assert season_bounds(months) == (date(2025, 11, 1), date(2026, 2, 28))
+    assert season_label(months) == 'November 2025-February 2026'
+    assert season_label(season_months((2025, 5), (2025, 8))) == 'May-August 2025'
+    assert season_label(((2025, 5),)) == 'May 2025'
+
+
+def test_season_limits():
+    with pytest.raises(ValueError):
+        season_months((2025, 8), (2025, 5))
+    with pytest.raises(ValueError):
+        season_months((2025, 1), (2025 + MAX_SEASON_MONTHS // 12, 1))
+
+
+def test_page_season_from_query(client):
+    page = client.get('/?from=2025-09&to=2025-10')
+    assert page.status_code == 200
+    assert b'September 2025' in page.data and b'October 2025' in page.data
+    assert b'August 2025' not in page.data
+    assert client.get('/?from=2025-10&to=2025-09').status_code == 400
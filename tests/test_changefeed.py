@@ -0,0 +1,81 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import db
+from api.changefeed import ChangeFeed
+from api.storage import to_version
+
+
+def recent_cursor():
+    return to_version(datetime.now(timezone.utc) - timedelta(seconds=30))
+
+
+def test_wait_returns_on_publish():
+    feed = ChangeFeed(None)
+    sequence = feed.sequence()
+    threading.Timer(0.05, feed.publish).start()
+    assert feed.wait(sequence, 5)
+    assert feed.sequence() == sequence + 1
+
+
+def test_wait_times_out_without_changes():
+    feed = ChangeFeed(None)
+    assert not feed.wait(feed.sequence(), 0.01)
+    assert not feed.listening
+
+
+def test_long_poll_wakes_on_write(client, group):
+    since = client.get(f'/api/changes?since={recent_cursor()}&timeout=0').get_json()['version']
+    threading.Timer(0.2, lambda: db.save_preference(group, 'Jack', '2025-06-01', 'no')).start()
+    started = time.monotonic()
+    delta = client.get(f'/api/changes?since={since}&timeout=5').get_json()
+    assert time.monotonic() - started < 4
+    assert [(c['user_name'], c['preference_type']) for c in delta['changes']] == [('Jack', 'no')]
+    assert delta['version'] > since
+
+
+def test_long_poll_times_out_with_empty_delta(client):
+    since = client.get(f'/api/changes?since={recent_cursor()}&timeout=0').get_json()['version']
+    response = client.get(f'/api/changes?since={since}&timeout=0.1')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert response.get_json()['changes'] == []
+    assert response.get_json()['version'] >= since
+
+
+@pytest.mark.parametrize('query', ['since=soon', 'timeout=-1', 'timeout=nan', 'timeout=x'])
+def test_long_poll_rejects_bad_parameters(client, query):
+    params = dict(item.split('=') for item in query.split('&'))
+    params.setdefault('since', str(recent_cursor()))
+    assert client.get('/api/changes', query_string=params).status_code == 400
+
+
+def test_polls_for_other_instances_writes(group, storage, monkeypatch):
+    # A write this process did not publish is only found by re-querying
+    monkeypatch.setattr(db, 'CHANGES_POLL_INTERVAL', 0.05)
+    since = db.from_version(recent_cursor())
+    threading.Timer(0.2, lambda: storage.save_preference(group['id'], group['member_ids']['Nick'],
+                                                         datetime(2025, 6, 2).date(), 'no')).start()
+    delta = db.wait_for_changes(group, since, 5)
+    assert [c['user_name'] for c in delta['changes']] == ['Nick']
+
+
+@pytest.mark.parametrize('listening', [True, False])
+def test_polls_only_while_not_listening(group, monkeypatch, listening):
+    timeouts = []
+
+    def wait(sequence, timeout):
+        timeouts.append(timeout)
+        time.sleep(timeout)
+
+    monkeypatch.setattr(db, 'CHANGES_POLL_INTERVAL', 0.05)
+    monkeypatch.setattr(db.change_feed, '_listening', listening)
+    monkeypatch.setattr(db.change_feed, 'wait', wait)
+    db.wait_for_changes(group, db.from_version(recent_cursor()), 0.3)
+    if listening:
+        assert len(timeouts) == 1 and timeouts[0] > 0.2
+    else:
+        assert len(timeouts) > 2 and max(timeouts) <= 0.05
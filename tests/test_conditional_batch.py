@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import db
+from api.storage import to_version
+
+
+def post_batch(client, admin, changes, version):
+    return client.post('/api/preferences/batch', headers={**admin, 'If-Match': f'"{version}"'},
+                       json={'changes': changes})
+
+
+def change(user, day, ptype):
+    return {'user_name': user, 'event_date': day, 'preference_type': ptype}
+
+
+def stored(group):
+    return {(row['user_name'], row['event_date']): row['preference_type'] for row in db.get_preferences(group)}
+
+
+@pytest.fixture
+def version(group):
+    """The data version after Jack's 2025-06-01 'no', as a client would have last seen it."""
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    return db.get_data_version(group)
+
+
+def test_current_version_applies_and_returns_next_version(client, admin, group, version):
+    response = post_batch(client, admin, [change('Nick', '2025-06-02', 'no')], version)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['applied'] == {'upserted': 1, 'cleared': 0, 'unchanged': 0}
+    assert body['version'] == db.get_data_version(group) > version
+    assert response.headers['ETag'] == f'"{body["version"]}"'
+    assert ('Nick', '2025-06-02', 'no') in {(c['user_name'], c['event_date'], c['preference_type'])
+                                             for c in body['changes']}
+
+
+def test_stale_version_conflicts_and_writes_nothing(client, admin, group, version):
+    db.save_preference(group, 'Jack', '2025-06-01', 'prefer_not')
+    response = post_batch(client, admin, [change('Jack', '2025-06-01', 'clear'), change('Nick', '2025-06-02', 'no')],
+                          version)
+    assert response.status_code == 412
+    body = response.get_json()
+    assert [(c['user_name'], c['event_date'], c['preference_type']) for c in body['conflicts']] == [
+        ('Jack', '2025-06-01', 'prefer_not')]
+    assert body['version'] == db.get_data_version(group)
+    assert stored(group) == {('Jack', '2025-06-01'): 'prefer_not'}
+
+
+def test_stale_version_without_overlap_applies_and_catches_up(client, admin, group, version):
+    db.save_preference(group, 'Payton', '2025-06-05', 'no')
+    response = post_batch(client, admin, [change('Nick', '2025-06-02', 'no')], version)
+    assert response.status_code == 200
+    seen = {(c['user_name'], c['event_date']) for c in response.get_json()['changes']}
+    assert {('Payton', '2025-06-05'), ('Nick', '2025-06-02')} <= seen
+
+
+@pytest.mark.parametrize('if_match', ['"²"', '"' + '1' * 20 + '"', '"a"', '"1", "2"', 'W/"1"x'])
+def test_malformed_if_match_is_rejected(client, admin, group, if_match):
+    response = client.post('/api/preferences/batch', headers={**admin, 'If-Match': if_match},
+                           json={'changes': [change('Nick', '2025-06-02', 'no')]})
+    assert response.status_code == 400
+    assert stored(group) == {}
+
+
+def test_version_before_a_pruned_tombstone_is_gone(client, admin, group, version, monkeypatch):
+    monkeypatch.setattr(db, 'TOMBSTONE_RETENTION', timedelta(0))
+    for day in ('2025-06-02', '2025-06-03'):
+        db.save_preference(group, 'Jack', day, 'no')
+        db.delete_preference(group, 'Jack', day)
+    assert db.prune_tombstones() == 1
+    response = post_batch(client, admin, [change('Nick', '2025-06-02', 'no')], version)
+    assert response.status_code == 410
+    assert stored(group) == {('Jack', '2025-06-01'): 'no'}
+
+
+def test_old_version_without_pruning_still_applies(client, admin, group):
+    old = to_version(datetime.now(timezone.utc) - db.TOMBSTONE_RETENTION - timedelta(days=1))
+    assert post_batch(client, admin, [change('Nick', '2025-06-02', 'no')], old).status_code == 200
+
+
+def test_star_if_match_is_unconditional(client, admin, group):
+    response = client.post('/api/preferences/batch', headers={**admin, 'If-Match': '*'},
+                           json={'changes': [change('Nick', '2025-06-02', 'no')]})
+    assert response.status_code == 200
+    assert 'version' not in response.get_json()
+
+
+def test_page_version_is_the_data_version(client, admin, group, version):
+    page = client.get('/').get_data(as_text=True)
+    assert f'data-version="{version}"' in page
+    # The page already shows Jack's 'no', so clearing it on the page's version is not a conflict
+    response = post_batch(client, admin, [change('Jack', '2025-06-01', 'clear')], version)
+    assert response.status_code == 200
+    assert stored(group) == {}
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import db
+from api.storage import to_version
+
+
+def recent_cursor():
+    return to_version(datetime.now(timezone.utc) - timedelta(minutes=5))
+
+
+def test_date_range_filter(client, group):
+    for day in ('2025-05-31', '2025-06-01', '2025-06-30', '2025-07-01'):
+        db.save_preference(group, 'Jack', day, 'no')
+    rows = client.get('/api/preferences?from=2025-06-01&to=2025-06-30').get_json()
+    assert [row['event_date'] for row in rows] == ['2025-06-01', '2025-06-30']
+    assert client.get('/api/preferences?from=June').status_code == 400
+
+
+def test_since_returns_upserts_and_clears(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    db.save_preference(group, 'Nick', '2025-06-02', 'prefer_not')
+    db.delete_preference(group, 'Jack', '2025-06-01')
+    delta = client.get(f'/api/preferences?since={recent_cursor()}').get_json()
+    assert {(c['user_name'], c['event_date']): c['preference_type'] for c in delta['changes']} == {
+        ('Jack', '2025-06-01'): None, ('Nick', '2025-06-02'): 'prefer_not'}
+    assert delta['version'] == db.get_data_version(group)
+
+
+def test_cursor_only_sees_later_changes(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    version = client.get(f'/api/preferences?since={recent_cursor()}').get_json()['version']
+    db.save_preference(group, 'Payton', '2025-06-03', 'no')
+    changes = [c for c in client.get(f'/api/preferences?since={version}').get_json()['changes']
+               if datetime.fromisoformat(c['changed_at']) > db.from_version(version)]
+    assert [(c['user_name'], c['event_date']) for c in changes] == [('Payton', '2025-06-03')]
+
+
+def test_iso_since_is_accepted(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    since = (datetime.now(timezone.utc) - timedelta(minutes=5)).replace(tzinfo=None).isoformat()
+    assert len(client.get('/api/preferences', query_string={'since': since}).get_json()['changes']) == 1
+
+
+@pytest.mark.parametrize('since', ['yesterday', '²', '9' * 20])
+def test_invalid_since(client, since):
+    assert client.get('/api/preferences', query_string={'since': since}).status_code == 400
+
+
+def test_cursor_before_a_pruned_tombstone_is_gone(client, group, monkeypatch):
+    monkeypatch.setattr(db, 'TOMBSTONE_RETENTION', timedelta(0))
+    before = recent_cursor()
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    db.delete_preference(group, 'Jack', '2025-06-01')
+    after_first = db.get_data_version(group)
+    db.save_preference(group, 'Jack', '2025-06-02', 'no')
+    db.delete_preference(group, 'Jack', '2025-06-02')
+    assert db.prune_tombstones() == 1
+
+    response = client.get(f'/api/preferences?since={before}')
+    assert response.status_code == 410
+    assert 'reload' in response.get_json()['message']
+    changes = client.get(f'/api/preferences?since={after_first}').get_json()['changes']
+    assert ('2025-06-02', None) in [(c['event_date'], c['preference_type']) for c in changes]
+
+
+def test_idle_cursor_outlives_retention(client, group):
+    # Nothing was pruned after it, so an old cursor is still complete, and it moves up to now
+    old = to_version(datetime.now(timezone.utc) - db.TOMBSTONE_RETENTION - timedelta(days=1))
+    response = client.get(f'/api/preferences?since={old}')
+    assert response.status_code == 200
+    assert response.get_json()['changes'] == []
+    assert response.get_json()['version'] > recent_cursor()
+
+
+def test_prune_keeps_newest_tombstone_per_group(storage, group):
+    for day in ('2025-06-01', '2025-06-02', '2025-06-03'):
+        db.save_preference(group, 'Jack', day, 'no')
+        db.delete_preference(group, 'Jack', day)
+    version = db.get_data_version(group)
+    assert storage.prune_tombstones(datetime.now(timezone.utc) + timedelta(seconds=1)) == 2
+    assert db.get_data_version(group) == version
+    changes = db.get_preference_changes(group, db.from_version(recent_cursor()))['changes']
+    assert [(c['event_date'], c['preference_type']) for c in changes] == [('2025-06-03', None)]
+
+
+def test_prune_leaves_tombstones_inside_retention(storage, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    db.delete_preference(group, 'Jack', '2025-06-01')
+    db.save_preference(group, 'Jack', '2025-06-02', 'no')
+    db.delete_preference(group, 'Jack', '2025-06-02')
+    assert db.prune_tombstones() == 0
@@ -0,0 +1,98 @@
+import pytest
+
+from api import db
+
+
+def create(client, admin, **body):
+    return client.post('/api/groups', headers=admin, json=body)
+
+
+def test_seeded_default_group(client):
+    body = client.get('/api/groups/default').get_json()
+    assert (body['slug'], body['name'], body['members']) == ('default', 'Camping', ['Jack', 'Payton', 'Nick', 'Alyssa'])
+
+
+def test_create_group_and_add_members(client, admin):
+    response = create(client, admin, slug='hikers', name='Hiking', members=['Ann', 'Bob'])
+    assert response.status_code == 201
+    assert response.get_json()['members'] == ['Ann', 'Bob']
+    added = client.post('/api/groups/hikers/members', headers=admin, json={'members': ['Bob', 'Cy']})
+    assert added.get_json()['members'] == ['Ann', 'Bob', 'Cy']
+    assert client.get('/api/groups/hikers').get_json()['members'] == ['Ann', 'Bob', 'Cy']
+
+
+def test_groups_keep_separate_preferences(client, admin):
+    create(client, admin, slug='hikers', members=['Ann', 'Jack'])
+    client.post('/api/groups/hikers/preferences', headers=admin,
+                json={'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'})
+    assert client.get('/api/groups/hikers/preferences').get_json() == [
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'}]
+    assert client.get('/api/preferences').get_json() == []
+    assert b'data-member-1="no"' in client.get('/?group=hikers').data
+
+
+def test_members_are_scoped_to_their_group(client, admin):
+    create(client, admin, slug='hikers', members=['Ann'])
+    response = client.post('/api/groups/hikers/preferences', headers=admin,
+                           json={'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('body, status, message', [
+    ({'slug': 'Hikers', 'members': ['Ann']}, 400, 'slug must be'),
+    ({'slug': 'default', 'members': ['Ann']}, 409, 'already exists'),
+    ({'slug': 'hikers', 'members': []}, 400, 'non-empty list'),
+    ({'slug': 'hikers', 'members': ['Ann', 'Ann']}, 400, 'unique'),
+    ({'slug': 'hikers', 'members': ['Sam', 'sam']}, 400, 'ignoring case'),
+    ({'slug': 'hikers', 'members': ['Ann Lee']}, 400, 'letters or digits'),
+    ({'slug': 'hikers', 'members': [['Ann']]}, 400, 'letters or digits'),
+    ({'slug': 'hikers', 'members': [f'M{i}' for i in range(51)]}, 400, 'at most 50'),
+    ({'slug': 'hikers', 'name': 'x' * 101, 'members': ['Ann']}, 400, 'at most 100'),
+])
+def test_create_group_validation(client, admin, body, status, message):
+    response = create(client, admin, **body)
+    assert response.status_code == status
+    assert message in response.get_json()['message']
+
+
+def test_add_members_rejects_case_clashes(client, admin):
+    response = client.post('/api/groups/default/members', headers=admin, json={'members': ['JACK']})
+    assert response.status_code == 400
+    assert 'clashes' in response.get_json()['message']
+    assert db.get_group('default')['members'] == ['Jack', 'Payton', 'Nick', 'Alyssa']
+
+
+def test_group_routes_need_admin_and_a_known_group(client, admin):
+    assert client.post('/api/groups', json={'slug': 'hikers', 'members': ['Ann']}).status_code == 401
+    assert client.get('/api/groups/nobody').status_code == 404
+    assert client.get('/api/groups/nobody/preferences').status_code == 404
+    assert client.post('/api/groups/nobody/members', headers=admin, json={'members': ['Ann']}).status_code == 404
+
+
+def test_non_string_user_name_is_rejected(client, admin):
+    response = client.post('/api/preferences', headers=admin,
+                           json={'user_name': ['Jack'], 'event_date': '2025-06-01', 'preference_type': 'no'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/api/groups', '/api/groups/default/members', '/api/preferences'])
+@pytest.mark.parametrize('body', [['Ann'], 'hikers', 3])
+def test_body_must_be_an_object(client, admin, path, body):
+    response = client.post(path, headers=admin, json=body)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid request body'
+
+
+def test_member_names_do_not_leak_into_markup(client, admin):
+    # Names that match the day's own attribute and a preference class
+    create(client, admin, slug='hikers', members=['Date', 'No', 'Ann'])
+    for user in ('Date', 'No', 'Ann'):
+        client.post('/api/groups/hikers/preferences', headers=admin,
+                    json={'user_name': user, 'event_date': '2025-06-01', 'preference_type': 'prefer_not'})
+    page = client.get('/?group=hikers').get_data(as_text=True)
+    day = page[page.index('data-date="2025-06-01"'):]
+    day = day[:day.index('</div>')]
+    assert 'data-date' not in day[len('data-date'):]
+    assert 'data-member-0="prefer_not"' in day and 'data-member-1="prefer_not"' in day
+    assert day.count('class="indicator member-') == 3
+    assert ' date ' not in day and ' no ' not in day
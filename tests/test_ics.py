@@ -0,0 +1,74 @@
+from datetime import date, datetime, timezone
+
+from api import db, ics
+from api.prefgrid import PreferenceGrid
+
+STAMP = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_grid(rows):
+    return PreferenceGrid.from_rows(
+        [{'user_name': user, 'event_date': day, 'preference_type': ptype} for user, day, ptype in rows],
+        ['Jack', 'Nick'], date(2025, 6, 1), date(2025, 6, 7))
+
+
+def events(body):
+    """(DTSTART, DTEND, SUMMARY) of each VEVENT."""
+    found, current = [], {}
+    for line in body.split('\r\n'):
+        key, _, value = line.partition(':')
+        if key in ('DTSTART;VALUE=DATE', 'DTEND;VALUE=DATE', 'SUMMARY'):
+            current[key] = value
+        elif line == 'END:VEVENT':
+            found.append((current['DTSTART;VALUE=DATE'], current['DTEND;VALUE=DATE'], current['SUMMARY']))
+            current = {}
+    return found
+
+
+def test_runs_of_set_bits():
+    assert list(ics.runs(0b1101110)) == [(1, 3), (5, 2)]
+    assert list(ics.runs(0)) == []
+
+
+def test_consecutive_days_become_one_event():
+    grid = make_grid([('Jack', '2025-06-02', 'no'), ('Jack', '2025-06-03', 'no'), ('Nick', '2025-06-06', 'prefer_not')])
+    body = ics.build_calendar(grid, 'Camping', 'default', STAMP)
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert events(body) == [
+        ('20250601', '20250602', 'Everyone free'),
+        ('20250604', '20250606', 'Everyone free'),
+        ('20250607', '20250608', 'Everyone free'),
+        ('20250602', '20250604', "Jack can't make it"),
+    ]
+    assert [e[2] for e in events(ics.build_calendar(grid, 'Camping', 'default', STAMP, view='blocked'))] == [
+        "Jack can't make it"]
+    assert events(ics.build_calendar(grid, 'Camping', 'default', STAMP, user='Nick')) == [
+        ('20250606', '20250607', 'Nick would prefer not')]
+
+
+def test_text_is_escaped_and_long_lines_folded():
+    body = ics.build_calendar(make_grid([]), 'Trips, ski; ' + 'x' * 100, 'default', STAMP, view='blocked')
+    assert 'X-WR-CALNAME:Trips\\, ski\\; ' in body
+    assert all(len(line.encode()) <= 75 for line in body.split('\r\n'))
+    assert '\r\n x' in body
+
+
+def test_feed_route_caches_and_revalidates(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    feed = client.get('/calendar.ics?view=blocked&from=2025-06')
+    assert feed.status_code == 200
+    assert feed.headers['Content-Type'] == 'text/calendar; charset=utf-8'
+    assert events(feed.get_data(as_text=True)) == [('20250601', '20250602', "Jack can't make it")]
+    assert client.get('/calendar.ics?view=blocked&from=2025-06',
+                      headers={'If-None-Match': feed.headers['ETag']}).status_code == 304
+
+    db.save_preference(group, 'Jack', '2025-06-02', 'no')
+    updated = client.get('/calendar.ics?view=blocked&from=2025-06')
+    assert events(updated.get_data(as_text=True)) == [('20250601', '20250603', "Jack can't make it")]
+
+
+def test_feed_route_errors(client):
+    assert client.get('/calendar.ics?view=maybe').status_code == 400
+    assert client.get('/calendar.ics?from=2025-13').status_code == 400
+    assert client.get('/calendar.ics?user=Bob').status_code == 404
+    assert client.get('/calendar.ics?group=nobody').status_code == 404
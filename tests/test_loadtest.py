@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'bench'))
+
+import loadtest  # noqa: E402
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile([7], 95) == 7
+    assert loadtest.percentile([], 50) is None
+
+
+@pytest.mark.parametrize('url, local', [
+    ('memory://', True),
+    ('sqlite:////tmp/bench.db', True),
+    ('postgresql://localhost/bench', True),
+    ('postgresql://postgres:@/bench?host=/tmp', True),
+    ('postgresql://user@db.example.com/bench', False),
+])
+def test_only_local_databases_count_as_local(url, local):
+    assert loadtest.is_local_database(url) is local
+
+
+def test_counter_delta_skips_gauges():
+    before = {'pool': {'checkouts': 3, 'idle': 1}, 'db': {'queries': 10}}
+    after = {'pool': {'checkouts': 5, 'idle': 2, 'reuse_ratio': 0.5}, 'db': {'queries': 14}, 'empty': None}
+    assert loadtest.counter_delta(before, after) == {'pool': {'checkouts': 2}, 'db': {'queries': 4}}
+
+
+def test_seeded_run_against_memory(tmp_path):
+    output = tmp_path / 'bench.json'
+    env = {**os.environ, 'LOG_LEVEL': 'ERROR'}
+    subprocess.run([sys.executable, str(ROOT / 'bench' / 'loadtest.py'), '--database-url', 'memory://', '--seed',
+                    '--days', '10', '--requests', '20', '--concurrency', '2', '--scenarios', 'api_get,api_post',
+                    '--output', str(output)], check=True, capture_output=True, env=env, cwd=tmp_path, timeout=60)
+    report = json.loads(output.read_text())
+    assert report['backend'] == 'memory'
+    assert [(r['scenario'], r['requests'], r['errors']) for r in report['results']] == [
+        ('api_get', 20, 0), ('api_post', 20, 0)]
+
+
+def test_refuses_to_seed_a_remote_database():
+    result = subprocess.run([sys.executable, str(ROOT / 'bench' / 'loadtest.py'), '--database-url',
+                             'postgresql://user@db.example.com/bench', '--seed'], capture_output=True, timeout=60)
+    assert result.returncode == 2
+    assert b'--allow-remote' in result.stderr
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from api.logging_config import DebugSampler, JsonFormatter, _DeferredQueueHandler, _parse_levels
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def record(level=logging.INFO, msg='saved %s', args=('Jack',), **extra):
+    rec = logging.LogRecord('api.db', level, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_json_formatter_includes_extra_fields():
+    payload = json.loads(JsonFormatter().format(record(group='default', event_date='2025-06-01')))
+    assert payload['level'] == 'INFO'
+    assert payload['logger'] == 'api.db'
+    assert payload['msg'] == 'saved Jack'
+    assert (payload['group'], payload['event_date']) == ('default', '2025-06-01')
+    assert payload['ts'].endswith('+00:00')
+
+
+def test_json_formatter_includes_exceptions():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        rec = record(level=logging.ERROR)
+        rec.exc_info = sys.exc_info()
+    assert 'ValueError: boom' in json.loads(JsonFormatter().format(rec))['exc']
+
+
+def test_debug_sampler_only_drops_debug():
+    sampler = DebugSampler(0.0)
+    assert not sampler.filter(record(level=logging.DEBUG))
+    assert sampler.filter(record(level=logging.INFO))
+    assert DebugSampler(1.0).filter(record(level=logging.DEBUG))
+
+
+def test_queue_handler_defers_formatting():
+    rec = record()
+    prepared = _DeferredQueueHandler(None).prepare(rec)
+    assert prepared is rec
+    assert prepared.args == ('Jack',)
+
+
+def test_parse_levels():
+    assert _parse_levels('api.db=debug, werkzeug=WARNING,bogus,=INFO') == {'api.db': 'DEBUG', 'werkzeug': 'WARNING'}
+
+
+def test_configured_process_writes_json_lines():
+    env = {**os.environ, 'LOG_LEVEL': 'WARNING', 'LOG_LEVELS': 'api.db=DEBUG', 'LOG_FORMAT': 'json',
+           'PYTHONPATH': str(ROOT)}
+    script = ("import logging\n"
+              "from api.logging_config import configure_logging\n"
+              "configure_logging(); configure_logging()\n"
+              "logging.getLogger('api.db').debug('kept %s', 1, extra={'group': 'g'})\n"
+              "logging.getLogger('api.index').info('dropped')\n")
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, timeout=60)
+    lines = [json.loads(line) for line in result.stderr.splitlines()]
+    assert [(line['msg'], line['group']) for line in lines] == [('kept 1', 'g')]
@@ -0,0 +1,50 @@
+import pytest
+
+from api import metrics
+from api.metrics import Counter, Histogram
+
+
+def test_histogram_exposes_cumulative_buckets():
+    histogram = Histogram('latency_seconds', 'Test latency.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, route='/x')
+    assert histogram.expose() == [
+        '# HELP latency_seconds Test latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/x",le="0.1"} 1',
+        'latency_seconds_bucket{route="/x",le="1.0"} 2',
+        'latency_seconds_bucket{route="/x",le="+Inf"} 3',
+        'latency_seconds_sum{route="/x"} 5.55',
+        'latency_seconds_count{route="/x"} 3',
+    ]
+
+
+def test_counter_totals_and_escapes_labels():
+    counter = Counter('things_total', 'Things.')
+    counter.inc(route='/a"b')
+    counter.inc(2)
+    assert counter.total() == 3
+    assert 'things_total{route="/a\\"b"} 1' in counter.expose()
+
+
+def test_metrics_endpoint_requires_admin(client, admin):
+    assert client.get('/metrics').status_code == 401
+    client.get('/api/preferences')
+    body = client.get('/metrics', headers=admin).get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/preferences",status="200"}' in body
+    assert 'cache_lookups_total{cache="preferences",result="miss"}' in body
+
+
+def test_server_timing_header(client, group, monkeypatch):
+    monkeypatch.setattr(metrics, 'SERVER_TIMING', True)
+    timing = client.get('/').headers['Server-Timing']
+    assert timing.startswith('app;dur=')
+    assert 'render;dur=' in timing
+
+
+def test_queries_are_counted(client, storage):
+    if storage.name == 'memory':
+        pytest.skip("the in-memory backend runs no statements")
+    before = metrics.DB_QUERIES.total()
+    client.get('/api/preferences')
+    assert metrics.DB_QUERIES.total() > before
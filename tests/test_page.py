@@ -0,0 +1,52 @@
+from api import db
+from api.index import month_fragment_cache
+
+
+def test_page_renders_marks(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    page = client.get('/')
+    assert page.status_code == 200
+    assert b'data-date="2025-06-01"' in page.data
+    assert b'data-member-0="no"' in page.data
+
+
+def test_page_etag_and_304(client, group):
+    first = client.get('/')
+    etag = first.headers['ETag']
+    assert 's-maxage' in first.headers['Cache-Control']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    db.save_preference(group, 'Nick', '2025-06-02', 'prefer_not')
+    changed = client.get('/', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_new_data_version_is_a_new_page(client, group):
+    # Same marks, newer cursor: a 304 would hand the client back its old (possibly expired) version
+    db.save_preference(group, 'Nick', '2025-06-02', 'no')
+    first = client.get('/')
+    db.delete_preference(group, 'Nick', '2025-06-02')
+    db.save_preference(group, 'Nick', '2025-06-02', 'no')
+    again = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert f'data-version="{db.get_data_version(group)}"'.encode() in again.data
+
+
+def test_sessions_are_not_shared_by_the_edge(client, admin):
+    assert client.post('/api/auth/login', json={'password': admin['X-Admin-Password']}).status_code == 200
+    page = client.get('/')
+    assert page.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Cookie' in page.headers['Vary']
+
+
+def test_edit_re_renders_only_the_touched_month(client, group):
+    client.get('/')
+    misses = month_fragment_cache.stats()['misses']
+    db.save_preference(group, 'Jack', '2025-07-04', 'no')
+    client.get('/')
+    assert month_fragment_cache.stats()['misses'] == misses + 1
+
+
+def test_unknown_group_page(client):
+    assert client.get('/?group=nobody').status_code == 404
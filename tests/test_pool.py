@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from api import pool  # noqa: E402
+from api.pool import ConnectionPool, PoolTimeout  # noqa: E402
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool."""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.rollbacks = 0
+        self.in_transaction = False
+        self.broken = False  # server side went away
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        if self.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("connection closed")
+
+
+@pytest.fixture
+def connects(monkeypatch):
+    opened = []
+
+    def connect(dsn, **kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(pool.psycopg2, 'connect', connect)
+    return opened
+
+
+def test_connections_are_reused(connects):
+    p = ConnectionPool('postgresql://test', max_size=2)
+    conn = p.getconn()
+    assert conn.autocommit
+    p.putconn(conn)
+    assert p.getconn() is conn
+    assert len(connects) == 1
+    assert p.stats()['reuse_ratio'] == 0.5
+
+
+def test_checkout_times_out_when_exhausted(connects):
+    p = ConnectionPool('postgresql://test', max_size=1, checkout_timeout=0.05)
+    p.getconn()
+    with pytest.raises(PoolTimeout):
+        p.getconn()
+    assert p.stats()['timeouts'] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return(connects):
+    p = ConnectionPool('postgresql://test')
+    conn = p.getconn()
+    conn.in_transaction = True
+    conn.autocommit = False
+    p.putconn(conn)
+    assert conn.rollbacks == 1
+    assert conn.autocommit
+    assert p.stats()['idle'] == 1
+
+
+def test_discarded_connection_frees_its_slot(connects):
+    p = ConnectionPool('postgresql://test', max_size=1, checkout_timeout=0.05)
+    conn = p.getconn()
+    p.putconn(conn, discard=True)
+    assert conn.closed
+    assert p.getconn() is not conn
+    assert p.stats()['discarded'] == 1
+
+
+def test_expired_connection_is_replaced(connects):
+    p = ConnectionPool('postgresql://test', max_lifetime=0.0001)
+    conn = p.getconn()
+    p.putconn(conn)
+    time.sleep(0.001)
+    assert p.getconn() is not conn
+    assert p.stats()['reconnects'] == 1
+
+
+def test_failed_health_check_reconnects(connects):
+    p = ConnectionPool('postgresql://test', health_check_after=0)
+    conn = p.getconn()
+    p.putconn(conn)
+    conn.broken = True
+    assert p.getconn() is not conn
+    assert p.stats()['health_check_failures'] == 1
+
+
+def test_fill_opens_min_size_connections(connects):
+    p = ConnectionPool('postgresql://test', min_size=2, max_size=3)
+    p.fill()
+    assert p.stats()['idle'] == 2
+    assert len(connects) == 2
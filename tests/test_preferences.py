@@ -0,0 +1,53 @@
+import pytest
+
+from api import db
+
+
+def save(client, admin, user_name, event_date, preference_type):
+    return client.post('/api/preferences', headers=admin, json={
+        'user_name': user_name, 'event_date': event_date, 'preference_type': preference_type})
+
+
+def test_insert_update_unchanged_and_clear(client, admin, group):
+    inserted = save(client, admin, 'Jack', '2025-06-01', 'no').get_json()
+    assert inserted['result'] == 'inserted'
+    assert inserted['preference'] == {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'}
+    assert save(client, admin, 'Jack', '2025-06-01', 'no').get_json()['result'] == 'unchanged'
+    assert save(client, admin, 'Jack', '2025-06-01', 'prefer_not').get_json()['result'] == 'updated'
+    assert db.get_preferences(group) == [
+        {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'prefer_not'}]
+
+    assert save(client, admin, 'Jack', '2025-06-01', 'clear').get_json()['message'] == 'Preference cleared'
+    assert save(client, admin, 'Jack', '2025-06-01', 'clear').get_json()['message'] == \
+        'Preference not found or already clear'
+    assert db.get_preferences(group) == []
+
+
+def test_one_row_per_member_and_day(group):
+    for ptype in ('no', 'prefer_not', 'no'):
+        db.save_preference(group, 'Nick', '2025-07-04', ptype)
+    db.save_preference(group, 'Alyssa', '2025-07-04', 'no')
+    assert db.get_preferences(group) == [
+        {'user_name': 'Alyssa', 'event_date': '2025-07-04', 'preference_type': 'no'},
+        {'user_name': 'Nick', 'event_date': '2025-07-04', 'preference_type': 'no'},
+    ]
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'event_date': '2025-06-01', 'preference_type': 'no'}, 'Missing user_name'),
+    ({'user_name': 'Bob', 'event_date': '2025-06-01', 'preference_type': 'no'}, 'Invalid user_name'),
+    ({'user_name': 'Jack', 'preference_type': 'no'}, 'Missing event_date'),
+    ({'user_name': 'Jack', 'event_date': '2025-13-01', 'preference_type': 'no'}, 'Invalid date format'),
+    ({'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'yes'}, 'Invalid preference_type'),
+])
+def test_invalid_requests(client, admin, group, body, message):
+    response = client.post('/api/preferences', headers=admin, json=body)
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
+    assert db.get_preferences(group) == []
+
+
+def test_save_requires_admin(client):
+    response = client.post('/api/preferences', json={
+        'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'})
+    assert response.status_code == 401
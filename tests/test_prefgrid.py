@@ -0,0 +1,76 @@
+from datetime import date
+
+from api.prefgrid import PreferenceGrid
+
+USERS = ['Jack', 'Nick', 'Alyssa']
+ROWS = [
+    {'user_name': 'Jack', 'event_date': '2025-06-01', 'preference_type': 'no'},
+    {'user_name': 'Jack', 'event_date': date(2025, 6, 3), 'preference_type': 'prefer_not'},
+    {'user_name': 'Nick', 'event_date': '2025-06-03', 'preference_type': 'no'},
+    {'user_name': 'Bob', 'event_date': '2025-06-02', 'preference_type': 'no'},       # unknown user
+    {'user_name': 'Nick', 'event_date': '2025-07-01', 'preference_type': 'no'},      # outside the grid
+    {'user_name': 'Nick', 'event_date': '2025-06-02', 'preference_type': 'maybe'},   # unknown type
+]
+
+
+def make_grid():
+    return PreferenceGrid.from_rows(ROWS, USERS, date(2025, 6, 1), date(2025, 6, 5))
+
+
+def test_from_rows_sets_bits_per_user_and_type():
+    grid = make_grid()
+    assert grid.num_days == 5
+    assert grid.end_date == date(2025, 6, 5)
+    assert grid.plane('no', 'Jack') == 0b00001
+    assert grid.plane('prefer_not', 'Jack') == 0b00100
+    assert grid.plane('no', 'Nick') == 0b00100
+    assert grid.plane('no', 'Alyssa') == 0
+
+
+def test_day_preferences_in_user_order():
+    grid = make_grid()
+    assert grid.day_preferences(2025, 6, 3) == [('Jack', 'prefer_not'), ('Nick', 'no')]
+    assert grid.day_preferences(2025, 6, 2) == []
+    assert grid.day_preferences(2025, 7, 3) == []
+
+
+def test_masks_and_day_counts():
+    grid = make_grid()
+    assert grid.union('no') == 0b00101
+    assert grid.marked_mask() == 0b00101
+    assert grid.free_mask() == 0b11010
+    assert grid.free_mask(['Nick']) == 0b11011
+    assert grid.day_counts('no') == [1, 0, 1, 0, 0]
+    assert grid.day_counts('prefer_not') == [0, 0, 1, 0, 0]
+
+
+def test_slice_shifts_and_clamps():
+    sliced = make_grid().slice(date(2025, 6, 3), date(2025, 6, 30))
+    assert (sliced.start_date, sliced.num_days) == (date(2025, 6, 3), 3)
+    assert sliced.day_preferences(2025, 6, 3) == [('Jack', 'prefer_not'), ('Nick', 'no')]
+    assert sliced.plane('no', 'Jack') == 0
+
+
+def test_fingerprint_follows_contents():
+    assert make_grid().fingerprint() == make_grid().fingerprint()
+    other = PreferenceGrid.from_rows(ROWS[:1], USERS, date(2025, 6, 1), date(2025, 6, 5))
+    assert other.fingerprint() != make_grid().fingerprint()
+
+
+def test_grid_built_across_a_write_is_not_kept(group, storage, monkeypatch):
+    from api import db, index
+
+    fetch = storage.fetch_preferences
+
+    def fetch_then_write(*args):
+        rows = fetch(*args)
+        monkeypatch.setattr(storage, 'fetch_preferences', fetch)
+        db.save_preference(group, 'Jack', '2025-06-02', 'no')  # lands after the rows were read
+        return rows
+
+    monkeypatch.setattr(storage, 'fetch_preferences', fetch_then_write)
+    start, end = date(2025, 6, 1), date(2025, 6, 5)
+    version, grid = index.get_preference_grid(group, start, end)
+    assert grid.plane('no', 'Jack') == 0
+    assert version < db.get_data_version(group)
+    assert index.get_preference_grid(group, start, end)[1].plane('no', 'Jack') == 0b00010
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from api import db
+from api.index import month_fragment_cache
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_app(script, **env):
+    """Run `script` in a fresh interpreter after importing the app; returns its stdout."""
+    env = {**os.environ, 'PYTHONPATH': str(ROOT), 'LOG_LEVEL': 'ERROR', **env}
+    result = subprocess.run([sys.executable, '-c', 'import api.index as index\n' + script],
+                            capture_output=True, text=True, env=env, timeout=60, check=True)
+    return result.stdout
+
+
+def test_warmup_needs_admin(client):
+    assert client.get('/warmup').status_code == 401
+
+
+def test_warmup_renders_the_default_page(client, admin):
+    misses = month_fragment_cache.stats()['misses']
+    response = client.get('/warmup', headers=admin)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    steps = response.get_json()['steps']
+    assert steps['database']['ok'] and steps['page']['ok']
+    assert month_fragment_cache.stats()['misses'] > misses
+    # The page it rendered is now served from the fragment cache
+    misses = month_fragment_cache.stats()['misses']
+    client.get('/')
+    assert month_fragment_cache.stats()['misses'] == misses
+
+
+def test_warmup_reports_an_unreachable_database(client, admin, monkeypatch):
+    monkeypatch.delenv('DATABASE_URL')
+    monkeypatch.setattr(db, '_storage', None)
+    response = client.get('/warmup', headers=admin)
+    assert response.status_code == 503
+    steps = response.get_json()['steps']
+    assert steps['database']['ok'] is False
+    assert 'page' not in steps or steps['page']['ok'] is False
+
+
+def test_startup_profile_lists_phases(client, admin):
+    assert client.get('/startup-profile').status_code == 401
+    report = client.get('/startup-profile', headers=admin).get_json()['startup']
+    assert [phase['phase'] for phase in report['phases']][:3] == ['imports', 'logging', 'app']
+    assert report['profile'] is False
+
+
+def test_profiled_startup_times_imports():
+    report = json.loads(run_app("import json; print(json.dumps(index.startup.report()))", STARTUP_PROFILE='1'))
+    assert report['profile'] is True
+    assert report['modules_imported'] > 0
+    assert {'module', 'self_ms', 'cumulative_ms'} <= set(report['imports'][0])
+
+
+def test_template_bytecode_cache_dir(tmp_path):
+    cache_dir = tmp_path / 'jinja'
+    run_app("index.app.test_client().get('/')", TEMPLATE_CACHE_DIR=str(cache_dir), DATABASE_URL='memory://')
+    assert any(cache_dir.iterdir())
+
+
+def test_postgres_driver_is_imported_lazily():
+    # Importing the app with a Postgres URL must not load psycopg2 until a connection is opened
+    out = run_app("import sys; print('psycopg2' in sys.modules)", DATABASE_URL='postgresql://nobody@localhost/none')
+    assert out.strip() == 'False'
@@ -0,0 +1,154 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from api.storage import backend_for, from_version, open_storage, to_version
+from api.storage.base import next_stamp
+
+JUNE_1, JUNE_2, JUNE_3 = date(2025, 6, 1), date(2025, 6, 2), date(2025, 6, 3)
+
+
+@pytest.fixture
+def default(storage):
+    """(group id, {member name: member id}) of the seeded default group."""
+    group_id, _, members = storage.fetch_group('default')
+    return group_id, {name: member_id for member_id, name in members}
+
+
+def cells(storage, group_id):
+    return {(row['user_name'], row['event_date']): row['preference_type']
+            for row in storage.fetch_preferences(group_id)}
+
+
+@pytest.mark.parametrize('url, backend', [
+    ('postgres://u@host/db', 'postgres'),
+    ('postgresql://u@host/db', 'postgres'),
+    ('SQLITE:///camping.db', 'sqlite'),
+    ('memory://', 'memory'),
+])
+def test_backend_for_scheme(url, backend):
+    assert backend_for(url) == backend
+
+
+@pytest.mark.parametrize('url', ['mysql://u@host/db', 'camping.db', 'sqlite:///:memory:', 'sqlite://'])
+def test_open_storage_rejects_unusable_urls(url):
+    with pytest.raises(ValueError):
+        open_storage(url)
+
+
+def test_versions_round_trip():
+    stamp = datetime(2025, 6, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)
+    assert from_version(to_version(stamp)) == stamp
+    assert next_stamp(None) > 0
+    far_future = to_version(stamp + timedelta(days=365 * 100))
+    assert next_stamp(far_future) == far_future + 1
+
+
+def test_init_schema_is_idempotent(storage):
+    storage.init_schema()
+    assert [name for _, name in storage.fetch_group('default')[2]] == ['Jack', 'Payton', 'Nick', 'Alyssa']
+    assert storage.describe_schema()['table_exists']
+
+
+def test_save_and_delete_report_what_changed(storage, default):
+    group_id, members = default
+    jack = members['Jack']
+    assert storage.data_version(group_id) is None
+    assert storage.save_preference(group_id, jack, JUNE_1, 'no') == 'inserted'
+    assert storage.save_preference(group_id, jack, JUNE_1, 'no') == 'unchanged'
+    assert storage.save_preference(group_id, jack, JUNE_1, 'prefer_not') == 'updated'
+    assert cells(storage, group_id) == {('Jack', JUNE_1): 'prefer_not'}
+    assert storage.delete_preference(group_id, jack, JUNE_1) is True
+    assert storage.delete_preference(group_id, jack, JUNE_1) is False
+    assert cells(storage, group_id) == {}
+
+
+def test_changes_include_tombstones_and_version_only_grows(storage, default):
+    group_id, members = default
+    before = datetime.now(timezone.utc) - timedelta(seconds=1)
+    storage.save_preference(group_id, members['Jack'], JUNE_1, 'no')
+    first = storage.data_version(group_id)
+    storage.save_preference(group_id, members['Nick'], JUNE_2, 'no')
+    storage.delete_preference(group_id, members['Jack'], JUNE_1)
+    assert storage.data_version(group_id) > first
+
+    changes = storage.select_changes(group_id, before)
+    assert [(c['user_name'], c['preference_type']) for c in changes] == [('Nick', 'no'), ('Jack', None)]
+    assert changes[0]['changed_at'] < changes[1]['changed_at']
+    assert [c['user_name'] for c in storage.select_changes(group_id, before, '2025-06-02', '2025-06-02')] == ['Nick']
+    assert storage.select_changes(group_id, changes[-1]['changed_at']) == []
+
+
+def test_batch_rolls_back_on_exception(storage, default):
+    group_id, members = default
+    storage.save_preference(group_id, members['Jack'], JUNE_1, 'no')
+    with pytest.raises(RuntimeError):
+        with storage.batch(group_id) as batch:
+            assert batch.upsert([(members['Nick'], JUNE_2, 'no')]) == 1
+            assert batch.clear([(members['Jack'], JUNE_1)]) == 1
+            assert {c['user_name'] for c in batch.changes(from_version(0))} == {'Nick', 'Jack'}
+            raise RuntimeError('abort')
+    assert cells(storage, group_id) == {('Jack', JUNE_1): 'no'}
+
+
+def test_batch_counts_only_real_changes(storage, default):
+    group_id, members = default
+    storage.save_preference(group_id, members['Jack'], JUNE_1, 'no')
+    with storage.batch(group_id) as batch:
+        assert batch.upsert([(members['Jack'], JUNE_1, 'no'), (members['Jack'], JUNE_2, 'no')]) == 1
+        assert batch.clear([(members['Jack'], JUNE_3)]) == 0
+
+
+def test_import_rows_last_row_wins(storage, default):
+    group_id, members = default
+    storage.save_preference(group_id, members['Jack'], JUNE_1, 'no')
+    rows = [(members['Jack'], JUNE_1, None), (members['Nick'], JUNE_2, 'no'),
+            (members['Nick'], JUNE_2, 'prefer_not'), (members['Nick'], JUNE_3, None)]
+    assert storage.import_rows(group_id, iter(rows)) == {'rows': 4, 'upserted': 1, 'cleared': 1, 'unchanged': 1}
+    assert cells(storage, group_id) == {('Nick', JUNE_2): 'prefer_not'}
+
+
+def test_import_rows_writes_nothing_if_rows_fail(storage, default):
+    group_id, members = default
+
+    def rows():
+        yield members['Jack'], JUNE_1, 'no'
+        raise ValueError('line 2: bad row')
+
+    with pytest.raises(ValueError):
+        storage.import_rows(group_id, rows())
+    assert cells(storage, group_id) == {}
+
+
+def test_summary_tracks_writes(storage, default):
+    group_id, members = default
+    storage.save_preference(group_id, members['Jack'], JUNE_1, 'no')
+    storage.save_preference(group_id, members['Nick'], JUNE_1, 'prefer_not')
+    storage.save_preference(group_id, members['Nick'], JUNE_1, 'no')
+    storage.delete_preference(group_id, members['Jack'], JUNE_1)
+    summary = storage.fetch_summary(group_id)
+    assert [(m['user_name'], m['preference_type'], m['days']) for m in summary['months']] == [('Nick', 'no', 1)]
+    assert [(d['event_date'], d['no'], d['prefer_not']) for d in summary['days']] == [(JUNE_1, 1, 0)]
+
+
+def test_prune_tombstones_keeps_newest_per_group(storage, default):
+    group_id, members = default
+    for day in (JUNE_1, JUNE_2):
+        storage.save_preference(group_id, members['Jack'], day, 'no')
+        storage.delete_preference(group_id, members['Jack'], day)
+    version = storage.data_version(group_id)
+    first_tombstone = storage.select_changes(group_id, from_version(0))[0]['changed_at']
+    assert storage.pruned_through(group_id) is None
+    assert storage.prune_tombstones(datetime.now(timezone.utc) + timedelta(seconds=1)) == 1
+    assert storage.pruned_through(group_id) == first_tombstone
+    assert storage.data_version(group_id) == version
+    assert [c['event_date'] for c in storage.select_changes(group_id, from_version(0))] == [JUNE_2]
+
+
+def test_groups_and_members(storage):
+    assert storage.create_group('default', 'Again', ['Jack']) is None
+    group_id = storage.create_group('trip', 'Trip', ['Ann', 'Bo'])
+    storage.add_members(group_id, ['Bo', 'Cy'])
+    found_id, name, members = storage.fetch_group('trip')
+    assert (found_id, name, [member for _, member in members]) == (group_id, 'Trip', ['Ann', 'Bo', 'Cy'])
+    assert storage.fetch_group('nobody') is None
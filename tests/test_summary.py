@@ -0,0 +1,95 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+from api import db
+
+SEASON = {'from': '2025-06', 'to': '2025-07'}
+
+
+def recount(group, start, end):
+    """The summary's users/days, counted the slow way from the stored preferences."""
+    users = {name: {'no': 0, 'prefer_not': 0, 'months': {}} for name in group['members']}
+    days = {}
+    for row in db.get_preferences(group, start, end):
+        user, ptype, day = users[row['user_name']], row['preference_type'], row['event_date']
+        user[ptype] += 1
+        month = user['months'].setdefault(day[:7], {'no': 0, 'prefer_not': 0})
+        month[ptype] += 1
+        days.setdefault(day, Counter({'no': 0, 'prefer_not': 0}))[ptype] += 1
+    return users, {day: dict(counts) for day, counts in days.items()}
+
+
+def test_counts_match_a_recount_after_random_writes(client, admin, group):
+    rng = random.Random(7)
+    start = date(2025, 5, 25)
+    for _ in range(150):
+        user = rng.choice(group['members'])
+        day = (start + timedelta(days=rng.randrange(75))).isoformat()
+        ptype = rng.choice(['no', 'prefer_not', None])
+        if rng.random() < 0.3:
+            client.post('/api/preferences/batch', headers=admin, json={'changes': [
+                {'user_name': user, 'start_date': day, 'end_date': day, 'preference_type': ptype or 'clear'}]})
+        elif ptype is None:
+            db.delete_preference(group, user, day)
+        else:
+            db.save_preference(group, user, day, ptype)
+
+    body = client.get('/api/summary', query_string=SEASON).get_json()
+    assert (body['from'], body['to']) == ('2025-06-01', '2025-07-31')
+    assert (body['users'], body['days']) == recount(group, '2025-06-01', '2025-07-31')
+    assert body['totals'] == {
+        'days': 61,
+        'clear_days': 61 - len(body['days']),
+        'days_without_no': 61 - sum(1 for counts in body['days'].values() if counts['no']),
+    }
+
+
+def test_updates_and_clears_move_counts(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    db.save_preference(group, 'Nick', '2025-06-01', 'prefer_not')
+    db.save_preference(group, 'Jack', '2025-06-01', 'prefer_not')
+    db.save_preference(group, 'Nick', '2025-06-02', 'no')
+    db.delete_preference(group, 'Nick', '2025-06-02')
+    body = client.get('/api/summary', query_string=SEASON).get_json()
+    assert body['days'] == {'2025-06-01': {'no': 0, 'prefer_not': 2}}
+    assert body['users']['Jack'] == {'no': 0, 'prefer_not': 1, 'months': {'2025-06': {'no': 0, 'prefer_not': 1}}}
+    assert body['users']['Alyssa'] == {'no': 0, 'prefer_not': 0, 'months': {}}
+    assert body['totals']['clear_days'] == 60
+
+
+def test_season_bounds_limit_the_counts(client, group):
+    for day in ('2025-05-31', '2025-06-15', '2025-08-01'):
+        db.save_preference(group, 'Payton', day, 'no')
+    body = client.get('/api/summary', query_string=SEASON).get_json()
+    assert list(body['days']) == ['2025-06-15']
+    assert body['users']['Payton']['no'] == 1
+
+
+@pytest.mark.parametrize('query', [{'from': '2025-13'}, {'from': 'June'}, {'from': '2025-07', 'to': '2025-06'}])
+def test_invalid_season_is_rejected(client, query):
+    response = client.get('/api/summary', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith('Invalid season')
+
+
+def test_revalidates_until_the_data_changes(client, group):
+    db.save_preference(group, 'Jack', '2025-06-01', 'no')
+    first = client.get('/api/summary', query_string=SEASON)
+    assert first.headers['X-Cache-Generation'].isdigit()
+    assert client.get('/api/summary', query_string=SEASON,
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    db.save_preference(group, 'Jack', '2025-06-02', 'no')
+    second = client.get('/api/summary', query_string=SEASON, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['users']['Jack']['no'] == 2
+
+
+def test_group_summary_route(client, admin, group):
+    client.post('/api/groups', headers=admin, json={'slug': 'trip', 'name': 'Trip', 'members': ['Ann']})
+    body = client.get('/api/groups/trip/summary', query_string=SEASON).get_json()
+    assert list(body['users']) == ['Ann']
+    assert client.get('/api/groups/nobody/summary').status_code == 404